@@ -31,7 +31,7 @@ class AnacondaProject(object):
         """Construct an API instance."""
         pass
 
-    def load_project(self, directory_path, frontend):
+    def load_project(self, directory_path, frontend, read_only=False):
         """Load a project from the given directory.
 
         If there's a problem, the returned Project instance will
@@ -44,12 +44,14 @@ class AnacondaProject(object):
         Args:
             directory_path (str): path to the project directory
             frontend (Frontend): UX abstraction
+            read_only (bool): True to load faster if you won't modify the project files'
+                              values in place (see ``Project``)
 
         Returns:
             a Project instance
 
         """
-        return project.Project(directory_path=directory_path, frontend=frontend)
+        return project.Project(directory_path=directory_path, frontend=frontend, read_only=read_only)
 
     def create_project(self, directory_path, make_directory=False, name=None, icon=None, description=None):
         """Create a project skeleton in the given directory.
@@ -495,20 +497,26 @@ class AnacondaProject(object):
         """
         return project_ops.remove_packages(project=project, env_spec_name=env_spec_name, packages=packages)
 
-    def lock(self, project, env_spec_name):
+    def lock(self, project, env_spec_name, package_table=None):
         """Attempt to freeze dependency versions in anaconda-project-lock.yml.
 
         If the env_spec_name is None rather than a name,
         all env specs are frozen.
 
+        If package_table is True, each locked package is listed once in a
+        ``package_table:`` shared by all env specs, and env specs refer to
+        it by index. If it's False, each env spec lists its own packages.
+        If it's None, the lock file keeps the layout it already has.
+
         Args:
             project (Project): the project
             env_spec_name (str): environment spec name or None for all environment specs
+            package_table (bool): whether to use a shared package table, or None to leave it alone
 
         Returns:
             ``Status`` instance
         """
-        return project_ops.lock(project=project, env_spec_name=env_spec_name)
+        return project_ops.lock(project=project, env_spec_name=env_spec_name, package_table=package_table)
 
     def update(self, project, env_spec_name):
         """Attempt to update frozen dependency versions in anaconda-project-lock.yml.
@@ -715,17 +723,40 @@ class AnacondaProject(object):
         """
         return project_ops.clean(project=project, prepare_result=prepare_result)
 
-    def archive(self, project, filename):
+    def archive(self, project, filename, compression_level=None, reproducible=False, check_unchanged=False, base=None):
         """Make an archive of the non-ignored files in the project.
 
+        gzip, xz, and zstd compression use all available cores.
+
+        A reproducible archive is byte-for-byte the same each time
+        it's made from the same files: timestamps, owners, and
+        permissions are normalized, and it starts with a manifest of
+        the files' sizes and sha256 hashes. With check_unchanged, an
+        existing reproducible archive with the same manifest is left
+        alone rather than being rewritten.
+
+        With a base, which can be a reproducible archive or the manifest
+        from one, this makes a reproducible delta archive with only the
+        files that differ from the base, plus a list of deleted files.
+        Unpacking a delta archive applies it to an existing project.
+
         Args:
             project (``Project``): the project
-            filename (str): name of a zip, tar.gz, or tar.bz2 archive file
+            filename (str): name of a zip, tar.gz, tar.bz2, tar.xz, or tar.zst archive file
+            compression_level (int): compression level, or None for the format's default
+            reproducible (bool): make a reproducible archive
+            check_unchanged (bool): make a reproducible archive, unless filename already is one for the same files
+            base (str): reproducible archive or manifest file to make a delta archive against
 
         Returns:
-            a ``Status``, if failed has ``errors``
+            a ``Status``, if failed has ``errors``, on success has an ``unchanged`` property
         """
-        return project_ops.archive(project=project, filename=filename)
+        return project_ops.archive(project=project,
+                                   filename=filename,
+                                   compression_level=compression_level,
+                                   reproducible=reproducible,
+                                   check_unchanged=check_unchanged,
+                                   base=base)
 
     def unarchive(self, filename, project_dir, parent_dir=None, frontend=None):
         """Unpack an archive of the project.
@@ -734,7 +765,9 @@ class AnacondaProject(object):
         to put evil links in it, for example), but this function
         doesn't load or validate the unpacked project.
 
-        The target directory must not exist or it's an error.
+        The target directory must not exist or it's an error, unless
+        this is a delta archive, which is applied to the existing
+        target directory instead.
 
         project_dir can be None to auto-choose one.
 
@@ -742,7 +775,7 @@ class AnacondaProject(object):
         if project_dir is None.
 
         Args:
-            filename (str): name of a zip, tar.gz, or tar.bz2 archive file
+            filename (str): name of a zip, tar.gz, tar.bz2, tar.xz, or tar.zst archive file
             project_dir (str): the directory to place the project inside
             parent_dir (str): directory to place project_dir within
             frontend (Frontend): frontend instance representing current UX
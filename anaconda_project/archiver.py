@@ -9,19 +9,37 @@
 from __future__ import absolute_import, print_function
 
 import codecs
+import collections
+import contextlib
 import errno
 import fnmatch
+import hashlib
+import io
+import json
+import multiprocessing
 import os
-import platform
 import shutil
+import stat
 import subprocess
+import sys
 import tarfile
 import tempfile
+import threading
+import time
 import uuid
 import zipfile
+import zlib
+from multiprocessing.pool import ThreadPool
+
+try:
+    import grp
+    import pwd
+except ImportError:  # pragma: no cover (Windows)
+    grp = pwd = None  # pragma: no cover (Windows)
 
 from anaconda_project.frontend import _new_error_recorder
 from anaconda_project.internal import logged_subprocess
+from anaconda_project.internal import parallel_compress
 from anaconda_project.internal.simple_status import SimpleStatus
 from anaconda_project.internal.directory_contains import subdirectory_relative_to_directory
 from anaconda_project.internal.rename import rename_over_existing
@@ -29,42 +47,118 @@ from anaconda_project.internal.makedirs import makedirs_ok_if_exists
 
 
 class _FileInfo(object):
-    def __init__(self, project_directory, filename, is_directory):
-        self.full_path = os.path.abspath(filename)
-        self.relative_path = os.path.relpath(self.full_path, start=project_directory)
-        if platform.system() == 'Windows':
-            self.unixified_relative_path = self.relative_path.replace("\\", "/")
+    # there's one of these per file in the project, so keep them small
+    __slots__ = ('full_path', 'relative_path', 'unixified_relative_path', 'basename', 'is_directory', '_entry', '_stat')
+
+    def __init__(self, full_path, relative_path, is_directory, entry=None, stat_result=None):
+        self.full_path = full_path
+        self.relative_path = relative_path
+        if os.sep != '/':
+            self.unixified_relative_path = relative_path.replace(os.sep, "/")
         else:
-            self.unixified_relative_path = self.relative_path
-        self.basename = os.path.basename(self.full_path)
+            self.unixified_relative_path = relative_path
+        self.basename = os.path.basename(full_path)
         self.is_directory = is_directory
+        self._entry = entry
+        self._stat = stat_result
 
+    @property
+    def is_symlink(self):
+        if self._entry is not None:
+            return self._entry.is_symlink()
+        else:
+            return os.path.islink(self.full_path)
+
+    @property
+    def stat(self):
+        """Result of lstat, reusing the one cached by scandir if any."""
+        if self._stat is None:
+            if self._entry is not None:
+                self._stat = self._entry.stat(follow_symlinks=False)
+            else:
+                self._stat = os.lstat(self.full_path)
+        return self._stat
 
-def _list_project(project_directory, ignore_filter, frontend):
-    try:
-        file_infos = []
-        for root, dirs, files in os.walk(project_directory):
-            filtered_dirs = []
-            for d in dirs:
-                info = _FileInfo(project_directory=project_directory, filename=os.path.join(root, d), is_directory=True)
-                if ignore_filter(info):
-                    continue
-                else:
-                    filtered_dirs.append(d)
-                    file_infos.append(info)
 
+class _ListdirEntry(object):
+    """Stand-in for os.DirEntry on Pythons without os.scandir."""
+
+    __slots__ = ('name', 'path')
+
+    def __init__(self, directory, name):
+        self.name = name
+        self.path = os.path.join(directory, name)
+
+    def is_dir(self):
+        return os.path.isdir(self.path)
+
+    def is_symlink(self):
+        return os.path.islink(self.path)
+
+    def stat(self, follow_symlinks=True):
+        if follow_symlinks:
+            return os.stat(self.path)
+        else:
+            return os.lstat(self.path)
+
+
+def _scandir(path):
+    if hasattr(os, 'scandir'):  # pragma: no cover (py2/py3)
+        return list(os.scandir(path))
+    else:  # pragma: no cover (py2/py3)
+        return [_ListdirEntry(path, name) for name in os.listdir(path)]
+
+
+def _walk_project(project_directory, ignore_filter, relative_directory=''):
+    # Like os.walk(), we don't follow symlinks to directories and we
+    # silently skip subdirectories we can't list; but if we can't
+    # list the starting directory itself, that's an error.
+    file_infos = []
+    # stack of (full_path, relative_path) for directories still to list
+    pending = [(os.path.join(project_directory, relative_directory), relative_directory)]
+    first = True
+    while pending:
+        (directory, relative_directory) = pending.pop()
+        try:
+            entries = _scandir(directory)
+        except OSError:
+            if first:
+                raise
+            continue
+        first = False
+
+        if relative_directory == '':
+            prefix = ''
+        else:
+            prefix = relative_directory + os.sep
+
+        subdirs = []
+        for entry in entries:
+            is_directory = entry.is_dir()
+            info = _FileInfo(full_path=entry.path,
+                             relative_path=(prefix + entry.name),
+                             is_directory=is_directory,
+                             entry=entry)
             # don't even recurse into filtered-out directories, mostly because recursing into
             # "envs" is very slow
-            dirs[:] = filtered_dirs
+            if ignore_filter(info):
+                continue
+            file_infos.append(info)
+            if is_directory and not info.is_symlink:
+                subdirs.append((info.full_path, info.relative_path))
+
+        # reversed so we pop them in listing order
+        pending.extend(reversed(subdirs))
+
+    return file_infos
 
-            for f in files:
-                info = _FileInfo(project_directory=project_directory,
-                                 filename=os.path.join(root, f),
-                                 is_directory=False)
-                if not ignore_filter(info):
-                    file_infos.append(info)
 
-        return file_infos
+def _list_project(project_directory, ignore_filter, frontend, git_files=None):
+    try:
+        if git_files is None:
+            return _walk_project(os.path.abspath(project_directory), ignore_filter)
+        else:
+            return _list_git_files(os.path.abspath(project_directory), git_files, ignore_filter)
     except OSError as e:
         frontend.error("Could not list files in %s: %s." % (project_directory, str(e)))
         return None
@@ -146,54 +240,88 @@ def _load_ignore_file(project_directory, frontend):
     return _parse_ignore_file(ignore_file, frontend)
 
 
-def _git_ignored_files(project_directory, frontend):
-    if not os.path.exists(os.path.join(project_directory, ".git")):
-        return []
+def _is_git_project(project_directory):
+    # If the project has a `.git` we assume the user is using git.
+    return os.path.exists(os.path.join(project_directory, ".git"))
 
+
+def _git_listed_files(project_directory, frontend):
     # It is pretty involved to parse .gitignore correctly. Lots of
     # little syntax rules that don't quite match python's fnmatch,
     # there can be multiple .gitignore, and there are also things
     # in the git config file that affect what's ignored.  So we
-    # let git do this itself. If the project has a `.git` we assume
-    # the user is using git.
-
-    # --other means show untracked (not added) files
-    # --ignored means show ignored files
-    # --exclude-standard means use the usual .gitignore and other configuration
-    # --directory means output "node_modules/" if it's ignored, not 100000 JS files
+    # let git do this itself, and since git already knows which
+    # files exist we don't walk the tree at all (which could mean
+    # walking an ignored node_modules with 100000 JS files).
+
+    # --cached means show tracked files
+    # --others means show untracked (not added) files
+    # --exclude-standard means leave out what .gitignore and other configuration ignores
+    # -z means NUL-terminated names with no quoting
     try:
         output = logged_subprocess.check_output(
-            ['git', 'ls-files', '--others', '--ignored', '--exclude-standard', '--directory'],
+            ['git', 'ls-files', '-z', '--cached', '--others', '--exclude-standard'],
             cwd=project_directory)
-        # for whatever reason, git doesn't include the ".git" in the ignore list
-        return [".git"] + output.decode('utf-8').splitlines()
+        # files with merge conflicts can be listed more than once
+        return sorted(set([name for name in output.decode('utf-8').split('\x00') if name != '']))
     except subprocess.CalledProcessError as e:
         message = e.output.decode('utf-8').replace("\n", " ")
-        frontend.error("'git ls-files' failed to list ignored files: %s." % (message))
+        frontend.error("'git ls-files' failed to list project files: %s." % (message))
         return None
     except OSError as e:
         frontend.error("Failed to run 'git ls-files'; %s" % str(e))
         return None
 
 
-def _git_filter(project_directory, frontend):
-    git_ignored = _git_ignored_files(project_directory, frontend)
-    if git_ignored is None:
-        return None
+def _list_git_files(project_directory, git_files, ignore_filter):
+    file_infos = []
+    # git only lists files, so we make up infos for their parent
+    # directories, and don't list anything inside an ignored one.
+    directory_ignored = {'': False}
 
-    git_ignored = set(git_ignored)
+    def is_directory_ignored(relative_directory):
+        if relative_directory not in directory_ignored:
+            if is_directory_ignored(os.path.dirname(relative_directory)):
+                ignored = True
+            else:
+                info = _FileInfo(full_path=os.path.join(project_directory, relative_directory),
+                                 relative_path=relative_directory,
+                                 is_directory=True)
+                ignored = ignore_filter(info)
+                if not ignored:
+                    file_infos.append(info)
+            directory_ignored[relative_directory] = ignored
+        return directory_ignored[relative_directory]
 
-    def is_git_ignored(info):
-        path = info.relative_path
-        while path != '':
-            assert path != '/'  # would infinite loop
-            # git ls-files seems to append "/" to dirs when using --directory
-            if path in git_ignored or (path + '/') in git_ignored:
-                return True
-            path = os.path.dirname(path)
-        return False
+    for name in git_files:
+        relative_path = name.replace("/", os.sep)
+        if is_directory_ignored(os.path.dirname(relative_path)):
+            continue
+        full_path = os.path.join(project_directory, relative_path)
+        try:
+            stat_result = os.lstat(full_path)
+        except OSError as e:
+            # deleted from the working tree but not from the index
+            if e.errno == errno.ENOENT:
+                continue
+            raise
+        is_symlink = stat.S_ISLNK(stat_result.st_mode)
+        if is_symlink:
+            is_directory = os.path.isdir(full_path)
+        else:
+            is_directory = stat.S_ISDIR(stat_result.st_mode)
+        info = _FileInfo(full_path=full_path,
+                         relative_path=relative_path,
+                         is_directory=is_directory,
+                         stat_result=stat_result)
+        if ignore_filter(info):
+            continue
+        file_infos.append(info)
+        if is_directory and not is_symlink:
+            # a submodule; git lists it but not what's inside
+            file_infos.extend(_walk_project(project_directory, ignore_filter, relative_directory=relative_path))
 
-    return is_git_ignored
+    return file_infos
 
 
 def _ignore_file_filter(project_directory, frontend):
@@ -210,15 +338,18 @@ def _ignore_file_filter(project_directory, frontend):
     return matches_some_pattern
 
 
-def _enumerate_archive_files(project_directory, frontend, requirements):
-    git_filter = _git_filter(project_directory, frontend)
+def _list_unignored_files(project_directory, frontend, plugin_patterns):
+    if _is_git_project(project_directory):
+        git_files = _git_listed_files(project_directory, frontend)
+        if git_files is None:
+            return None
+    else:
+        git_files = None
+
     ignore_file_filter = _ignore_file_filter(project_directory, frontend)
-    if git_filter is None or ignore_file_filter is None:
+    if ignore_file_filter is None:
         return None
 
-    plugin_patterns = set()
-    for req in requirements:
-        plugin_patterns = plugin_patterns.union(req.ignore_patterns)
     plugin_patterns = [_FilePattern(s) for s in plugin_patterns]
 
     def is_plugin_generated(info):
@@ -228,12 +359,190 @@ def _enumerate_archive_files(project_directory, frontend, requirements):
         return False
 
     def all_filters(info):
-        return git_filter(info) or ignore_file_filter(info) or is_plugin_generated(info)
+        return ignore_file_filter(info) or is_plugin_generated(info)
+
+    infos = _list_project(project_directory, all_filters, frontend, git_files=git_files)
+    if infos is None:
+        return None
+
+    return infos
+
+# Listing the project means running 'git ls-files' or walking the
+# whole tree, and we need the listing every time a project is
+# loaded (to look for notebooks) as well as to archive it. So we
+# remember the most recent listings, and reuse one as long as the
+# files that say what's ignored are unchanged and each directory
+# in it still has the same names in it. Adding, removing or
+# renaming a file changes its directory's mtime, so we only list
+# again the directories with a new mtime.
+_FILE_INDEX_MAX_PROJECTS = 16
+
+# A file or directory modified this recently (in seconds) could be
+# modified again without its mtime changing, so we don't trust its mtime.
+_FILE_INDEX_RACY_SECONDS = 2
+
+_file_index = collections.OrderedDict()
+_file_index_lock = threading.Lock()
+
+
+def _index_stat(path, too_recent):
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    if stat_result.st_mtime >= too_recent:
+        # never the same as a later stat
+        return 'racy'
+    return (getattr(stat_result, 'st_mtime_ns', stat_result.st_mtime), stat_result.st_size)
+
+
+def _index_names(path):
+    # whether each entry is a directory too, since replacing a file
+    # with a directory of the same name leaves the names alone
+    try:
+        return sorted((name, os.path.isdir(os.path.join(path, name))) for name in os.listdir(path))
+    except OSError:
+        return None
+
+
+def _git_ignored_directories(project_directory):
+    # 'ls-files --ignored --directory' also lists directories that
+    # only hold ignored files, so we ask check-ignore which of them
+    # are ignored themselves. Returns None if git fails.
+    try:
+        output = logged_subprocess.check_output(
+            ['git', 'ls-files', '-z', '--others', '--ignored', '--exclude-standard', '--directory'],
+            cwd=project_directory)
+        candidates = [name for name in output.decode('utf-8').split('\x00') if name.endswith('/')]
+        if len(candidates) == 0:
+            return set()
+        p = logged_subprocess.Popen(['git', 'check-ignore', '-z', '--stdin'],
+                                    cwd=project_directory,
+                                    stdin=subprocess.PIPE,
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE)
+        (out, err) = p.communicate(('\x00'.join(candidates) + '\x00').encode('utf-8'))
+    except (subprocess.CalledProcessError, OSError):
+        return None
+    # 1 means none of them were ignored
+    if p.returncode not in (0, 1):
+        return None
+    return set([name.rstrip('/').replace("/", os.sep) for name in out.decode('utf-8').split('\x00') if name != ''])
 
-    infos = _list_project(project_directory, all_filters, frontend)
+
+def _git_watched_directories(project_directory):
+    # git only lists files, so a file added to a directory that had
+    # nothing listed in it (it was empty, or everything in it was
+    # ignored) wouldn't change any directory we got from the
+    # listing. So we watch every directory git doesn't ignore.
+    ignored = _git_ignored_directories(project_directory)
+    if ignored is None:
+        return None
+    directories = []
+    pending = ['']
+    while pending:
+        relative_directory = pending.pop()
+        directories.append(relative_directory)
+        try:
+            entries = _scandir(os.path.join(project_directory, relative_directory))
+        except OSError:
+            continue
+        for entry in entries:
+            relative_path = os.path.join(relative_directory, entry.name)
+            if relative_path == '.git' or relative_path in ignored:
+                continue
+            if entry.is_dir() and not entry.is_symlink():
+                pending.append(relative_path)
+    return directories
+
+
+def _index_watched_paths(project_directory, infos):
+    directories = ['']
+    files = ['.projectignore']
+    if _is_git_project(project_directory):
+        files.extend([os.path.join('.git', 'index'), os.path.join('.git', 'info', 'exclude')])
+        git_directories = _git_watched_directories(project_directory)
+        if git_directories is None:
+            return None
+        directories = git_directories
+    for info in infos:
+        if info.is_directory and not info.is_symlink:
+            directories.append(info.relative_path)
+        elif info.basename == '.gitignore':
+            files.append(info.relative_path)
+    return (sorted(set(directories)), files)
+
+
+def _index_snapshot(project_directory, infos, started):
+    # anything modified since we started listing (or just before)
+    # may or may not be in the listing, so it has to be listed again
+    too_recent = started - _FILE_INDEX_RACY_SECONDS
+    watched = _index_watched_paths(project_directory, infos)
+    if watched is None:
+        return None
+    (directories, files) = watched
+    snapshot_directories = []
+    for path in directories:
+        full_path = os.path.join(project_directory, path)
+        stat_result = _index_stat(full_path, too_recent)
+        if stat_result == 'racy':
+            names = None
+        else:
+            names = _index_names(full_path)
+        snapshot_directories.append((path, stat_result, names))
+    files = [(path, _index_stat(os.path.join(project_directory, path), too_recent)) for path in files]
+    return (snapshot_directories, files)
+
+
+def _index_still_valid(project_directory, snapshot):
+    too_recent = time.time() - _FILE_INDEX_RACY_SECONDS
+    (directories, files) = snapshot
+    for (path, old_stat) in files:
+        new_stat = _index_stat(os.path.join(project_directory, path), too_recent)
+        if new_stat != old_stat or new_stat == 'racy':
+            return False
+    for (path, old_stat, old_names) in directories:
+        full_path = os.path.join(project_directory, path)
+        new_stat = _index_stat(full_path, too_recent)
+        if new_stat != old_stat or new_stat == 'racy':
+            if old_names is None or _index_names(full_path) != old_names:
+                return False
+    return True
+
+
+def _enumerate_archive_files(project_directory, frontend, requirements):
+    project_directory = os.path.abspath(project_directory)
+    plugin_patterns = set()
+    for req in requirements:
+        plugin_patterns = plugin_patterns.union(req.ignore_patterns)
+    key = (project_directory, tuple(sorted(plugin_patterns)))
+
+    with _file_index_lock:
+        cached = _file_index.pop(key, None)
+        if cached is not None:
+            _file_index[key] = cached
+    if cached is not None:
+        (snapshot, listing) = cached
+        if _index_still_valid(project_directory, snapshot):
+            # fresh infos, so we don't hand out stale stat results
+            return [_FileInfo(full_path=os.path.join(project_directory, relative_path),
+                              relative_path=relative_path,
+                              is_directory=is_directory) for (relative_path, is_directory) in listing]
+
+    started = time.time()
+    infos = _list_unignored_files(project_directory, frontend, plugin_patterns)
     if infos is None:
         return None
 
+    snapshot = _index_snapshot(project_directory, infos, started)
+    if snapshot is None:
+        return infos
+    with _file_index_lock:
+        _file_index.pop(key, None)
+        _file_index[key] = (snapshot, [(info.relative_path, info.is_directory) for info in infos])
+        while len(_file_index) > _FILE_INDEX_MAX_PROJECTS:
+            _file_index.popitem(last=False)
+
     return infos
 
 
@@ -252,24 +561,572 @@ def _leaf_infos(infos):
     return sorted(all_by_name.values(), key=lambda x: x.relative_path)
 
 
-def _write_tar(archive_root_name, infos, filename, compression, frontend):
-    if compression is None:
-        compression = ""
+def _owner_names_lookup():
+    # tarfile looks these up for every single file it adds, but
+    # there's generally only one owner for the whole project.
+    cache = dict()
+
+    def lookup(uid, gid):
+        key = (uid, gid)
+        if key not in cache:
+            uname = ''
+            gname = ''
+            if pwd is not None:
+                try:
+                    uname = pwd.getpwuid(uid)[0]
+                except KeyError:
+                    pass
+            if grp is not None:
+                try:
+                    gname = grp.getgrgid(gid)[0]
+                except KeyError:
+                    pass
+            cache[key] = (uname, gname)
+        return cache[key]
+
+    return lookup
+
+# Reproducible archives give every member this timestamp, unless
+# SOURCE_DATE_EPOCH says otherwise. It's 1980-01-01 UTC, the
+# earliest date a zip file can hold.
+_REPRODUCIBLE_MTIME = 315532800
+
+
+def _reproducible_mtime():
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    if epoch is not None:
+        try:
+            return max(int(epoch), _REPRODUCIBLE_MTIME)
+        except ValueError:
+            pass
+    return _REPRODUCIBLE_MTIME
+
+
+def _reproducible_mode(st_mode):
+    # only the executable bit survives, so umask doesn't matter
+    if stat.S_ISLNK(st_mode):
+        return 0o777
+    elif stat.S_ISDIR(st_mode) or (st_mode & 0o111) != 0:
+        return 0o755
+    else:
+        return 0o644
+
+
+def _tar_info(info, arcname, owner_names, reproducible_mtime=None):
+    st = info.stat
+    if not (stat.S_ISREG(st.st_mode) or stat.S_ISDIR(st.st_mode) or stat.S_ISLNK(st.st_mode)):
+        return None
+    tarinfo = tarfile.TarInfo(arcname)
+    if reproducible_mtime is None:
+        tarinfo.mode = stat.S_IMODE(st.st_mode)
+        tarinfo.uid = st.st_uid
+        tarinfo.gid = st.st_gid
+        tarinfo.mtime = st.st_mtime
+        (tarinfo.uname, tarinfo.gname) = owner_names(st.st_uid, st.st_gid)
     else:
-        compression = ":" + compression
-    with tarfile.open(filename, ('w%s' % compression)) as tf:
-        for info in _leaf_infos(infos):
-            arcname = os.path.join(archive_root_name, info.relative_path)
-            frontend.info("  added %s" % arcname)
+        tarinfo.mode = _reproducible_mode(st.st_mode)
+        tarinfo.mtime = reproducible_mtime
+    if stat.S_ISDIR(st.st_mode):
+        tarinfo.type = tarfile.DIRTYPE
+    elif stat.S_ISLNK(st.st_mode):
+        tarinfo.type = tarfile.SYMTYPE
+        tarinfo.linkname = os.readlink(info.full_path)
+    else:
+        tarinfo.type = tarfile.REGTYPE
+        tarinfo.size = st.st_size
+    return tarinfo
+
+
+def _add_tar_members(tf, archive_root_name, infos, frontend, manifest=None, reproducible_mtime=None):
+    if manifest is not None:
+        tarinfo = tarfile.TarInfo(os.path.join(archive_root_name, _MANIFEST_FILENAME))
+        tarinfo.mode = 0o644
+        tarinfo.mtime = reproducible_mtime
+        tarinfo.size = len(manifest)
+        tf.addfile(tarinfo, io.BytesIO(manifest))
+    owner_names = _owner_names_lookup()
+    for info in _leaf_infos(infos):
+        arcname = os.path.join(archive_root_name, info.relative_path)
+        frontend.info("  added %s" % arcname)
+        tarinfo = _tar_info(info, arcname, owner_names, reproducible_mtime=reproducible_mtime)
+        if tarinfo is None:
+            # device files and other oddities, let tarfile sort them out
             tf.add(info.full_path, arcname=arcname)
+        elif tarinfo.isdir() or tarinfo.issym():
+            tf.addfile(tarinfo)
+        else:
+            with open(info.full_path, 'rb') as f:
+                tf.addfile(tarinfo, f)
+
+
+class _DigestingWriter(object):
+    # Passes writes through to a file object, counting the bytes
+    # and optionally hashing them, so we know the size and MD5 of
+    # an archive without reading it back.
+    def __init__(self, fileobj, md5=False):
+        self._fileobj = fileobj
+        self._md5 = hashlib.md5() if md5 else None
+        self.size = 0
+
+    def write(self, data):
+        self._fileobj.write(data)
+        if self._md5 is not None:
+            self._md5.update(data)
+        self.size += len(data)
+
+    def tell(self):
+        return self.size
+
+    def flush(self):
+        self._fileobj.flush()
+
+    @property
+    def md5(self):
+        return None if self._md5 is None else self._md5.digest()
+
+
+def _write_tar(archive_root_name,
+               infos,
+               filename,
+               compression,
+               frontend,
+               compression_level=None,
+               manifest=None,
+               reproducible_mtime=None,
+               compute_md5=False):
+    # returns (size, md5 digest or None)
+    def add_members(tf):
+        _add_tar_members(tf,
+                         archive_root_name,
+                         infos,
+                         frontend,
+                         manifest=manifest,
+                         reproducible_mtime=reproducible_mtime)
+
+    # tarfile only ever writes forward, so we can digest the
+    # archive as it's written.
+    with open(filename, 'wb') as raw:
+        writer = _DigestingWriter(raw, md5=compute_md5)
+        if compression in parallel_compress.COMPRESSIONS:
+            # tarfile would compress on a single core; we compress
+            # blocks of its output stream in parallel instead.
+            with parallel_compress.ParallelCompressedFile(writer, compression, level=compression_level) as compressed:
+                with tarfile.open(fileobj=compressed, mode='w|') as tf:
+                    add_members(tf)
+        elif compression is None:
+            with tarfile.open(fileobj=writer, mode='w') as tf:
+                add_members(tf)
+        else:
+            if compression_level is None:
+                compression_level = 9
+            with tarfile.open(fileobj=writer, mode=('w:%s' % compression), compresslevel=compression_level) as tf:
+                add_members(tf)
+    return (writer.size, writer.md5)
+
+# ZipFile.open(mode='w') appeared in Python 3.6; before that
+# we can't stream into a ZipInfo we made ourselves.
+_zip_can_write_stream = sys.version_info >= (3, 6)
+
+
+def _zip_info(info, arcname, compression, reproducible_mtime=None):
+    st = info.stat
+    if reproducible_mtime is not None and stat.S_ISLNK(st.st_mode) and os.path.isfile(info.full_path):
+        # zip has no symlinks, so zf.write() would store the linked-to
+        # file with its metadata; store it with normalized metadata.
+        st = os.stat(info.full_path)
+    if not (stat.S_ISREG(st.st_mode) or stat.S_ISDIR(st.st_mode)):
+        return None
+    if stat.S_ISDIR(st.st_mode):
+        arcname = arcname + "/"
+    if reproducible_mtime is None:
+        zinfo = zipfile.ZipInfo(arcname, date_time=time.localtime(st.st_mtime)[0:6])
+        zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+    else:
+        # gmtime, so the archive doesn't depend on the time zone either
+        zinfo = zipfile.ZipInfo(arcname, date_time=time.gmtime(reproducible_mtime)[0:6])
+        zinfo.external_attr = (stat.S_IFMT(st.st_mode) | _reproducible_mode(st.st_mode)) << 16
+    if stat.S_ISDIR(st.st_mode):
+        zinfo.external_attr |= 0x10  # MS-DOS directory flag
+        zinfo.compress_type = zipfile.ZIP_STORED
+        zinfo.file_size = 0
+    else:
+        zinfo.compress_type = compression
+        zinfo.file_size = st.st_size
+    return zinfo
 
+# Members with these extensions are already compressed, so
+# deflating them again would only burn CPU; we store them as-is.
+_PRECOMPRESSED_EXTENSIONS = ('.7z', '.avi', '.bz2', '.gif', '.gz', '.jar', '.jpeg', '.jpg', '.mkv', '.mov', '.mp3',
+                             '.mp4', '.parquet', '.png', '.rar', '.tgz', '.webp', '.whl', '.xz', '.zip', '.zst')
 
-def _write_zip(archive_root_name, infos, filename, frontend):
-    with zipfile.ZipFile(filename, 'w') as zf:
-        for info in _leaf_infos(infos):
-            arcname = os.path.join(archive_root_name, info.relative_path)
-            frontend.info("  added %s" % arcname)
-            zf.write(info.full_path, arcname=arcname)
+# how much of a file we deflate to guess whether deflating it is worthwhile
+_ENTROPY_SAMPLE_SIZE = 64 * 1024
+
+# compressed members bigger than this spill from memory to a temporary file
+_ZIP_SPOOL_SIZE = 4 * 1024 * 1024
+
+
+def _looks_incompressible(sample):
+    if len(sample) < 4096:
+        # too little to go on, and not much to lose
+        return False
+    return len(zlib.compress(sample, 1)) > (len(sample) * 0.95)
+
+
+def _compress_zip_member(info, arcname, compression_level, reproducible_mtime=None):
+    # this runs on a worker thread, and returns (zinfo, compressed file)
+    zinfo = _zip_info(info, arcname, zipfile.ZIP_DEFLATED, reproducible_mtime=reproducible_mtime)
+    if zinfo is None or zinfo.filename.endswith("/"):
+        return (zinfo, None)
+    if info.basename.lower().endswith(_PRECOMPRESSED_EXTENSIONS):
+        zinfo.compress_type = zipfile.ZIP_STORED
+
+    crc = 0
+    size = 0
+    compressed = tempfile.SpooledTemporaryFile(max_size=_ZIP_SPOOL_SIZE)
+    try:
+        with open(info.full_path, 'rb') as f:
+            chunk = f.read(_ENTROPY_SAMPLE_SIZE)
+            if zinfo.compress_type == zipfile.ZIP_DEFLATED and _looks_incompressible(chunk):
+                zinfo.compress_type = zipfile.ZIP_STORED
+            if zinfo.compress_type == zipfile.ZIP_DEFLATED:
+                compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            else:
+                compressor = None
+            while chunk:
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                if compressor is None:
+                    compressed.write(chunk)
+                else:
+                    compressed.write(compressor.compress(chunk))
+                chunk = f.read(_ENTROPY_SAMPLE_SIZE)
+            if compressor is not None:
+                compressed.write(compressor.flush())
+        zinfo.CRC = crc & 0xffffffff
+        zinfo.file_size = size
+        zinfo.compress_size = compressed.tell()
+        compressed.seek(0)
+        return (zinfo, compressed)
+    except Exception:
+        compressed.close()
+        raise
+
+# ZipFile has no public API to add data that's already compressed,
+# so we use these internals if appending a member with them works
+# (see _zip_can_append_compressed()), and otherwise add members
+# through the public API.
+_ZIP_INTERNALS = ('_lock', '_seekable', '_writecheck', '_didModify', 'start_dir', 'fp', 'filelist', 'NameToInfo')
+
+# ZipFile.writestr() takes a compresslevel from Python 3.7 on
+_zip_writestr_has_compresslevel = sys.version_info >= (3, 7)
+
+# zlib's own default, which zipfile uses unless told otherwise
+_DEFAULT_ZIP_COMPRESSION_LEVEL = 6
+
+# None until we've checked
+_zip_append_works = None
+
+
+def _write_zip_member_with_public_api(zf, info, arcname, compression_level, reproducible_mtime=None):
+    # slower (the file is read into memory and compressed on this
+    # thread) but it keeps the same metadata as the parallel path
+    zinfo = _zip_info(info, arcname, zipfile.ZIP_DEFLATED, reproducible_mtime=reproducible_mtime)
+    if zinfo is None:
+        # symlinks and other oddities
+        zf.write(info.full_path, arcname=arcname)
+    elif zinfo.filename.endswith("/"):
+        zf.writestr(zinfo, b'')
+    else:
+        if info.basename.lower().endswith(_PRECOMPRESSED_EXTENSIONS):
+            zinfo.compress_type = zipfile.ZIP_STORED
+        with open(info.full_path, 'rb') as f:
+            data = f.read()
+        if _zip_writestr_has_compresslevel:
+            zf.writestr(zinfo, data, compresslevel=compression_level)
+        else:
+            zf.writestr(zinfo, data)  # pragma: no cover (py2/py3)
+
+
+def _append_compressed_zip_member(zf, zinfo, compressed):
+    # this does what ZipFile.write() does for a directory, plus the data
+    with zf._lock:
+        if zf._seekable:
+            zf.fp.seek(zf.start_dir)
+        zinfo.header_offset = zf.fp.tell()
+        zf._writecheck(zinfo)
+        zf._didModify = True
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
+        zf.fp.write(zinfo.FileHeader(None))
+        shutil.copyfileobj(compressed, zf.fp, 1024 * 64)
+        zf.start_dir = zf.fp.tell()
+
+
+def _zip_append_self_test():
+    # The internals could be there but work differently, so append
+    # a member to a zip in memory, add one the usual way after it,
+    # and check that zipfile reads both back.
+    data = b'anaconda-project'
+    compressor = zlib.compressobj(_DEFAULT_ZIP_COMPRESSION_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = compressor.compress(data) + compressor.flush()
+    zinfo = zipfile.ZipInfo("appended", date_time=(1980, 1, 1, 0, 0, 0))
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.CRC = zlib.crc32(data) & 0xffffffff
+    zinfo.file_size = len(data)
+    zinfo.compress_size = len(compressed)
+    buf = io.BytesIO()
+    try:
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+            if not all([hasattr(zf, name) for name in _ZIP_INTERNALS]):
+                return False
+            _append_compressed_zip_member(zf, zinfo, io.BytesIO(compressed))
+            zf.writestr("added", data)
+        with zipfile.ZipFile(io.BytesIO(buf.getvalue()), 'r') as zf:
+            return zf.testzip() is None and zf.read("appended") == data and zf.read("added") == data
+    except Exception:
+        return False
+
+
+def _zip_can_append_compressed():
+    global _zip_append_works
+    if _zip_append_works is None:
+        _zip_append_works = _zip_can_write_stream and _zip_append_self_test()
+    return _zip_append_works
+
+
+def _write_zip(archive_root_name,
+               infos,
+               filename,
+               frontend,
+               compression_level=None,
+               manifest=None,
+               reproducible_mtime=None):
+    level_was_set = compression_level is not None
+    if compression_level is None:
+        compression_level = _DEFAULT_ZIP_COMPRESSION_LEVEL
+    members = [(info, os.path.join(archive_root_name, info.relative_path)) for info in _leaf_infos(infos)]
+    with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as zf:
+        if manifest is not None:
+            zinfo = zipfile.ZipInfo(
+                os.path.join(archive_root_name, _MANIFEST_FILENAME),
+                date_time=time.gmtime(reproducible_mtime)[0:6])
+            zinfo.external_attr = (stat.S_IFREG | 0o644) << 16
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            zf.writestr(zinfo, manifest)
+
+        if not _zip_can_append_compressed():
+            if level_was_set and not _zip_writestr_has_compresslevel:  # pragma: no cover (py2/py3)
+                frontend.info("Python %d.%d can't set the compression level of a zip archive; using the default." %
+                              sys.version_info[:2])  # pragma: no cover (py2/py3)
+            for (info, arcname) in members:
+                frontend.info("  added %s" % arcname)
+                _write_zip_member_with_public_api(zf,
+                                                  info,
+                                                  arcname,
+                                                  compression_level,
+                                                  reproducible_mtime=reproducible_mtime)
+            return
+
+        # Members are read and compressed on a thread pool, and
+        # appended to the zip in order as they become ready.
+        def compress(member):
+            return _compress_zip_member(member[0], member[1], compression_level, reproducible_mtime=reproducible_mtime)
+
+        with contextlib.closing(parallel_compress.ordered_map(compress, members)) as results:
+            for (index, (zinfo, compressed)) in enumerate(results):
+                (info, arcname) = members[index]
+                frontend.info("  added %s" % arcname)
+                if zinfo is None:
+                    # symlinks and other oddities
+                    zf.write(info.full_path, arcname=arcname)
+                elif compressed is None:
+                    zf.writestr(zinfo, b'')
+                else:
+                    try:
+                        _append_compressed_zip_member(zf, zinfo, compressed)
+                    finally:
+                        compressed.close()
+
+# Reproducible archives carry a manifest of the project's files as
+# their first member, at the top of the project directory.
+_MANIFEST_FILENAME = "anaconda-project-manifest.json"
+
+_MANIFEST_VERSION = 1
+
+
+def _hash_file(full_path):
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(full_path, 'rb') as f:
+        while True:
+            chunk = f.read(1024 * 64)
+            if not chunk:
+                break
+            sha256.update(chunk)
+            size += len(chunk)
+    return (sha256.hexdigest(), size)
+
+
+def _manifest_entry(info):
+    # this runs on a worker thread, and returns (section, path, value)
+    st = info.stat
+    if stat.S_ISDIR(st.st_mode):
+        return ('directories', info.unixified_relative_path, None)
+    elif stat.S_ISLNK(st.st_mode):
+        return ('symlinks', info.unixified_relative_path, os.readlink(info.full_path))
+    else:
+        (sha256, size) = _hash_file(info.full_path)
+        return ('files', info.unixified_relative_path, dict(sha256=sha256,
+                                                            size=size,
+                                                            executable=((st.st_mode & 0o111) != 0)))
+
+
+def _make_manifest(archive_root_name, infos):
+    manifest = dict(anaconda_project_manifest=_MANIFEST_VERSION,
+                    name=archive_root_name,
+                    directories=[],
+                    files=dict(),
+                    symlinks=dict())
+    with contextlib.closing(parallel_compress.ordered_map(_manifest_entry, _leaf_infos(infos))) as entries:
+        for (section, path, value) in entries:
+            if section == 'directories':
+                manifest[section].append(path)
+            else:
+                manifest[section][path] = value
+    return manifest
+
+
+def _manifest_bytes(manifest):
+    # sorted and indented, so it's stable and diffs nicely
+    return (json.dumps(manifest, indent=2, sort_keys=True, separators=(',', ': ')) + "\n").encode('utf-8')
+
+
+def _manifest_digest(manifest):
+    # what a delta archive records about its base
+    manifest = dict(manifest)
+    manifest.pop('delta', None)
+    manifest.pop('unpacked', None)
+    return hashlib.sha256(_manifest_bytes(manifest)).hexdigest()
+
+
+def _file_signature(full_path):
+    stat_result = os.stat(full_path)
+    return [stat_result.st_size, getattr(stat_result, 'st_mtime_ns', stat_result.st_mtime)]
+
+
+def _save_unpacked_manifest(canonical_project_dir, manifest):
+    # Keep the manifest of what we unpacked in the project (archiving
+    # leaves it out), with each file's size and mtime right after we
+    # wrote it, so a delta applied later can tell which files haven't
+    # been touched without hashing them.
+    unpacked = dict(manifest)
+    unpacked.pop('delta', None)
+    signatures = dict()
+    for path in manifest['files']:
+        try:
+            signatures[path] = _file_signature(os.path.join(canonical_project_dir, path.replace("/", os.sep)))
+        except OSError:
+            pass
+    unpacked['unpacked'] = signatures
+    filename = os.path.join(canonical_project_dir, _MANIFEST_FILENAME)
+    tmp_filename = "%s.%s.tmp" % (filename, uuid.uuid4())
+    try:
+        with open(tmp_filename, 'wb') as f:
+            f.write(_manifest_bytes(unpacked))
+        rename_over_existing(tmp_filename, filename)
+    except (IOError, OSError):
+        # without it, a delta checks every file by hashing it
+        pass
+
+
+def _load_unpacked_manifest(canonical_project_dir):
+    try:
+        with codecs.open(os.path.join(canonical_project_dir, _MANIFEST_FILENAME), 'r', 'utf-8') as f:
+            manifest = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get('anaconda_project_manifest') != _MANIFEST_VERSION or \
+       not isinstance(manifest.get('unpacked'), dict):
+        return None
+    return manifest
+
+
+def _is_manifest_member(name):
+    (prefix, remainder) = _split_after_first(name)
+    return remainder == _MANIFEST_FILENAME
+
+
+def _read_archive_manifest(archive_filename):
+    """Get the manifest from a reproducible archive, or None if there isn't one."""
+    (suffix, compression) = _archive_format(archive_filename)
+    if suffix is None or parallel_compress.unavailable_reason(compression) is not None:
+        return None
+    try:
+        data = None
+        if suffix == ".zip":
+            with zipfile.ZipFile(archive_filename, mode='r') as zf:
+                for name in zf.namelist():
+                    if _is_manifest_member(name):
+                        data = zf.read(name)
+                        break
+        else:
+            with _open_tar(archive_filename) as tf:
+                # the manifest is always the first member
+                member = tf.next()
+                if member is not None and member.isreg() and _is_manifest_member(member.name):
+                    data = tf.extractfile(member).read()
+        if data is None:
+            return None
+        manifest = json.loads(data.decode('utf-8'))
+    except Exception:
+        # a missing, truncated, or otherwise broken archive
+        # just means we have nothing to compare with
+        return None
+    if not isinstance(manifest, dict) or manifest.get('anaconda_project_manifest') != _MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def _load_base_manifest(base):
+    # base can be a reproducible archive, or a manifest by itself
+    if base.lower().endswith(".json"):
+        try:
+            with codecs.open(base, 'r', 'utf-8') as f:
+                manifest = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(manifest, dict) or manifest.get('anaconda_project_manifest') != _MANIFEST_VERSION:
+            return None
+        return manifest
+    else:
+        return _read_archive_manifest(base)
+
+
+def _manifest_paths(manifest):
+    return [(section, path) for section in ('directories', 'files', 'symlinks') for path in manifest.get(section, [])]
+
+
+def _add_delta(manifest, base_manifest):
+    """Add the changes since base_manifest to manifest, returning the paths that changed.
+
+    The manifest still describes all of the project files, so a
+    delta built on top of this one works the same as a full one.
+    """
+    base_paths = set(_manifest_paths(base_manifest))
+    paths = set(_manifest_paths(manifest))
+    changed = set()
+    for (section, path) in paths:
+        if section == 'directories':
+            if (section, path) not in base_paths:
+                changed.add(path)
+        elif base_manifest.get(section, {}).get(path) != manifest[section][path]:
+            changed.add(path)
+    # a path that changed from a file to a directory or the like
+    # counts as deleted and then added
+    deleted = sorted(set([path for (section, path) in (base_paths - paths)]))
+    manifest['delta'] = dict(base=_manifest_digest(base_manifest), deleted=deleted)
+    return changed
 
 
 # function exported for project.py
@@ -279,17 +1136,79 @@ def _list_relative_paths_for_unignored_project_files(project_directory, frontend
         return None
     return [info.relative_path for info in infos]
 
+# (filename suffix, compression)
+_ARCHIVE_FORMATS = ((".zip", "zip"), (".tar.gz", "gz"), (".tar.bz2", "bz2"), (".tar.xz", "xz"), (".tar.zst", "zst"),
+                    (".tar", None))
+
+_SUPPORTED_ARCHIVES_DESCRIPTION = ".zip, .tar.gz, .tar.bz2, .tar.xz, or .tar.zst"
+
+
+def _archive_format(filename):
+    lower = filename.lower()
+    for (suffix, compression) in _ARCHIVE_FORMATS:
+        if lower.endswith(suffix):
+            return (suffix, compression)
+    return (None, None)
+
+
+def _check_compression(compression, compression_level):
+    if compression is None:
+        # plain tar doesn't compress
+        return None
+    elif compression in ('zip', 'bz2'):
+        min_level = 0 if compression == 'zip' else 1
+        if compression_level is None or (min_level <= compression_level <= 9):
+            return None
+        else:
+            return "Compression level for %s must be between %d and 9, not %s." % (compression, min_level,
+                                                                                   compression_level)
+    else:
+        reason = parallel_compress.unavailable_reason(compression)
+        if reason is not None:
+            return reason
+        return parallel_compress.check_level(compression, compression_level)
+
+
+class _ArchiveStatus(SimpleStatus):
+    def __init__(self, success, description, unchanged=False, file_count=None, size=None, md5=None):
+        super(_ArchiveStatus, self).__init__(success=success, description=description)
+        self.unchanged = unchanged
+        self.file_count = file_count
+        self.size = size
+        self.md5 = md5
+
 
 # function exported for project_ops.py
-def _archive_project(project, filename):
+def _archive_project(project,
+                     filename,
+                     compression_level=None,
+                     reproducible=False,
+                     check_unchanged=False,
+                     base=None,
+                     compute_md5=False):
     """Make an archive of the non-ignored files in the project.
 
+    A reproducible archive has normalized timestamps, owners, and
+    permissions, and starts with a manifest of the files' sizes
+    and sha256 hashes. With check_unchanged, an existing
+    reproducible archive with the same manifest is left alone.
+
+    With a base, the archive is a reproducible delta archive: it
+    only has the files that differ from the base, and its manifest
+    lists the ones that were deleted.
+
     Args:
         project (``Project``): the project
         filename (str): name for the new zip or tar.gz archive file
+        compression_level (int): compression level, or None for the format's default
+        reproducible (bool): make a reproducible archive
+        check_unchanged (bool): make a reproducible archive, unless filename already is one for the same files
+        base (str): reproducible archive or manifest file to make a delta archive against
+        compute_md5 (bool): compute the MD5 of a tar archive while writing it
 
     Returns:
-        a ``Status``, if failed has ``errors``
+        a ``Status``, if failed has ``errors``, on success has ``unchanged``, ``file_count``,
+        ``size``, and ``md5`` (None unless computed) properties
     """
     failed = project.problems_status()
     if failed is not None:
@@ -299,10 +1218,29 @@ def _archive_project(project, filename):
 
     frontend = _new_error_recorder(project.frontend)
 
+    (suffix, compression) = _archive_format(filename)
+    if suffix is None:
+        frontend.error("Unsupported archive filename %s." % (filename))
+        return SimpleStatus(success=False,
+                            description=("Project archive filename must be a %s." % _SUPPORTED_ARCHIVES_DESCRIPTION),
+                            errors=frontend.pop_errors())
+
+    compression_problem = _check_compression(compression, compression_level)
+    if compression_problem is not None:
+        frontend.error(compression_problem)
+        return SimpleStatus(success=False, description="Can't create an archive.", errors=frontend.pop_errors())
+
     if not os.path.exists(project.project_file.filename):
         frontend.error("%s does not exist." % project.project_file.basename)
         return SimpleStatus(success=False, description="Can't create an archive.", errors=frontend.pop_errors())
 
+    base_manifest = None
+    if base is not None:
+        base_manifest = _load_base_manifest(base)
+        if base_manifest is None:
+            frontend.error("%s is not a reproducible project archive or a manifest." % base)
+            return SimpleStatus(success=False, description="Can't create an archive.", errors=frontend.pop_errors())
+
     # this would most likely happen in a GUI editor, if it reloaded
     # the project from memory but hadn't saved yet.
     if project.project_file.has_unsaved_changes:
@@ -322,22 +1260,57 @@ def _archive_project(project, filename):
     relative_dest_file = subdirectory_relative_to_directory(filename, project.directory_path)
     if not os.path.isabs(relative_dest_file):
         infos = [info for info in infos if info.relative_path != relative_dest_file]
+    # an unpacked reproducible archive shouldn't end up with two manifests
+    infos = [info for info in infos if info.relative_path != _MANIFEST_FILENAME]
+
+    manifest = None
+    reproducible_mtime = None
+    deleted = []
+    if reproducible or check_unchanged or base_manifest is not None:
+        reproducible_mtime = _reproducible_mtime()
+        try:
+            manifest = _make_manifest(project.name, infos)
+        except (IOError, OSError) as e:
+            frontend.error(str(e))
+            return SimpleStatus(success=False,
+                                description="Failed to read files in the project.",
+                                errors=frontend.pop_errors())
+        if base_manifest is not None:
+            changed = _add_delta(manifest, base_manifest)
+            infos = [info for info in infos if info.unixified_relative_path in changed]
+            deleted = manifest['delta']['deleted']
+        manifest = _manifest_bytes(manifest)
+
+    if check_unchanged and _read_archive_manifest(filename) == json.loads(manifest.decode('utf-8')):
+        return _ArchiveStatus(success=True, description=("Project archive %s is unchanged." % filename), unchanged=True)
+
+    file_count = len(_leaf_infos(infos))
+    if manifest is not None:
+        file_count += 1
 
     tmp_filename = filename + ".tmp-" + str(uuid.uuid4())
     try:
-        if filename.lower().endswith(".zip"):
-            _write_zip(project.name, infos, tmp_filename, frontend)
-        elif filename.lower().endswith(".tar.gz"):
-            _write_tar(project.name, infos, tmp_filename, compression="gz", frontend=frontend)
-        elif filename.lower().endswith(".tar.bz2"):
-            _write_tar(project.name, infos, tmp_filename, compression="bz2", frontend=frontend)
-        elif filename.lower().endswith(".tar"):
-            _write_tar(project.name, infos, tmp_filename, compression=None, frontend=frontend)
+        if suffix == ".zip":
+            _write_zip(project.name,
+                       infos,
+                       tmp_filename,
+                       frontend,
+                       compression_level=compression_level,
+                       manifest=manifest,
+                       reproducible_mtime=reproducible_mtime)
+            # ZipFile seeks back to fill in headers, so we can't
+            # digest it as it's written.
+            (size, md5) = (os.path.getsize(tmp_filename), None)
         else:
-            frontend.error("Unsupported archive filename %s." % (filename))
-            return SimpleStatus(success=False,
-                                description="Project archive filename must be a .zip, .tar.gz, or .tar.bz2.",
-                                errors=frontend.pop_errors())
+            (size, md5) = _write_tar(project.name,
+                                     infos,
+                                     tmp_filename,
+                                     compression=compression,
+                                     frontend=frontend,
+                                     compression_level=compression_level,
+                                     manifest=manifest,
+                                     reproducible_mtime=reproducible_mtime,
+                                     compute_md5=compute_md5)
         rename_over_existing(tmp_filename, filename)
     except IOError as e:
         frontend.error(str(e))
@@ -350,6 +1323,9 @@ def _archive_project(project, filename):
         except (IOError, OSError):
             pass
 
+    for path in deleted:
+        frontend.info("  deleted %s" % os.path.join(project.name, path.replace("/", os.sep)))
+
     unlocked = []
     for env_spec in project.env_specs.values():
         if env_spec.lock_set.disabled:
@@ -362,7 +1338,11 @@ def _archive_project(project, filename):
         if len(unlocked) != len(project.env_specs):
             frontend.info("  Unlocked env specs are: " + (", ".join(sorted(unlocked))))
 
-    return SimpleStatus(success=True, description=("Created project archive %s" % filename))
+    return _ArchiveStatus(success=True,
+                          description=("Created project archive %s" % filename),
+                          file_count=file_count,
+                          size=size,
+                          md5=md5)
 
 
 def _list_files_zip(zip_path):
@@ -370,41 +1350,101 @@ def _list_files_zip(zip_path):
         return sorted(zf.namelist())
 
 
+class _ZstdTarStream(object):
+    # zstandard raises ZstdError on corrupt data, which isn't an
+    # IOError or TarError; make it look like any other bad tarball.
+    def __init__(self, raw):
+        self._reader = parallel_compress.zstd_reader(raw)
+
+    def read(self, size=-1):
+        try:
+            return self._reader.read(size)
+        except parallel_compress.zstandard.ZstdError as e:
+            raise tarfile.ReadError("zstd: %s" % str(e))
+
+
+@contextlib.contextmanager
+def _open_tar(tar_path):
+    # We only ever go through the members in order, so we open
+    # the tarball as a stream; that way nothing has to seek in
+    # the uncompressed data, and zstd needs no temporary file.
+    with open(tar_path, 'rb') as raw:
+        try:
+            if tar_path.lower().endswith(".tar.zst"):
+                tf = tarfile.open(fileobj=_ZstdTarStream(raw), mode='r|')
+            else:
+                # tarfile figures out gz, bz2, and xz on its own
+                tf = tarfile.open(fileobj=raw, mode='r|*')
+        except tarfile.ReadError:
+            # the stream reader's errors are less helpful than
+            # the message tarfile.open gives when seeking
+            raise tarfile.ReadError("file could not be opened successfully")
+        with tf:
+            yield tf
+
+
 def _list_files_tar(tar_path):
-    with tarfile.open(tar_path, mode='r') as tf:
+    with _open_tar(tar_path) as tf:
         # we don't want links or block devices or anything weird, they could be a security problem
-        return sorted([member.name for member in tf.getmembers() if member.isreg() or member.isdir()])
+        return sorted([member.name for member in tf if member.isreg() or member.isdir()])
 
+# Python 3.5 made it safe to read several members of one
+# ZipFile at once, from different threads.
+_zip_can_read_concurrently = sys.version_info >= (3, 5)
 
-def _extract_files_zip(zip_path, src_and_dest, frontend):
-    # the zipfile API has no way to extract to a filename of
-    # our choice, so we have to unpack to a temporary location,
-    # then copy those files over.
-    tmpdir = tempfile.mkdtemp()
-    try:
-        with zipfile.ZipFile(zip_path, mode='r') as zf:
-            zf.extractall(tmpdir)
+# members at least this big are unpacked on a thread pool
+_PARALLEL_EXTRACT_SIZE = 1024 * 1024
+
+
+def _extract_zip_member(zf, zinfo, dest):
+    with zf.open(zinfo) as src:
+        with open(dest, 'wb') as f:
+            shutil.copyfileobj(src, f, 1024 * 64)
+
+
+def _extract_files_zip(zip_path, src_and_dest, frontend, workers=None):
+    # Each member streams straight to its destination; big ones
+    # are decompressed on a thread pool while we go on with the
+    # rest, since zlib releases the GIL.
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    with zipfile.ZipFile(zip_path, mode='r') as zf:
+        pool = None
+        pending = []
+        try:
             for (src, dest) in src_and_dest:
                 frontend.info("Unpacking %s to %s" % (src, dest))
-                src_path = os.path.join(tmpdir, src)
-                if os.path.isdir(src_path):
+                zinfo = zf.getinfo(src)
+                if zinfo.filename.endswith("/"):
                     makedirs_ok_if_exists(dest)
-                    shutil.copystat(src_path, dest)
+                    continue
+                makedirs_ok_if_exists(os.path.dirname(dest))
+                if workers > 1 and _zip_can_read_concurrently and zinfo.file_size >= _PARALLEL_EXTRACT_SIZE:
+                    if pool is None:
+                        pool = ThreadPool(workers)
+                    pending.append(pool.apply_async(_extract_zip_member, (zf, zinfo, dest)))
                 else:
-                    makedirs_ok_if_exists(os.path.dirname(dest))
-                    shutil.copy2(src_path, dest)
-    finally:
-        try:
-            shutil.rmtree(tmpdir)
-        except (IOError, OSError):
-            pass
+                    _extract_zip_member(zf, zinfo, dest)
+            for result in pending:
+                result.get()
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
 
 
 def _extract_files_tar(tar_path, src_and_dest, frontend):
-    with tarfile.open(tar_path, mode='r') as tf:
-        for (src, dest) in src_and_dest:
-            frontend.info("Unpacking %s to %s" % (src, dest))
-            member = tf.getmember(src)
+    # one pass through the tarball, rather than a getmember()
+    # (which is a linear search) for each file
+    dests = dict(src_and_dest)
+    with _open_tar(tar_path) as tf:
+        for member in tf:
+            dest = dests.get(member.name)
+            # we filtered out links and other types when listing, but
+            # a member can share its name with one we didn't filter
+            if dest is None or not (member.isreg() or member.isdir()):
+                continue
+            frontend.info("Unpacking %s to %s" % (member.name, dest))
             # we could also use tf._extract_member here, but the
             # solution below with only the public API isn't that
             # bad.
@@ -412,7 +1452,6 @@ def _extract_files_tar(tar_path, src_and_dest, frontend):
                 makedirs_ok_if_exists(os.path.dirname(dest))
                 tf.makefile(member, dest)
             else:
-                assert member.isdir()  # we filtered out other types
                 makedirs_ok_if_exists(dest)
 
             try:
@@ -442,7 +1481,7 @@ def _split_after_first(path):
     return _helper(path, None)
 
 
-def _get_source_and_dest_files(archive_path, list_files, project_dir, parent_dir, frontend):
+def _get_source_and_dest_files(archive_path, list_files, project_dir, parent_dir, frontend, delta=False):
 
     names = list_files(archive_path)
     if len(names) == 0:
@@ -473,7 +1512,12 @@ def _get_source_and_dest_files(archive_path, list_files, project_dir, parent_dir
     # this assertion is because of the check for candidate_prefix == ".." above.
     assert canonical_project_dir.startswith(canonical_parent_dir)
 
-    if os.path.exists(canonical_project_dir):
+    if delta:
+        if not os.path.isdir(canonical_project_dir):
+            frontend.error("Directory '%s' does not exist, so there's nothing to apply a delta archive to." %
+                           canonical_project_dir)
+            return None
+    elif os.path.exists(canonical_project_dir):
         # This is an error to ensure we always do a "fresh" unpack
         # without worrying about overwriting stuff.
         frontend.error("Directory '%s' already exists." % canonical_project_dir)
@@ -489,6 +1533,9 @@ def _get_source_and_dest_files(archive_path, list_files, project_dir, parent_dir
             # this is an entry that's either the prefix dir itself,
             # or a file at the root not in any dir
             continue
+        if remainder == _MANIFEST_FILENAME:
+            # describes the archive, it isn't part of the project
+            continue
         dest = os.path.realpath(os.path.abspath(os.path.join(canonical_project_dir, remainder)))
         # this check deals with ".." in the name for example
         if not dest.startswith(canonical_project_dir):
@@ -500,12 +1547,155 @@ def _get_source_and_dest_files(archive_path, list_files, project_dir, parent_dir
     return (canonical_project_dir, src_and_dest)
 
 
+def _delta_deletions(canonical_project_dir, manifest, frontend):
+    # the deleted paths are as untrusted as the rest of the archive
+    deletions = []
+    for path in manifest['delta']['deleted']:
+        joined = os.path.join(canonical_project_dir, path.replace("/", os.sep))
+        # don't resolve the last component, we delete symlinks, not what they point to
+        parent = os.path.realpath(os.path.dirname(joined))
+        basename = os.path.basename(joined)
+        dest = os.path.join(parent, basename)
+        if basename in ('', '.', '..') or not (parent + os.sep).startswith(canonical_project_dir + os.sep):
+            frontend.error("Archive deletes '%s' which is outside '%s'." % (path, canonical_project_dir))
+            return None
+        deletions.append(dest)
+    return deletions
+
+
+def _delta_base_mismatch(dest, entry):
+    # this runs on a worker thread, and returns None if the file
+    # matches its manifest entry, or what's wrong with it
+    try:
+        if os.path.getsize(dest) != entry['size']:
+            return "has changed"
+        (sha256, size) = _hash_file(dest)
+    except (IOError, OSError):
+        return "is missing"
+    if sha256 != entry['sha256']:
+        return "has changed"
+    return None
+
+
+def _check_delta_base(canonical_project_dir, manifest, src_and_dest, frontend):
+    # The files the delta leaves alone have to be exactly what the
+    # base had (their manifest entries didn't change), or applying
+    # the delta would leave a mix of two versions of the project.
+    # If we unpacked the project, its manifest says which archive
+    # it came from, and which files are as we unpacked them; we
+    # only hash the others.
+    signatures = dict()
+    unpacked = _load_unpacked_manifest(canonical_project_dir)
+    if unpacked is not None:
+        if _manifest_digest(unpacked) != manifest['delta']['base']:
+            frontend.error("Directory '%s' was unpacked from a different archive than the base of the delta archive." %
+                           canonical_project_dir)
+            return False
+        signatures = unpacked['unpacked']
+
+    updated = set([dest for (src, dest) in src_and_dest])
+    to_check = []
+    for (path, entry) in sorted(manifest['files'].items()):
+        dest = os.path.realpath(os.path.join(canonical_project_dir, path.replace("/", os.sep)))
+        if dest in updated:
+            continue
+        if path in signatures:
+            try:
+                if _file_signature(dest) == signatures[path]:
+                    continue
+            except OSError:
+                pass
+        to_check.append((path, dest, entry))
+
+    def check(item):
+        return _delta_base_mismatch(item[1], item[2])
+
+    with contextlib.closing(parallel_compress.ordered_map(check, to_check)) as problems:
+        for ((path, dest, entry), problem) in zip(to_check, problems):
+            if problem is not None:
+                frontend.error("Directory '%s' doesn't match the base of the delta archive: %s %s." %
+                               (canonical_project_dir, path, problem))
+                return False
+
+    return True
+
+
+def _apply_deletions(canonical_project_dir, deletions, manifest, frontend):
+    keep_directories = set([os.path.realpath(os.path.join(canonical_project_dir, path.replace("/", os.sep)))
+                            for path in manifest['directories']])
+    # children before their parents
+    for dest in sorted(deletions, reverse=True):
+        frontend.info("Deleting %s" % dest)
+        try:
+            if os.path.isdir(dest) and not os.path.islink(dest):
+                os.rmdir(dest)
+            else:
+                os.remove(dest)
+        except OSError as e:
+            # it's already gone, or it's a directory with files
+            # the project doesn't know about (like envs)
+            if e.errno not in (errno.ENOENT, errno.ENOTEMPTY, errno.EEXIST):
+                raise e
+            continue
+        # don't leave behind directories the project no longer has
+        parent = os.path.dirname(dest)
+        while parent != canonical_project_dir and parent not in keep_directories:
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+
+
 class _UnarchiveStatus(SimpleStatus):
     def __init__(self, success, description, project_dir):
         super(_UnarchiveStatus, self).__init__(success=success, description=description)
         self.project_dir = project_dir
 
 
+def _apply_delta_archive(archive_filename, manifest, list_files, extract_files, project_dir, parent_dir, frontend):
+    def failed():
+        return SimpleStatus(success=False,
+                            description=("Could not apply delta archive %s" % archive_filename),
+                            errors=frontend.pop_errors())
+
+    result = _get_source_and_dest_files(archive_filename, list_files, project_dir, parent_dir, frontend, delta=True)
+    if result is None:
+        return failed()
+    (canonical_project_dir, src_and_dest) = result
+
+    deletions = _delta_deletions(canonical_project_dir, manifest, frontend)
+    if deletions is None:
+        return failed()
+
+    if not _check_delta_base(canonical_project_dir, manifest, src_and_dest, frontend):
+        return failed()
+
+    # Unpack into a staging directory first, so a corrupt archive
+    # or a full disk leaves the project as it was; then the changes
+    # are only deletions and renames.
+    staging_dir = os.path.join(canonical_project_dir, ".anaconda-project-delta-" + str(uuid.uuid4()))
+    staged = [(src, os.path.join(staging_dir, os.path.relpath(dest, canonical_project_dir)))
+              for (src, dest) in src_and_dest]
+    try:
+        extract_files(archive_filename, staged, frontend)
+        _apply_deletions(canonical_project_dir, deletions, manifest, frontend)
+        for ((src, dest), (_, staged_dest)) in zip(src_and_dest, staged):
+            if os.path.isdir(staged_dest):
+                makedirs_ok_if_exists(dest)
+            else:
+                makedirs_ok_if_exists(os.path.dirname(dest))
+                rename_over_existing(staged_dest, dest)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    _save_unpacked_manifest(canonical_project_dir, manifest)
+
+    return _UnarchiveStatus(success=True,
+                            description=("Delta archive applied to %s." % canonical_project_dir),
+                            project_dir=canonical_project_dir)
+
+
 # function exported for project_ops.py
 def _unarchive_project(archive_filename, project_dir, frontend, parent_dir=None):
     """Unpack an archive of files in the project.
@@ -521,6 +1711,9 @@ def _unarchive_project(archive_filename, project_dir, frontend, parent_dir=None)
     If parent_dir is non-None, place the project_dir in it. This is most useful
     if project_dir is None.
 
+    A delta archive is applied to the existing project_dir,
+    rather than unpacked into a new one.
+
     Args:
         archive_filename (str): the tar or zip archive file
         project_dir (str): the directory that will contain the project config file
@@ -536,19 +1729,33 @@ def _unarchive_project(archive_filename, project_dir, frontend, parent_dir=None)
 
     list_files = None
     extract_files = None
-    if archive_filename.endswith(".zip"):
+    (suffix, compression) = _archive_format(archive_filename)
+    if suffix == ".zip":
         list_files = _list_files_zip
         extract_files = _extract_files_zip
-    elif any([archive_filename.endswith(suffix) for suffix in [".tar", ".tar.gz", ".tar.bz2"]]):
+    elif suffix is not None:
         list_files = _list_files_tar
         extract_files = _extract_files_tar
     else:
-        frontend.error("Unsupported archive filename %s, must be a .zip, .tar.gz, or .tar.bz2" % (archive_filename))
+        frontend.error("Unsupported archive filename %s, must be a %s" %
+                       (archive_filename, _SUPPORTED_ARCHIVES_DESCRIPTION))
+        return SimpleStatus(success=False,
+                            description=("Could not unpack archive %s" % archive_filename),
+                            errors=frontend.pop_errors())
+
+    unavailable = parallel_compress.unavailable_reason(compression)
+    if unavailable is not None:  # pragma: no cover (missing zstandard, or py2 for xz)
+        frontend.error(unavailable)
         return SimpleStatus(success=False,
                             description=("Could not unpack archive %s" % archive_filename),
                             errors=frontend.pop_errors())
 
     try:
+        manifest = _read_archive_manifest(archive_filename)
+        if manifest is not None and 'delta' in manifest:
+            return _apply_delta_archive(archive_filename, manifest, list_files, extract_files, project_dir, parent_dir,
+                                        frontend)
+
         result = _get_source_and_dest_files(archive_filename, list_files, project_dir, parent_dir, frontend)
         if result is None:
             return SimpleStatus(success=False,
@@ -574,6 +1781,9 @@ def _unarchive_project(archive_filename, project_dir, frontend, parent_dir=None)
                 pass
             raise e
 
+        if manifest is not None:
+            _save_unpacked_manifest(canonical_project_dir, manifest)
+
         return _UnarchiveStatus(success=True,
                                 description=("Project archive unpacked to %s." % canonical_project_dir),
                                 project_dir=canonical_project_dir)
@@ -8,9 +8,11 @@
 """Talking to the Anaconda server."""
 from __future__ import absolute_import, print_function
 
+import base64
 import logging
 import os
 import tarfile
+import time
 import zipfile
 
 import requests
@@ -20,6 +22,14 @@ from binstar_client.errors import BinstarError, Unauthorized
 
 from anaconda_project.internal.simple_status import SimpleStatus
 
+# how many times we try a request to S3 before giving up, and how
+# long we wait before the first retry (doubling each time after)
+_UPLOAD_ATTEMPTS = 5
+_UPLOAD_RETRY_DELAY = 1.0
+
+# (connect, read) timeouts in seconds
+_WHOLE_FILE_TIMEOUT = (60, 10 * 60 * 60)
+
 
 class _Client(object):
     def __init__(self, site=None, username=None, token=None, log_level=None):
@@ -29,6 +39,10 @@ class _Client(object):
         self._api = binstar_utils.get_server_api(site=site, token=token, log_level=log_level)
         self._user_info = None
         self._force_username = username
+        # Talking to S3 goes through its own session, so it
+        # doesn't get our Anaconda credentials; reusing one session
+        # keeps the connection to S3 alive across retries.
+        self._s3_session = requests.Session()
 
     def _username(self):
         """Get username to upload to; raise Unauthorized if we aren't logged in."""
@@ -45,6 +59,20 @@ class _Client(object):
         # using a little private API here.
         self._api._check_response(res, allowed=list(allowed))
 
+    def _retrying(self, make_request):
+        """Make a request, retrying with backoff on connection problems or server errors."""
+        delay = _UPLOAD_RETRY_DELAY
+        for attempt in range(1, _UPLOAD_ATTEMPTS + 1):
+            try:
+                res = make_request()
+                if res.status_code < 500 or attempt == _UPLOAD_ATTEMPTS:
+                    return res
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == _UPLOAD_ATTEMPTS:
+                    raise BinstarError("Upload failed after %d attempts: %s" % (attempt, e))
+            time.sleep(delay)
+            delay = delay * 2
+
     # HACK ALERT: using this is a workaround for
     # https://github.com/Anaconda-Platform/anaconda-server/issues/2229
     def _exists(self, project_name):
@@ -72,11 +100,14 @@ class _Client(object):
                 return len(zf.namelist())
         assert False, ("unsupported archive filename %s" % archive_filename)  # pragma: no cover (should not be reached)
 
-    def stage(self, project_info, archive_filename, uploaded_basename):
+    def stage(self, project_info, archive_filename, uploaded_basename, file_count=None, size=None):
         url = "{}/apps/{}/projects/{}/stage".format(self._api.domain, self._username(), project_info['name'])
         config = project_info.copy()
-        config['size'] = os.path.getsize(archive_filename)
-        file_count = self._file_count(archive_filename)
+        if size is None:
+            size = os.path.getsize(archive_filename)
+        config['size'] = size
+        if file_count is None:
+            file_count = self._file_count(archive_filename)
         if file_count is not None:
             config['num_of_files'] = file_count
         json = {'basename': uploaded_basename, 'configuration': config}
@@ -93,36 +124,49 @@ class _Client(object):
         self._check_response(res)
         return res
 
-    def _put_on_s3(self, archive_filename, uploaded_basename, url, s3data):
-        with open(archive_filename, 'rb') as f:
-            _hexmd5, b64md5, size = binstar_utils.compute_hash(f, size=os.path.getsize(archive_filename))
+    def _put_on_s3(self, archive_filename, uploaded_basename, url, s3data, md5=None, size=None):
+        if md5 is None or size is None:
+            with open(archive_filename, 'rb') as f:
+                _hexmd5, b64md5, size = binstar_utils.compute_hash(f, size=os.path.getsize(archive_filename))
+        else:
+            # computed while the archive was written, saving a pass over it
+            b64md5 = base64.b64encode(md5).decode('ascii')
 
         s3data = s3data.copy()  # don't modify our parameters
         s3data['Content-Length'] = size
         s3data['Content-MD5'] = b64md5
 
-        with open(archive_filename, 'rb') as archive_file_object:
-            data_stream, headers = binstar_requests_ext.stream_multipart(
-                s3data,
-                files={'file': (uploaded_basename, archive_file_object)})
-
-            res = requests.post(url,
-                                data=data_stream,
-                                verify=self._api.session.verify,
-                                timeout=10 * 60 * 60,
-                                headers=headers)
-            self._check_response(res)
+        def post():
+            with open(archive_filename, 'rb') as archive_file_object:
+                data_stream, headers = binstar_requests_ext.stream_multipart(
+                    s3data,
+                    files={'file': (uploaded_basename, archive_file_object)})
+
+                return self._s3_session.post(url,
+                                             data=data_stream,
+                                             verify=self._api.session.verify,
+                                             timeout=_WHOLE_FILE_TIMEOUT,
+                                             headers=headers)
+
+        res = self._retrying(post)
+        self._check_response(res)
         return res
 
-    def upload(self, project_info, archive_filename, uploaded_basename):
-        """Upload archive_filename created from project, throwing BinstarError."""
+    def upload(self, project_info, archive_filename, uploaded_basename, file_count=None, size=None, md5=None):
+        """Upload archive_filename created from project, throwing BinstarError.
+
+        The file count, size, and MD5 digest of the archive are
+        computed from the file unless they're passed in.
+        """
         if not self._exists(project_info['name']):
             res = self.create(project_info=project_info)
             assert res.status_code in (200, 201)
 
         res = self.stage(project_info=project_info,
                          archive_filename=archive_filename,
-                         uploaded_basename=uploaded_basename)
+                         uploaded_basename=uploaded_basename,
+                         file_count=file_count,
+                         size=size)
         assert res.status_code in (200, 201)
 
         stage_info = res.json()
@@ -134,7 +178,9 @@ class _Client(object):
         res = self._put_on_s3(archive_filename,
                               uploaded_basename,
                               url=stage_info['post_url'],
-                              s3data=stage_info['form_data'])
+                              s3data=stage_info['form_data'],
+                              md5=md5,
+                              size=size)
         assert res.status_code in (200, 201)
 
         res = self.commit(project_info['name'], stage_info['dist_id'])
@@ -156,12 +202,25 @@ class _UploadedStatus(SimpleStatus):
 # require any other files to import binstar_client).
 # archive_filename is the path to a local tmp file to upload
 # uploaded_basename is the filename the server should remember
-def _upload(project, archive_filename, uploaded_basename, site=None, username=None, token=None, log_level=None):
+# archive_status, if given, has the file_count, size, and md5 from making the archive
+def _upload(project,
+            archive_filename,
+            uploaded_basename,
+            site=None,
+            username=None,
+            token=None,
+            log_level=None,
+            archive_status=None):
     assert not project.problems
 
+    if archive_status is None:
+        archive_info = dict()
+    else:
+        archive_info = dict(file_count=archive_status.file_count, size=archive_status.size, md5=archive_status.md5)
+
     client = _Client(site=site, username=username, token=token, log_level=log_level)
     try:
-        json = client.upload(project.publication_info(), archive_filename, uploaded_basename)
+        json = client.upload(project.publication_info(), archive_filename, uploaded_basename, **archive_info)
         return _UploadedStatus(json)
     except Unauthorized as e:
         return SimpleStatus(success=False,
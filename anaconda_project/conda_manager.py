@@ -9,13 +9,11 @@
 from __future__ import absolute_import
 
 from abc import ABCMeta, abstractmethod
-from copy import deepcopy
 import difflib
 
 from anaconda_project.yaml_file import (_CommentedMap, _CommentedSeq, _block_style_all_nodes)
 from anaconda_project.internal.metaclass import with_metaclass
 from anaconda_project.internal import conda_api
-from anaconda_project.env_spec import _combine_conda_package_lists
 
 _conda_manager_classes = []
 
@@ -255,7 +253,12 @@ def _pretty_diff(old_list, new_list, indent):
 
 
 class CondaLockSet(object):
-    """Represents a locked set of package versions."""
+    """Represents a locked set of package versions.
+
+    Lock sets are immutable (except that ``env_spec_hash`` can be
+    set once), so the merged package list for each platform is
+    only computed the first time it's asked for.
+    """
 
     def __init__(self, package_specs_by_platform, platforms, enabled=True, env_spec_hash=None, missing=False):
         """Construct a ``CondaLockSet``.
@@ -273,12 +276,18 @@ class CondaLockSet(object):
         """
         assert package_specs_by_platform is not None
         assert platforms is not None
-        # we deepcopy this to avoid sharing issues
-        self._package_specs_by_platform = deepcopy(package_specs_by_platform)
+        # tuples so nobody can modify the lists we were given, or
+        # the ones we hand out, out from under us
+        self._package_specs_by_platform = dict((platform, tuple(specs))
+                                               for (platform, specs) in package_specs_by_platform.items())
         self._platforms = tuple(conda_api.sort_platform_list(platforms))
         self._enabled = enabled
         self._env_spec_hash = env_spec_hash
         self._missing = missing
+        # platform name or "all" etc. -> ((name, spec), ...)
+        self._parsed_specs_by_key = dict()
+        # platform -> (merged package specs, dict from name to spec)
+        self._merged_by_platform = dict()
 
     @property
     def platforms(self):
@@ -374,25 +383,64 @@ class CondaLockSet(object):
 
         return "\n".join(platforms_diff + packages_diff)
 
-    def package_specs_for_platform(self, platform):
-        """Sequence of package spec strings for the requested platform."""
+    def _parsed_specs(self, key):
+        # (package name or None if invalid, spec) for each spec in one of our lists
+        parsed = self._parsed_specs_by_key.get(key, None)
+        if parsed is None:
+            parsed = []
+            for spec in self._package_specs_by_platform.get(key, ()):
+                parsed_spec = conda_api.parse_spec(spec)
+                parsed.append((None if parsed_spec is None else parsed_spec.name, spec))
+            parsed = tuple(parsed)
+            self._parsed_specs_by_key[key] = parsed
+        return parsed
+
+    def _merged_for_platform(self, platform):
         assert platform in self.platforms
         assert self.enabled
 
-        # we merge "all", "unix", "linux", then "linux-64" for example
-        shared = self._package_specs_by_platform.get("all", [])
+        merged = self._merged_by_platform.get(platform, None)
+        if merged is not None:
+            return merged
 
+        # we merge "all", "unix", "linux", then "linux-64" for example,
+        # with each list replacing same-named packages from the ones
+        # before it (like _combine_conda_package_lists), and parse
+        # each list only once no matter how many platforms use it.
         platform_name = conda_api.parse_platform(platform)[0]
-
+        keys = ["all"]
         if platform_name in conda_api.unix_platform_names:
-            shared_unix = self._package_specs_by_platform.get("unix", [])
-            shared = _combine_conda_package_lists(shared, shared_unix)
+            keys.append("unix")
+        keys.extend([platform_name, platform])
+
+        reversed_specs = []
+        later_names = set()
+        for key in reversed(keys):
+            parsed = self._parsed_specs(key)
+            # a broken spec is combined by the whole spec
+            names = [spec if name is None else name for (name, spec) in parsed]
+            for (combine_name, (name, spec)) in reversed(list(zip(names, parsed))):
+                if combine_name not in later_names:
+                    reversed_specs.append((name, spec))
+            later_names.update(names)
+
+        merged_specs = tuple(reversed(reversed_specs))
+        specs_by_name = dict((name, spec) for (name, spec) in merged_specs if name is not None)
+        merged = (tuple(spec for (name, spec) in merged_specs), specs_by_name)
+        self._merged_by_platform[platform] = merged
+        return merged
 
-        shared_across_bits = self._package_specs_by_platform.get(platform_name, [])
-        shared = _combine_conda_package_lists(shared, shared_across_bits)
+    def package_specs_for_platform(self, platform):
+        """Sequence of package spec strings for the requested platform."""
+        return self._merged_for_platform(platform)[0]
 
-        per_platform = self._package_specs_by_platform.get(platform, [])
-        return _combine_conda_package_lists(shared, per_platform)
+    def package_specs_by_name_for_platform(self, platform):
+        """Dict from package name to spec string for the requested platform.
+
+        The dict is shared by all callers, so don't modify it.
+        Invalid specs aren't in it.
+        """
+        return self._merged_for_platform(platform)[1]
 
     @property
     def package_specs_for_current_platform(self):
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Fixtures shared by all the tests."""
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from anaconda_project.requirements_registry.providers import redis
+
+
+@pytest.fixture(autouse=True)
+def _isolated_user_cache(monkeypatch, tmpdir):
+    """Keep tests from writing to the real per-user cache directory."""
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_PATH', str(tmpdir.join("user-cache")))
+
+
+@pytest.fixture(autouse=True)
+def _fresh_redis_liveness_cache(monkeypatch):
+    """Keep Redis liveness answers from one test out of the next."""
+    monkeypatch.setattr(redis, '_liveness_cache', dict())
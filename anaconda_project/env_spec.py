@@ -28,12 +28,13 @@ except ImportError:  # pragma: no cover
     import ruamel.yaml as ryaml  # pragma: no cover
 
 
-def _combine_keeping_last_duplicate(items1, items2, key_func=None):
-    def default_key(item):
-        return item
+def _identity(item):
+    return item
+
 
+def _combine_keeping_last_duplicate(items1, items2, key_func=None):
     if key_func is None:
-        key_func = default_key
+        key_func = _identity
     items2_keys = set([key_func(item) for item in items2])
     combined = list([item for item in items1 if key_func(item) not in items2_keys])
     combined = combined + list(items2)
@@ -102,6 +103,9 @@ class EnvSpec(object):
         self._inherit_from = inherit_from
         self._lock_set = lock_set
         self._platforms = tuple(conda_api.sort_platform_list(platforms))
+        self._ancestors = None
+        # public attribute name -> combined with what we inherit
+        self._inherited = dict()
 
         # inherit_from must be a subset of inherit_from_names
         # except that we can have an anonymous base env spec for
@@ -112,13 +116,17 @@ class EnvSpec(object):
         for name in tuple([spec.name for spec in self._inherit_from]):
             assert name is None or name in self._inherit_from_names
 
-        conda_specs_by_name = dict()
-        for spec in self.conda_packages_for_create:
-            # we quietly skip invalid specs here and let them fail
-            # somewhere we can more easily report an error message.
-            parsed = conda_api.parse_spec(spec)
-            if parsed is not None:
-                conda_specs_by_name[parsed.name] = spec
+        if self._uses_lock_set:
+            # the lock set has this indexed already
+            conda_specs_by_name = self._lock_set.package_specs_by_name_for_platform(conda_api.current_platform())
+        else:
+            conda_specs_by_name = dict()
+            for spec in self.conda_packages:
+                # we quietly skip invalid specs here and let them fail
+                # somewhere we can more easily report an error message.
+                parsed = conda_api.parse_spec(spec)
+                if parsed is not None:
+                    conda_specs_by_name[parsed.name] = spec
         self._conda_specs_for_create_by_name = conda_specs_by_name
 
         name_set = set()
@@ -206,31 +214,53 @@ class EnvSpec(object):
         return self._import_hash
 
     def _get_inherited(self, public_attr, key_func=None):
-        private_attr = '_' + public_attr
+        # we're immutable, so this only has to be done once
+        combined = self._inherited.get(public_attr)
+        if combined is None:
+            private_attr = '_' + public_attr
 
-        def getter(spec):
-            return getattr(spec, private_attr)
+            def getter(spec):
+                return getattr(spec, private_attr)
 
-        return self._get_inherited_with_getter(getter, key_func=key_func)
+            combined = self._get_inherited_with_getter(getter, key_func=key_func)
+            self._inherited[public_attr] = combined
+        return combined
+
+    def _linearized_ancestors(self):
+        if self._ancestors is None:
+
+            def linearize(specs, accumulator):
+                for spec in specs:
+                    if spec not in accumulator:
+                        linearize(spec._inherit_from, accumulator)
+                        accumulator.append(spec)
+
+            ancestors = []
+            linearize([self], ancestors)
+            assert ancestors[-1] is self
+            self._ancestors = tuple(ancestors)
+        return self._ancestors
 
     def _get_inherited_with_getter(self, getter, key_func=None):
-        def _linearized_ancestors(specs, accumulator):
-            for spec in specs:
-                if spec not in accumulator:
-                    _linearized_ancestors(spec._inherit_from, accumulator)
-                    accumulator.append(spec)
-
-        ancestors = []
-        _linearized_ancestors([self], ancestors)
-        assert ancestors[-1] is self
-
-        to_combine = []
-        for spec in ancestors:
-            to_combine.append(getter(spec))
+        if key_func is None:
+            key_func = _identity
+
+        # The same as combining each ancestor's items into the
+        # ones before with _combine_keeping_last_duplicate(), but
+        # without recomputing every key at each step: going
+        # backward, an item is kept unless an item with the same
+        # key comes from a later spec.
+        later_keys = set()
+        kept = []
+        for spec in reversed(self._linearized_ancestors()):
+            items = getter(spec)
+            keys = [key_func(item) for item in items]
+            kept.append([item for (item, key) in zip(items, keys) if key not in later_keys])
+            later_keys.update(keys)
         combined = []
-        for item in to_combine:
-            combined = _combine_keeping_last_duplicate(combined, item, key_func=key_func)
-        return combined
+        for items in reversed(kept):
+            combined.extend(items)
+        return tuple(combined)
 
     @property
     def conda_packages(self):
@@ -272,10 +302,14 @@ class EnvSpec(object):
         """Get ``CondaLockSet`` for this env spec."""
         return self._lock_set
 
+    @property
+    def _uses_lock_set(self):
+        return self._lock_set is not None and self._lock_set.enabled and self._lock_set.supports_current_platform
+
     @property
     def conda_packages_for_create(self):
         """Get conda packages (preferring the lock set list if present)."""
-        if self._lock_set is not None and self._lock_set.enabled and self._lock_set.supports_current_platform:
+        if self._uses_lock_set:
             return self._lock_set.package_specs_for_current_platform
         else:
             return self.conda_packages
@@ -517,10 +551,12 @@ def _load_importable(filename):
     else:
         return _load_environment_yml(filename)
 
+# files we can import an env spec from, in order of preference
+_IMPORTABLE_FILENAMES = ("environment.yml", "environment.yaml", 'requirements.txt')
+
 
 def _find_importable_spec(directory_path):
-    filenames = ("environment.yml", "environment.yaml", 'requirements.txt')
-    for filename in filenames:
+    for filename in _IMPORTABLE_FILENAMES:
         full = os.path.join(directory_path, filename)
         spec = _load_importable(full)
         if spec is not None:
@@ -9,13 +9,25 @@
 from __future__ import absolute_import
 
 from abc import ABCMeta, abstractmethod
+from collections import namedtuple
 
 from anaconda_project.internal.metaclass import with_metaclass
 
+# phase is e.g. 'solve', 'fetch', or 'link'; package is None for
+# the event that ends a phase; fraction is 0.0-1.0; bytes is how
+# much of the package has been fetched, or None if unknown; seconds
+# is how long the phase has been going.
+ProgressEvent = namedtuple('ProgressEvent', ['phase', 'package', 'fraction', 'bytes', 'seconds'])
+
 
 class Frontend(with_metaclass(ABCMeta)):
     """A UX (CLI, GUI, etc.) for project operations."""
 
+    # Subtypes that override progress() should set this to True.
+    # Conda then reports structured progress events instead of
+    # the text it would print in a terminal.
+    structured_progress = False
+
     def __init__(self):
         """Construct a Frontend."""
         self._info_buf = ''
@@ -58,6 +70,18 @@ class Frontend(with_metaclass(ABCMeta)):
         """
         self._error_buf = self._partial(data, self._error_buf, self.error)
 
+    def progress(self, event):
+        """Report progress on a long-running operation such as creating an environment.
+
+        Only called if ``structured_progress`` is True. When a
+        phase ends, this gets an event with ``package`` of None
+        and ``seconds`` set to how long the whole phase took.
+
+        Args:
+            event (ProgressEvent): what happened
+        """
+        pass
+
     @abstractmethod
     def info(self, message):
         """Log an info-level message."""
@@ -119,6 +143,15 @@ class _ErrorRecordingFrontendProxy(Frontend):
         self._errors = []
         self.underlying = underlying
 
+    @property
+    def structured_progress(self):
+        """Whether the underlying frontend wants progress events."""
+        return self.underlying.structured_progress
+
+    def progress(self, event):
+        """Report progress."""
+        self.underlying.progress(event)
+
     def info(self, message):
         """Log an info-level message."""
         self.underlying.info(message)
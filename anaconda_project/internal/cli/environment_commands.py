@@ -101,7 +101,7 @@ def remove_platforms(project, environment, platforms):
 
 def list_env_specs(project_dir):
     """List environments in the project."""
-    project = load_project(project_dir)
+    project = load_project(project_dir, read_only=True)
     if console_utils.print_project_problems(project):
         return 1
     print("Environments for project: {}\n".format(project_dir))
@@ -111,7 +111,7 @@ def list_env_specs(project_dir):
 
 def list_packages(project_dir, environment):
     """List the packages for an environment in the project."""
-    project = load_project(project_dir)
+    project = load_project(project_dir, read_only=True)
     if console_utils.print_project_problems(project):
         return 1
     if environment is None:
@@ -127,7 +127,7 @@ def list_packages(project_dir, environment):
 
 def list_platforms(project_dir, environment):
     """List the platforms for an environment in the project."""
-    project = load_project(project_dir)
+    project = load_project(project_dir, read_only=True)
     if console_utils.print_project_problems(project):
         return 1
     if environment is None:
@@ -141,12 +141,12 @@ def list_platforms(project_dir, environment):
     return 0
 
 
-def lock(project_dir, env_spec_name):
+def lock(project_dir, env_spec_name, package_table=None):
     """Lock dependency versions."""
     project = load_project(project_dir)
     if console_utils.print_project_problems(project):
         return 1
-    status = project_ops.lock(project, env_spec_name=env_spec_name)
+    status = project_ops.lock(project, env_spec_name=env_spec_name, package_table=package_table)
     return _handle_status(status)
 
 
@@ -220,7 +220,7 @@ def main_list_platforms(args):
 
 def main_lock(args):
     """Lock dependency versions and return exit status code."""
-    return lock(args.directory, args.name)
+    return lock(args.directory, args.name, args.package_table)
 
 
 def main_update(args):
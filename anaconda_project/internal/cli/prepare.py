@@ -19,7 +19,7 @@ def prepare_command(project_dir, ui_mode, conda_environment, command_name):
     Returns:
         Prepare result (can be treated as True on success).
     """
-    project = load_project(project_dir)
+    project = load_project(project_dir, read_only=True)
     if console_utils.print_project_problems(project):
         return False
     result = prepare_with_ui_mode_printing_errors(project,
@@ -16,19 +16,9 @@ from anaconda_project.requirements_registry.requirements.conda_env import CondaE
 from anaconda_project.provide import (PROVIDE_MODE_PRODUCTION, PROVIDE_MODE_DEVELOPMENT, PROVIDE_MODE_CHECK)
 
 import anaconda_project.internal.cli.console_utils as console_utils
-
-# these UI_MODE_ strings are used as values for command line options, so they are user-visible
-
-# ASK_QUESTIONS mode is supposed to ask about default actions too,
-# like whether to start servers.  It isn't implemented yet.
-UI_MODE_TEXT_ASK_QUESTIONS = "ask"
-UI_MODE_TEXT_DEVELOPMENT_DEFAULTS_OR_ASK = "development_defaults_or_ask"
-UI_MODE_TEXT_ASSUME_YES_PRODUCTION = "production_defaults"
-UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT = "development_defaults"
-UI_MODE_TEXT_ASSUME_NO = "check"
-
-_all_ui_modes = (UI_MODE_TEXT_ASK_QUESTIONS, UI_MODE_TEXT_DEVELOPMENT_DEFAULTS_OR_ASK,
-                 UI_MODE_TEXT_ASSUME_YES_PRODUCTION, UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT, UI_MODE_TEXT_ASSUME_NO)
+from anaconda_project.internal.cli.ui_modes import (
+    UI_MODE_TEXT_ASK_QUESTIONS, UI_MODE_TEXT_DEVELOPMENT_DEFAULTS_OR_ASK, UI_MODE_TEXT_ASSUME_YES_PRODUCTION,
+    UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT, UI_MODE_TEXT_ASSUME_NO, _all_ui_modes)
 
 
 def _interactively_fix_missing_variables(project, result):
@@ -35,9 +35,13 @@ class CliFrontend(Frontend):
         sys.stderr.flush()
 
 
-def load_project(dirname):
-    """Load a Project, fixing it if needed and possible."""
-    project = Project(dirname, frontend=CliFrontend())
+def load_project(dirname, read_only=False):
+    """Load a Project, fixing it if needed and possible.
+
+    Commands that only read the project should pass ``read_only=True``
+    so the project loads faster.
+    """
+    project = Project(dirname, frontend=CliFrontend(), read_only=read_only)
 
     if console_utils.stdin_is_interactive():
         had_fixable = len(project.fixable_problems) > 0
@@ -38,7 +38,7 @@ def run_command(project_dir, ui_mode, conda_environment, command_name, extra_com
     Returns:
         Does not return if successful.
     """
-    project = load_project(project_dir)
+    project = load_project(project_dir, read_only=True)
 
     if project.has_bootstrap_env_spec() and not project.is_running_in_bootstrap_env():
         print("Project should be ran by bootstrap env... fixing.")
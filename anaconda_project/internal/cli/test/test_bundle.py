@@ -8,6 +8,7 @@
 from __future__ import absolute_import, print_function
 
 import os
+import tarfile
 import zipfile
 
 from anaconda_project.internal.cli.main import _parse_args_and_run_subcommand
@@ -68,3 +69,79 @@ def test_archive_command_on_invalid_project(capsys):
                 'Unable to load the project.\n') in err
 
     with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: "variables:\n  42"}, check)
+
+
+def test_archive_command_with_compression_level(capsys):
+    def check(dirname):
+        archivefile = os.path.join(dirname, "foo.tar.gz")
+        code = _parse_args_and_run_subcommand(['anaconda-project', 'archive', '--directory', dirname,
+                                               '--compression-level', '1', archivefile])
+        assert code == 0
+
+        out, err = capsys.readouterr()
+        assert ('Created project archive %s\n' % archivefile) in out
+        assert '' == err
+
+        with tarfile.open(archivefile, mode='r') as tf:
+            assert [os.path.basename(x) for x in sorted(tf.getnames())] == [DEFAULT_PROJECT_FILENAME, "foo.py"]
+
+    with_directory_contents_completing_project_file({'foo.py': 'print("hello")\n'}, check)
+
+
+def test_archive_command_with_bad_compression_level(capsys):
+    def check(dirname):
+        archivefile = os.path.join(dirname, "foo.tar.gz")
+        code = _parse_args_and_run_subcommand(['anaconda-project', 'archive', '--directory', dirname,
+                                               '--compression-level', '42', archivefile])
+        assert code == 1
+
+        out, err = capsys.readouterr()
+        assert "Compression level for gz must be between 0 and 9, not 42.\nCan't create an archive.\n" == err
+        assert '' == out
+        assert not os.path.exists(archivefile)
+
+    with_directory_contents_completing_project_file({'foo.py': 'print("hello")\n'}, check)
+
+
+def test_archive_command_check_unchanged(capsys):
+    def check(dirname):
+        archivefile = os.path.join(dirname, "foo.tar.gz")
+        code = _parse_args_and_run_subcommand(['anaconda-project', 'archive', '--directory', dirname, '--reproducible',
+                                               archivefile])
+        assert code == 0
+        out, err = capsys.readouterr()
+        assert ('Created project archive %s\n' % archivefile) in out
+
+        code = _parse_args_and_run_subcommand(['anaconda-project', 'archive', '--directory', dirname,
+                                               '--check-unchanged', archivefile])
+        assert code == 0
+        out, err = capsys.readouterr()
+        assert ('Project archive %s is unchanged.\n' % archivefile) == out
+        assert '' == err
+
+    with_directory_contents_completing_project_file({'foo.py': 'print("hello")\n'}, check)
+
+
+def test_archive_command_with_base(capsys):
+    def check(dirname):
+        basefile = os.path.join(dirname, "base.zip")
+        code = _parse_args_and_run_subcommand(['anaconda-project', 'archive', '--directory', dirname, '--reproducible',
+                                               basefile])
+        assert code == 0
+        capsys.readouterr()
+
+        os.remove(os.path.join(dirname, "foo.py"))
+        archivefile = os.path.join(dirname, "delta.zip")
+        code = _parse_args_and_run_subcommand(['anaconda-project', 'archive', '--directory', dirname, '--base',
+                                               basefile, archivefile])
+        assert code == 0
+        out, err = capsys.readouterr()
+        assert ('  deleted %s\n' % os.path.join("some_name", "foo.py")) in out
+        assert ('Created project archive %s\n' % archivefile) in out
+        assert '' == err
+
+        with zipfile.ZipFile(archivefile, mode='r') as zf:
+            # base.zip is new since the base archive
+            assert ["anaconda-project-manifest.json", "base.zip"] == [os.path.basename(x) for x in zf.namelist()]
+
+    with_directory_contents_completing_project_file({'foo.py': 'print("hello")\n'}, check)
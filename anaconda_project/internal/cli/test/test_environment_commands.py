@@ -708,7 +708,23 @@ def test_lock_all_environments(capsys, monkeypatch):
         assert '' == err
 
         assert 1 == len(params['args'])
-        assert dict(env_spec_name=None) == params['kwargs']
+        assert dict(env_spec_name=None, package_table=None) == params['kwargs']
+
+    with_directory_contents_completing_project_file(dict(), check)
+
+
+def test_lock_with_package_table(capsys, monkeypatch):
+    def check(dirname):
+        _monkeypatch_pwd(monkeypatch, dirname)
+        params = _monkeypatch_lock(monkeypatch, SimpleStatus(success=True, description='Locked.'))
+
+        code = _parse_args_and_run_subcommand(['anaconda-project', 'lock', '--package-table'])
+        assert code == 0
+        assert dict(env_spec_name=None, package_table=True) == params['kwargs']
+
+        code = _parse_args_and_run_subcommand(['anaconda-project', 'lock', '--no-package-table'])
+        assert code == 0
+        assert dict(env_spec_name=None, package_table=False) == params['kwargs']
 
     with_directory_contents_completing_project_file(dict(), check)
 
@@ -726,7 +742,7 @@ def test_lock_specific_environment(capsys, monkeypatch):
         assert '' == err
 
         assert 1 == len(params['args'])
-        assert dict(env_spec_name='foo') == params['kwargs']
+        assert dict(env_spec_name='foo', package_table=None) == params['kwargs']
 
     with_directory_contents_completing_project_file(dict(), check)
 
@@ -69,10 +69,10 @@ expected_usage_msg_format = \
         '    clean               Removes generated state (stops services, deletes\n' \
         '                        environment files, etc)\n' \
         '%s' \
-        '    archive             Create a .zip, .tar.gz, or .tar.bz2 archive with\n' \
-        '                        project files in it\n'\
-        '    unarchive           Unpack a .zip, .tar.gz, or .tar.bz2 archive with\n' \
-        '                        project files in it\n'\
+        '    archive             Create a .zip, .tar.gz, .tar.bz2, .tar.xz, or .tar.zst\n' \
+        '                        archive with project files in it\n'\
+        '    unarchive           Unpack a .zip, .tar.gz, .tar.bz2, .tar.xz, or .tar.zst\n' \
+        '                        archive with project files in it\n'\
         '    upload              Upload the project to Anaconda Cloud\n' \
         '    add-variable        Add a required environment variable to the project\n' \
         '    remove-variable     Remove an environment variable from the project\n' \
@@ -201,3 +201,19 @@ Details about the error were saved to """)
     assert os.path.isfile(filename)
 
     os.remove(filename)
+
+
+def test_main_does_not_import_what_only_subcommands_need():
+    import subprocess
+    import sys
+
+    code = ("import sys\n"
+            "import anaconda_project.internal.cli.main\n"
+            "print(' '.join(sorted(sys.modules.keys())))\n")
+    source_root = os.path.dirname(os.path.dirname(os.path.abspath(anaconda_project.__file__)))
+    out = subprocess.check_output([sys.executable, '-c', code], cwd=source_root).decode('utf-8')
+    modules = out.split()
+    assert 'anaconda_project.internal.cli.main' in modules
+    for module in ('anaconda_project.project', 'anaconda_project.internal.cli.run', 'binstar_client', 'requests',
+                   'ruamel_yaml', 'ruamel.yaml', 'tornado'):
+        assert module not in modules
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""UI modes for the prepare-related commands.
+
+These are in their own module so the command line parser can
+offer them without importing everything prepare needs.
+"""
+from __future__ import absolute_import, print_function
+
+# these UI_MODE_ strings are used as values for command line options, so they are user-visible
+
+# ASK_QUESTIONS mode is supposed to ask about default actions too,
+# like whether to start servers.  It isn't implemented yet.
+UI_MODE_TEXT_ASK_QUESTIONS = "ask"
+UI_MODE_TEXT_DEVELOPMENT_DEFAULTS_OR_ASK = "development_defaults_or_ask"
+UI_MODE_TEXT_ASSUME_YES_PRODUCTION = "production_defaults"
+UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT = "development_defaults"
+UI_MODE_TEXT_ASSUME_NO = "check"
+
+_all_ui_modes = (UI_MODE_TEXT_ASK_QUESTIONS, UI_MODE_TEXT_DEVELOPMENT_DEFAULTS_OR_ASK,
+                 UI_MODE_TEXT_ASSUME_YES_PRODUCTION, UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT, UI_MODE_TEXT_ASSUME_NO)
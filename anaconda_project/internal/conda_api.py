@@ -16,9 +16,13 @@ import re
 import shutil
 import sys
 import tempfile
+import time
 
+from anaconda_project import verbose
+from anaconda_project.frontend import ProgressEvent
 from anaconda_project.internal import streaming_popen
 from anaconda_project.internal.directory_contains import subdirectory_relative_to_directory
+from anaconda_project.internal.lru_cache import LRUCache
 from anaconda_project.internal.py2_compat import is_string
 
 
@@ -127,18 +131,154 @@ def _get_platform_hacked_conda_command(extra_args, platform):
         cmd_list.extend(extra_args)
         return (cmd_list, " ".join(["conda"] + cmd_list[3:]))
 
+# output a callback has already seen is only kept for error messages
+_MAX_RETAINED_CHARS = 64 * 1024
 
-def _call_conda(extra_args, json_mode=False, platform=None, stdout_callback=None, stderr_callback=None):
+# With --json, conda writes a NUL-terminated record like
+# {"fetch": "numpy-1.14.0         | 12.3 MB   | ", "finished": false, "maxval": 1, "progress": 0.5}
+# as it works; older condas put the byte count in "maxval".
+_PROGRESS_PHASES = ('fetch', 'extract', 'link')
+
+_HUMAN_BYTES_UNITS = dict(B=1, KB=1024, MB=1024**2, GB=1024**3, TB=1024**4)
+
+
+def _parse_human_bytes(size):
+    pieces = size.split()
+    if len(pieces) != 2 or pieces[1] not in _HUMAN_BYTES_UNITS:
+        return None
+    try:
+        return int(float(pieces[0]) * _HUMAN_BYTES_UNITS[pieces[1]])
+    except ValueError:
+        return None
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class _ProgressParser(object):
+    """Turns the stdout of ``conda --json`` into ``ProgressEvent``."""
+
+    def __init__(self, callback):
+        self._callback = callback
+        self._pending = []
+        self._start = time.time()
+        # phase name to (time of first record, time of last record)
+        self._phase_times = collections.OrderedDict()
+
+    def feed(self, data):
+        if '\0' not in data:
+            self._pending.append(data)
+            return
+        records = ("".join(self._pending) + data).split('\0')
+        self._pending = [records[-1]]
+        for record in records[:-1]:
+            self._parse_record(record)
+
+    def _parse_record(self, text):
+        try:
+            record = json.loads(text)
+        except ValueError:
+            return
+        if not isinstance(record, dict):
+            return
+        phases = [phase for phase in _PROGRESS_PHASES if phase in record]
+        progress = record.get('progress', 0)
+        maxval = record.get('maxval', 1)
+        if len(phases) == 0 or not _is_number(progress) or not _is_number(maxval):
+            return
+
+        phase = phases[0]
+        now = time.time()
+        started = self._phase_times.get(phase, (now, now))[0]
+        self._phase_times[phase] = (started, now)
+
+        package = None
+        size = None
+        if is_string(record[phase]):
+            fields = [field.strip() for field in record[phase].split('|')]
+            package = fields[0] or None
+            if len(fields) > 1:
+                size = _parse_human_bytes(fields[1])
+
+        if maxval > 1:
+            fraction = float(progress) / maxval
+            fetched = int(progress)
+        else:
+            fraction = float(progress)
+            fetched = None if size is None else int(size * fraction)
+        self._callback(ProgressEvent(phase=phase,
+                                     package=package,
+                                     fraction=fraction,
+                                     bytes=fetched,
+                                     seconds=(now - started)))
+
+    def finish(self):
+        """Send an event ending each phase, and return a list of (phase, seconds)."""
+        now = time.time()
+        if len(self._phase_times) == 0:
+            # conda doesn't say when it's done solving, so without
+            # any downloads we can't split solving from linking.
+            durations = [('solve', now - self._start)]
+        else:
+            first = min([started for (started, ended) in self._phase_times.values()])
+            last = max([ended for (started, ended) in self._phase_times.values()])
+            durations = [('solve', first - self._start)]
+            durations.extend([(phase, ended - started) for (phase, (started, ended)) in self._phase_times.items()])
+            if 'link' not in self._phase_times:
+                durations.append(('link', now - last))
+        for (phase, seconds) in durations:
+            self._callback(ProgressEvent(phase=phase, package=None, fraction=1.0, bytes=None, seconds=seconds))
+        return durations
+
+
+def _call_conda(extra_args,
+                json_mode=False,
+                platform=None,
+                stdout_callback=None,
+                stderr_callback=None,
+                progress_callback=None):
     assert len(extra_args) > 0  # we deref extra_args[0] below
 
+    progress_parser = None
+    if progress_callback is not None:
+        # stdout becomes progress records and a JSON document,
+        # neither of which is for stdout_callback
+        extra_args = list(extra_args) + ['--json']
+        json_mode = True
+        progress_parser = _ProgressParser(progress_callback)
+        stdout_callback = progress_parser.feed
+
     (cmd_list, command_in_errors) = _get_platform_hacked_conda_command(extra_args, platform=platform)
 
+    if json_mode:
+        stdout_retain = streaming_popen.RETAIN_JSON_DOCUMENT
+    elif stdout_callback is not None:
+        stdout_retain = _MAX_RETAINED_CHARS
+    else:
+        stdout_retain = streaming_popen.RETAIN_ALL
+    if stderr_callback is not None:
+        stderr_retain = _MAX_RETAINED_CHARS
+    else:
+        stderr_retain = streaming_popen.RETAIN_ALL
+
+    started = time.time()
     try:
         (p, stdout_lines, stderr_lines) = streaming_popen.popen(cmd_list,
                                                                 stdout_callback=stdout_callback,
-                                                                stderr_callback=stderr_callback)
+                                                                stderr_callback=stderr_callback,
+                                                                stdout_retain=stdout_retain,
+                                                                stderr_retain=stderr_retain)
     except OSError as e:
         raise CondaError("failed to run: %r: %r" % (command_in_errors, repr(e)))
+    if progress_parser is not None:
+        durations = progress_parser.finish()
+        verbose._verbose_logger().info("conda %s took %s", extra_args[0],
+                                       ", ".join(["%.1fs to %s" % (seconds, phase) for (phase, seconds) in durations]))
+    elif stdout_callback is not None:
+        # conda's own output is going to the user, so we can only
+        # time the whole command rather than each phase
+        verbose._verbose_logger().info("conda %s took %.1fs", extra_args[0], time.time() - started)
     errstr = "".join(stderr_lines)
     if p.returncode != 0:
         parsed = None
@@ -217,7 +357,7 @@ def _get_root_prefix():
     return _cached_root_prefix
 
 
-def create(prefix, pkgs=None, channels=(), stdout_callback=None, stderr_callback=None):
+def create(prefix, pkgs=None, channels=(), stdout_callback=None, stderr_callback=None, progress_callback=None):
     """Create an environment either by name or path with a specified set of packages."""
     if not pkgs or not isinstance(pkgs, (list, tuple)):
         raise TypeError('must specify a list of one or more packages to install into new environment')
@@ -231,10 +371,13 @@ def create(prefix, pkgs=None, channels=(), stdout_callback=None, stderr_callback
         cmd_list.extend(['--channel', channel])
 
     cmd_list.extend(pkgs)
-    _call_conda(cmd_list, stdout_callback=stdout_callback, stderr_callback=stderr_callback)
+    _call_conda(cmd_list,
+                stdout_callback=stdout_callback,
+                stderr_callback=stderr_callback,
+                progress_callback=progress_callback)
 
 
-def install(prefix, pkgs=None, channels=(), stdout_callback=None, stderr_callback=None):
+def install(prefix, pkgs=None, channels=(), stdout_callback=None, stderr_callback=None, progress_callback=None):
     """Install packages into an environment either by name or path with a specified set of packages."""
     if not pkgs or not isinstance(pkgs, (list, tuple)):
         raise TypeError('must specify a list of one or more packages to install into existing environment, not %r',
@@ -247,10 +390,13 @@ def install(prefix, pkgs=None, channels=(), stdout_callback=None, stderr_callbac
         cmd_list.extend(['--channel', channel])
 
     cmd_list.extend(pkgs)
-    _call_conda(cmd_list, stdout_callback=stdout_callback, stderr_callback=stderr_callback)
+    _call_conda(cmd_list,
+                stdout_callback=stdout_callback,
+                stderr_callback=stderr_callback,
+                progress_callback=progress_callback)
 
 
-def remove(prefix, pkgs=None, stdout_callback=None, stderr_callback=None):
+def remove(prefix, pkgs=None, stdout_callback=None, stderr_callback=None, progress_callback=None):
     """Remove packages from an environment either by name or path."""
     if not pkgs or not isinstance(pkgs, (list, tuple)):
         raise TypeError('must specify a list of one or more packages to remove from existing environment')
@@ -259,7 +405,10 @@ def remove(prefix, pkgs=None, stdout_callback=None, stderr_callback=None):
     cmd_list.extend(['--prefix', prefix])
 
     cmd_list.extend(pkgs)
-    _call_conda(cmd_list, stdout_callback=stdout_callback, stderr_callback=stderr_callback)
+    _call_conda(cmd_list,
+                stdout_callback=stdout_callback,
+                stderr_callback=stderr_callback,
+                progress_callback=progress_callback)
 
 
 def _parse_dist(dist):
@@ -467,6 +616,14 @@ $                                  # end-of-line
 
 _conda_constraint_pat = re.compile('=(?P<version>[^=<>!]+)(?P<build>=[^=<>!]+)?', re.VERBOSE)
 
+# The same specs are parsed over and over (for each env spec
+# and everything inheriting from it, each lock set, each
+# platform), so we keep what we parsed. ParsedSpec is an
+# immutable tuple, so everyone can share the same one.
+_parse_spec_cache = LRUCache("conda_api.parse_spec", 10000)
+
+_NOT_CACHED = object()
+
 
 def parse_spec(spec):
     """Parse a package name and version spec as conda would.
@@ -477,6 +634,14 @@ def parse_spec(spec):
     if not is_string(spec):
         raise TypeError("Expected a string not %r" % spec)
 
+    parsed = _parse_spec_cache.get(spec, _NOT_CACHED)
+    if parsed is _NOT_CACHED:
+        parsed = _parse_spec_uncached(spec)
+        _parse_spec_cache.put(spec, parsed)
+    return parsed
+
+
+def _parse_spec_uncached(spec):
     m = _spec_pat.match(spec)
     if m is None:
         return None
@@ -116,6 +116,12 @@ class DefaultCondaManager(CondaManager):
         if self._frontend is not None:
             self._frontend.partial_error(data)
 
+    def _conda_callbacks(self):
+        callbacks = dict(stdout_callback=self._on_stdout, stderr_callback=self._on_stderr)
+        if self._frontend is not None and self._frontend.structured_progress:
+            callbacks['progress_callback'] = self._frontend.progress
+        return callbacks
+
     def _timestamp_file(self, prefix, spec):
         return os.path.join(prefix, "var", "cache", "anaconda-project", "env-specs", spec.locked_hash)
 
@@ -362,11 +368,7 @@ class DefaultCondaManager(CondaManager):
                 specs = spec.specs_for_conda_package_names(to_update)
                 assert len(specs) == len(to_update)
                 try:
-                    conda_api.install(prefix=prefix,
-                                      pkgs=specs,
-                                      channels=spec.channels,
-                                      stdout_callback=self._on_stdout,
-                                      stderr_callback=self._on_stderr)
+                    conda_api.install(prefix=prefix, pkgs=specs, channels=spec.channels, **self._conda_callbacks())
                 except conda_api.CondaError as e:
                     raise CondaManagerError("Failed to install packages: {}: {}".format(", ".join(specs), str(e)))
         elif create:
@@ -381,8 +383,7 @@ class DefaultCondaManager(CondaManager):
                 conda_api.create(prefix=prefix,
                                  pkgs=list(command_line_packages),
                                  channels=spec.channels,
-                                 stdout_callback=self._on_stdout,
-                                 stderr_callback=self._on_stderr)
+                                 **self._conda_callbacks())
             except conda_api.CondaError as e:
                 raise CondaManagerError("Failed to create environment at %s: %s" % (prefix, str(e)))
         else:
@@ -404,6 +405,6 @@ class DefaultCondaManager(CondaManager):
 
     def remove_packages(self, prefix, packages):
         try:
-            conda_api.remove(prefix, packages, stdout_callback=self._on_stdout, stderr_callback=self._on_stderr)
+            conda_api.remove(prefix, packages, **self._conda_callbacks())
         except conda_api.CondaError as e:
             raise CondaManagerError("Failed to remove packages from %s: %s" % (prefix, str(e)))
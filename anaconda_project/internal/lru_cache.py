@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Size-bounded caches that forget what was least recently used."""
+from __future__ import absolute_import, print_function
+
+import collections
+import threading
+
+# every LRUCache, so we can log how well they did
+_all_caches = []
+
+
+class LRUCache(object):
+    """Thread-safe map holding at most ``max_size`` entries.
+
+    When it's full, adding an entry drops the one that was used
+    least recently. Hits and misses are counted for ``log_hit_rates()``.
+    """
+
+    def __init__(self, name, max_size):
+        """Create an empty cache; the name is only used in log messages."""
+        assert max_size > 0
+        self.name = name
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        _all_caches.append(self)
+
+    def __len__(self):
+        """Get the number of entries."""
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Get the value for the key, or the default if we don't have it."""
+        with self._lock:
+            try:
+                # move it to the most-recently-used end
+                value = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Set the value for the key."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries and reset the hit and miss counts."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def hit_rate(self):
+        """Get the fraction of lookups that were hits, or None if there weren't any."""
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return None
+        return float(self.hits) / lookups
+
+
+def log_hit_rates(logger):
+    """Log hits and misses for every cache that was used."""
+    for cache in _all_caches:
+        if cache.hit_rate is not None:
+            logger.info("%s cache: %d hits, %d misses (%.1f%% hit rate), %d entries", cache.name, cache.hits,
+                        cache.misses, cache.hit_rate * 100, len(cache))
@@ -9,14 +9,34 @@
 from __future__ import absolute_import
 
 import codecs
+import hashlib
 import json
+import mmap
+import os
 import re
+import time
+import uuid
 
+from anaconda_project.internal.makedirs import makedirs_ok_if_exists
 from anaconda_project.internal.py2_compat import is_string
+from anaconda_project.internal.rename import rename_over_existing
+from anaconda_project.internal.user_cache import user_cache_directory
 
 _comment_re = re.compile("#.*$", re.MULTILINE)
 _fusion_register_re = re.compile(r"^\s*@fusion\.register", re.MULTILINE)
 
+# bump this if extras() starts finding something new, so
+# we don't use what an older version found
+_CACHE_VERSION = 1
+
+# A notebook modified this recently (in seconds) could be modified
+# again without its size or mtime changing, so we don't cache it.
+_CACHE_RACY_SECONDS = 2
+
+# notebooks bigger than this (in bytes) are assumed to have no
+# extras rather than scanned
+_MAX_ANALYZED_SIZE = 256 * 1024 * 1024
+
 
 # see if some source has @fusion.register. This is
 # obviously sort of heuristic, but without executing
@@ -28,29 +48,288 @@ def _has_fusion_register(source):
     return re.match(_fusion_register_re, source) is not None
 
 
-def extras(filename, errors):
-    try:
-        with codecs.open(filename, encoding='utf-8') as f:
-            json_string = f.read()
-            parsed = json.loads(json_string)
-    except Exception as e:
-        errors.append("Failed to read or parse %s: %s" % (filename, str(e)))
-        return None
+_whitespace_re = re.compile(br'\s*')
+_structure_re = re.compile(br'["\[\]{}]')
+_scalar_re = re.compile(br'true|false|null|-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?')
+
+
+class _JsonScanner(object):
+    """Walk the structure of JSON without decoding the parts we skip.
+
+    Notebooks can have huge outputs embedded in them, but we only
+    care about the source of each cell; this lets us find it
+    without ever building the outputs in memory. Skipped values
+    are only checked loosely (we match up brackets and strings).
+    """
+
+    def __init__(self, data):
+        self._data = data
+        self._pos = 0
+
+    def _error(self, message):
+        raise ValueError("%s at offset %d" % (message, self._pos))
+
+    def peek(self):
+        self._pos = _whitespace_re.match(self._data, self._pos).end()
+        return self._data[self._pos:self._pos + 1]
+
+    def _expect(self, char):
+        if self.peek() != char:
+            self._error("Expected '%s'" % char.decode('ascii'))
+        self._pos += 1
+
+    def _skip_string(self):
+        if self._data[self._pos:self._pos + 1] != b'"':
+            self._error("Expected a string")
+        end = self._pos + 1
+        while True:
+            # find() is much faster than a regex over long strings
+            end = self._data.find(b'"', end)
+            if end < 0:
+                self._error("Unterminated string")
+            backslashes = 0
+            while self._data[end - backslashes - 1:end - backslashes] == b'\\':
+                backslashes += 1
+            end += 1
+            # an odd number of backslashes escapes the quote
+            if backslashes % 2 == 0:
+                break
+        self._pos = end
 
+    def skip_value(self):
+        """Move past the next value, returning where it started."""
+        char = self.peek()
+        start = self._pos
+        if char == b'"':
+            self._skip_string()
+        elif char in (b'[', b'{'):
+            depth = 0
+            while True:
+                match = _structure_re.search(self._data, self._pos)
+                if match is None:
+                    self._error("Unexpected end of data")
+                if match.group(0) == b'"':
+                    self._pos = match.start()
+                    self._skip_string()
+                    continue
+                self._pos = match.end()
+                if match.group(0) in (b'[', b'{'):
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        break
+        else:
+            match = _scalar_re.match(self._data, self._pos)
+            if match is None:
+                self._error("Expected a value")
+            self._pos = match.end()
+        return start
+
+    def expect_end(self):
+        """Check there's nothing after the value we scanned."""
+        if self.peek() != b'':
+            self._error("Extra data")
+
+    def decode_value(self):
+        """Decode the next value."""
+        start = self.skip_value()
+        return json.loads(self._data[start:self._pos].decode('utf-8'))
+
+    def _more_items(self, close):
+        char = self.peek()
+        self._pos += 1
+        if char == b',':
+            return True
+        elif char == close:
+            return False
+        else:
+            self._pos -= 1
+            self._error("Expected ',' or '%s'" % close.decode('ascii'))
+
+    def _items(self, open_, close):
+        self._expect(open_)
+        if self.peek() == close:
+            self._pos += 1
+            return
+        while True:
+            yield
+            if not self._more_items(close):
+                return
+
+    def _yield_then_skip(self):
+        # skip the value if whoever we yield to doesn't consume it
+        start = self._pos
+        yield
+        if self._pos == start:
+            self.skip_value()
+
+    def members(self):
+        """Generate the keys of an object; the value after each key is skipped unless it's consumed."""
+        for _ in self._items(b'{', b'}'):
+            self.peek()
+            start = self._pos
+            self._skip_string()
+            key = json.loads(self._data[start:self._pos].decode('utf-8'))
+            self._expect(b':')
+            self.peek()
+            for _ in self._yield_then_skip():
+                yield key
+
+    def elements(self):
+        """Generate once per element of an array; the element is skipped unless it's consumed."""
+        for _ in self._items(b'[', b']'):
+            self.peek()
+            for _ in self._yield_then_skip():
+                yield
+
+
+def _scan_extras(data):
     extras = dict()
-    found_fusion = False
-
-    if isinstance(parsed, dict) and \
-       'cells' in parsed and \
-       isinstance(parsed['cells'], list):
-        for cell in parsed['cells']:
-            if 'source' in cell:
-                if isinstance(cell['source'], list):
-                    source = "".join([s for s in cell['source'] if is_string(s)])
+    scanner = _JsonScanner(data)
+    if scanner.peek() != b'{':
+        scanner.skip_value()
+        scanner.expect_end()
+        return extras
+
+    for key in scanner.members():
+        if key != 'cells' or scanner.peek() != b'[':
+            continue
+        for _ in scanner.elements():
+            if scanner.peek() != b'{':
+                continue
+            for cell_key in scanner.members():
+                if cell_key != 'source':
+                    continue
+                source = scanner.decode_value()
+                if isinstance(source, list):
+                    source = "".join([s for s in source if is_string(s)])
                     if _has_fusion_register(source):
-                        found_fusion = True
+                        # nothing else could change the answer
+                        extras['registers_fusion_function'] = True
+                        return extras
+    scanner.expect_end()
+    return extras
 
-    if found_fusion:
-        extras['registers_fusion_function'] = True
 
-    return extras
+def _read_extras(filename):
+    with open(filename, 'rb') as f:
+        # mapping the file lets the regexes skip through it
+        # without us holding the whole thing in memory
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return _scan_extras(data)
+        finally:
+            data.close()
+
+
+def _cache_filename(project_directory):
+    key = hashlib.sha1(project_directory.encode('utf-8')).hexdigest()
+    return os.path.join(user_cache_directory("notebooks"), key + ".json")
+
+
+def _cache_key(stat_result):
+    return [stat_result.st_size, getattr(stat_result, 'st_mtime_ns', stat_result.st_mtime)]
+
+
+def _load_cache(cache_filename):
+    try:
+        with codecs.open(cache_filename, 'r', 'utf-8') as f:
+            cached = json.load(f)
+    except (IOError, OSError, ValueError):
+        return dict()
+    if not isinstance(cached, dict) or cached.get('version') != _CACHE_VERSION or \
+       not isinstance(cached.get('notebooks'), dict):
+        return dict()
+    return cached['notebooks']
+
+
+def _save_cache(cache_filename, notebooks):
+    try:
+        makedirs_ok_if_exists(os.path.dirname(cache_filename))
+        tmp_filename = "%s.%s.tmp" % (cache_filename, uuid.uuid4())
+        with codecs.open(tmp_filename, 'w', 'utf-8') as f:
+            json.dump(dict(version=_CACHE_VERSION, notebooks=notebooks), f)
+        rename_over_existing(tmp_filename, cache_filename)
+    except (IOError, OSError):
+        # the cache is only there to save time
+        pass
+
+
+def _cached_extras(entry, key):
+    if not isinstance(entry, dict) or entry.get('key') != key or not isinstance(entry.get('extras'), dict):
+        return None
+    return entry['extras']
+
+
+def _analyze(filename):
+    try:
+        return (_read_extras(filename), None)
+    except Exception as e:
+        return (None, "Failed to read or parse %s: %s" % (filename, str(e)))
+
+
+def extras(filename, errors, project_directory=None):
+    """Get a dict of what we know about the notebook, or None with errors appended if we can't read it.
+
+    See ``extras_for_notebooks()`` for how the answer is cached.
+    """
+    return extras_for_notebooks([filename], errors, project_directory=project_directory)[0]
+
+
+def extras_for_notebooks(filenames, errors, project_directory=None):
+    """Get extras() for each of the notebooks, in the same order.
+
+    What we found is cached in one file per project in the per-user
+    cache directory, keyed by each notebook's size and mtime; the
+    project defaults to the directory of the first notebook. Errors
+    are appended in the order of the notebooks they're about.
+    """
+    if len(filenames) == 0:
+        return []
+    if project_directory is None:
+        project_directory = os.path.dirname(filenames[0])
+
+    cache_filename = _cache_filename(os.path.abspath(project_directory))
+    cached = _load_cache(cache_filename)
+    # forget notebooks that were deleted or renamed
+    notebooks = dict([(name, entry) for (name, entry) in cached.items() if os.path.isfile(name)])
+
+    results = [(None, None)] * len(filenames)
+    to_analyze = []
+    for (i, filename) in enumerate(filenames):
+        full_path = os.path.abspath(filename)
+        try:
+            stat_result = os.stat(full_path)
+        except OSError as e:
+            results[i] = (None, "Failed to read or parse %s: %s" % (filename, str(e)))
+            continue
+        if stat_result.st_size > _MAX_ANALYZED_SIZE:
+            results[i] = (dict(), None)
+            continue
+        key = _cache_key(stat_result)
+        notebook_extras = _cached_extras(notebooks.get(full_path), key)
+        if notebook_extras is not None:
+            results[i] = (notebook_extras, None)
+        else:
+            to_analyze.append((i, filename, full_path, key, stat_result.st_mtime))
+
+    # scanning is CPU-bound Python that holds the GIL, so threads
+    # don't help; the cache is what saves time
+    analyzed = [_analyze(filename) for (i, filename, full_path, key, mtime) in to_analyze]
+
+    not_racy_before = time.time() - _CACHE_RACY_SECONDS
+    for ((i, filename, full_path, key, mtime), (notebook_extras, error)) in zip(to_analyze, analyzed):
+        results[i] = (notebook_extras, error)
+        if notebook_extras is not None and mtime < not_racy_before:
+            notebooks[full_path] = dict(key=key, extras=notebook_extras)
+
+    if notebooks != cached:
+        _save_cache(cache_filename, notebooks)
+
+    all_extras = []
+    for (notebook_extras, error) in results:
+        all_extras.append(notebook_extras)
+        if error is not None:
+            errors.append(error)
+    return all_extras
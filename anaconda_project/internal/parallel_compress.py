@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Block-parallel compression of a byte stream.
+
+The stream is cut into fixed-size blocks and each block is compressed
+on a thread pool into a complete, independent gzip member, xz stream,
+or zstd frame. The compressed blocks are written out in order. All
+three formats define a concatenation of members/streams/frames to
+decompress to the concatenation of their contents, so the output is
+readable by the usual tools (and by tarfile). zlib, lzma and zstandard
+release the GIL while compressing, so threads give us real parallelism.
+"""
+from __future__ import absolute_import, print_function
+
+import collections
+import multiprocessing
+import struct
+import zlib
+from multiprocessing.pool import ThreadPool
+
+try:
+    import lzma
+except ImportError:  # pragma: no cover (py2 only)
+    lzma = None  # pragma: no cover (py2 only)
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # pragma: no cover
+
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+# (default level, min level, max level)
+_LEVELS = {'gz': (9, 0, 9), 'xz': (6, 0, 9), 'zst': (3, 1, 22)}
+
+
+def _gzip_block(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = compressor.compress(data) + compressor.flush()
+    # magic, deflate, no flags, zero mtime (so identical input makes
+    # identical output), no extra flags, unknown OS
+    header = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+    trailer = struct.pack('<II', zlib.crc32(data) & 0xffffffff, len(data) & 0xffffffff)
+    return header + body + trailer
+
+
+def _xz_block(data, level):
+    return lzma.compress(data, preset=level)
+
+
+def _zstd_block(data, level):
+    # compressor objects aren't thread-safe, so make one per block
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+_BLOCK_COMPRESSORS = {'gz': _gzip_block, 'xz': _xz_block, 'zst': _zstd_block}
+
+COMPRESSIONS = tuple(sorted(_BLOCK_COMPRESSORS.keys()))
+
+
+def unavailable_reason(compression):
+    """Get a message about why we can't do this compression, or None if we can."""
+    if compression == 'xz' and lzma is None:
+        return "xz compression requires the Python 'lzma' module."  # pragma: no cover (py2 only)
+    elif compression == 'zst' and zstandard is None:
+        return "zstd compression requires the Python 'zstandard' package."  # pragma: no cover
+    else:
+        return None
+
+
+def zstd_reader(fileobj):
+    """Get a readable file object with the decompressed contents of zstd data (which may be several frames)."""
+    assert unavailable_reason('zst') is None
+    return zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True)
+
+
+def check_level(compression, level):
+    """Get an error message if the level isn't valid for this compression, or None if it's OK."""
+    (default_level, min_level, max_level) = _LEVELS[compression]
+    if level is None or (min_level <= level <= max_level):
+        return None
+    else:
+        return "Compression level for %s must be between %d and %d, not %s." % (compression, min_level, max_level,
+                                                                                level)
+
+
+def ordered_map(func, items, workers=None):
+    """Generate func(item) for each item, computed on a thread pool.
+
+    Results come out in the same order as the items, and only a
+    few results are computed ahead of the one being consumed, so
+    memory use stays bounded. An exception from func is raised when
+    its result is reached. Close the generator if you stop early.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    pool = ThreadPool(max(1, workers))
+    pending = collections.deque()
+    try:
+        for item in items:
+            pending.append(pool.apply_async(func, (item, )))
+            if len(pending) > workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+class ParallelCompressedFile(object):
+    """Write-only file object that compresses into another file object.
+
+    Nothing is written to the underlying file object until enough
+    data for a block has been written to us, and the final partial
+    block is written by ``close()``, so ``close()`` must be called.
+    The underlying file object is not closed.
+    """
+
+    def __init__(self, fileobj, compression, level=None, block_size=DEFAULT_BLOCK_SIZE, workers=None):
+        """Create a writer for the given compression ('gz', 'xz', or 'zst')."""
+        assert compression in _BLOCK_COMPRESSORS
+        assert unavailable_reason(compression) is None
+        assert check_level(compression, level) is None
+        if level is None:
+            level = _LEVELS[compression][0]
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self._fileobj = fileobj
+        self._compress = _BLOCK_COMPRESSORS[compression]
+        self._level = level
+        self._block_size = block_size
+        self._workers = max(1, workers)
+        self._pool = None
+        # compressed blocks we haven't written yet, in order
+        self._pending = collections.deque()
+        self._buffer = []
+        self._buffered = 0
+        self._wrote_a_block = False
+        self._closed = False
+
+    def writable(self):
+        """Return True since we're writable."""
+        return True
+
+    def write(self, data):
+        """Compress the data, blocking if too many blocks are waiting to be written."""
+        assert not self._closed
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self._block_size:
+            joined = b''.join(self._buffer)
+            offset = 0
+            while len(joined) - offset >= self._block_size:
+                self._submit(joined[offset:offset + self._block_size])
+                offset += self._block_size
+            self._buffer = [joined[offset:]]
+            self._buffered = len(joined) - offset
+
+    def _submit(self, block):
+        self._wrote_a_block = True
+        if self._workers == 1:
+            self._fileobj.write(self._compress(block, self._level))
+            return
+        if self._pool is None:
+            self._pool = ThreadPool(self._workers)
+        self._pending.append(self._pool.apply_async(self._compress, (block, self._level)))
+        # bound memory use, and keep the output flowing
+        while len(self._pending) > self._workers * 2:
+            self._write_oldest()
+
+    def _write_oldest(self):
+        self._fileobj.write(self._pending.popleft().get())
+
+    def flush(self):
+        """Do nothing; blocks can only be written once they're complete."""
+        pass
+
+    def close(self):
+        """Compress and write any remaining data."""
+        if self._closed:
+            return
+        try:
+            # an empty block still makes a valid, empty compressed file
+            if self._buffered > 0 or not self._wrote_a_block:
+                self._submit(b''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+            while self._pending:
+                self._write_oldest()
+        finally:
+            self._closed = True
+            self._shutdown_pool()
+
+    def abort(self):
+        """Stop compressing without writing anything more."""
+        self._closed = True
+        self._pending.clear()
+        self._shutdown_pool()
+
+    def _shutdown_pool(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        """Allow use as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close, or abort if there was an exception."""
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -14,6 +14,7 @@ import re
 import sys
 
 from anaconda_project.internal import logged_subprocess
+from anaconda_project.internal.lru_cache import LRUCache
 
 
 class PipError(Exception):
@@ -125,6 +126,11 @@ def installed(prefix):
 
 ParsedPipSpec = collections.namedtuple('ParsedPipSpec', ['name'])
 
+# we parse the same specs a lot; see conda_api.parse_spec()
+_parse_spec_cache = LRUCache("pip_api.parse_spec", 2000)
+
+_NOT_CACHED = object()
+
 _spec_pat = re.compile(' *([a-zA-Z0-9][-_.a-zA-Z0-9]+)')
 
 _egg_fragment_re = re.compile('[#&]egg=([^&]*)')
@@ -184,6 +190,14 @@ def parse_spec(spec):
        ``ParsedPipSpec`` or None on failure
 
     """
+    parsed = _parse_spec_cache.get(spec, _NOT_CACHED)
+    if parsed is _NOT_CACHED:
+        parsed = _parse_spec_uncached(spec)
+        _parse_spec_cache.put(spec, parsed)
+    return parsed
+
+
+def _parse_spec_uncached(spec):
     if _is_pip_understood_url(spec):
         name = _extract_name_from_egg_fragment(spec)
     else:
@@ -8,6 +8,9 @@
 from __future__ import absolute_import, print_function
 
 import codecs
+import collections
+import os
+import platform
 import subprocess
 from threading import Thread
 
@@ -16,14 +19,124 @@ try:
 except ImportError:  # pragma: no cover (py2 only)
     from Queue import Queue  # pragma: no cover (py2 only)
 
+try:
+    import selectors
+except ImportError:  # pragma: no cover (py2 only)
+    selectors = None  # pragma: no cover (py2 only)
+
 from anaconda_project.internal import logged_subprocess
 
+# keep everything written to the stream
+RETAIN_ALL = 'all'
+
+# keep only what comes after the last NUL; conda --json writes
+# NUL-terminated progress records followed by the result document
+RETAIN_JSON_DOCUMENT = 'json_document'
+
+# os.read() returns whatever is available up to this size, so
+# streaming progress such as conda's "....." still shows promptly
+_READ_SIZE = 64 * 1024
+
 
 # this function exists to be mocked in tests
 def _read_from_stream(stream, count):
     return stream.read(count)
 
 
+# this function exists to be mocked in tests
+def _read_from_pipe(pipe, count):
+    return os.read(pipe.fileno(), count)
+
+
+def _pipes_are_selectable():
+    # Windows can't select() on pipes, and Python 2 has no selectors module
+    return selectors is not None and platform.system() != 'Windows'
+
+
+def _split_lines(data):
+    remaining = data
+    while len(remaining) > 0:
+        (start, sep, end) = remaining.partition('\n')
+        yield start + sep
+        remaining = end
+
+
+class _RetainedLines(object):
+    """The part of a stream's output that we keep to return from ``popen()``.
+
+    ``retain`` is ``RETAIN_ALL``, ``RETAIN_JSON_DOCUMENT``, None to
+    keep nothing, or a number of characters to keep from the end
+    of the output (always at least the last line).
+    """
+
+    def __init__(self, retain):
+        assert retain is None or retain in (RETAIN_ALL, RETAIN_JSON_DOCUMENT) or isinstance(retain, int)
+        self._retain = retain
+        self._lines = collections.deque()
+        self._chars = 0
+
+    def add(self, data):
+        if self._retain is None:
+            return
+        if self._retain == RETAIN_JSON_DOCUMENT and '\0' in data:
+            self._lines.clear()
+            self._chars = 0
+            data = data[data.rindex('\0') + 1:]
+            if data == '':
+                return
+        if len(self._lines) == 0 or self._lines[-1].endswith("\n"):
+            self._lines.append(data)
+        else:
+            self._lines[-1] = self._lines[-1] + data
+        self._chars += len(data)
+        if isinstance(self._retain, int):
+            while self._chars > self._retain and len(self._lines) > 1:
+                self._chars -= len(self._lines.popleft())
+
+    def lines(self):
+        return list(self._lines)
+
+
+class _PipeReader(object):
+    def __init__(self, pipe, callback, retained):
+        self.pipe = pipe
+        self.callback = callback
+        self.retained = retained
+        # we use errors=replace because garbage from a subprocess
+        # shouldn't stop us from showing the rest of its output.
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def read(self):
+        """Read and handle whatever is available, returning False at end of file."""
+        data = _read_from_pipe(self.pipe, _READ_SIZE)
+        at_eof = len(data) == 0
+        for line in _split_lines(self.decoder.decode(data, final=at_eof)):
+            self.callback(line)
+            self.retained.add(line)
+        return not at_eof
+
+
+def _read_pipes_with_selector(readers):
+    first_error = None
+    selector = selectors.DefaultSelector()
+    try:
+        for reader in readers:
+            selector.register(reader.pipe, selectors.EVENT_READ, reader)
+        while len(selector.get_map()) > 0:
+            for (key, events) in selector.select():
+                try:
+                    more = key.data.read()
+                except Exception as e:
+                    if first_error is None:
+                        first_error = e
+                    more = False
+                if not more:
+                    selector.unregister(key.fileobj)
+    finally:
+        selector.close()
+    return first_error
+
+
 def _read_and_queue_data(pipe, queue):
     try:
         while True:
@@ -37,18 +150,8 @@ def _read_and_queue_data(pipe, queue):
             data = _read_from_stream(pipe, 1)
             if len(data) == 0:
                 break
-            remaining = data
-            while len(remaining) > 0:
-                (start, sep, end) = remaining.partition('\n')
-                if sep == '':
-                    # no newline found, send chunk along
-                    queue.put((pipe, remaining, None))
-                    remaining = ''
-                else:
-                    # newline found, send line and then
-                    # look for another line
-                    queue.put((pipe, start + sep, None))
-                    remaining = end
+            for line in _split_lines(data):
+                queue.put((pipe, line, None))
         queue.put((pipe, None, None))
     except Exception as e:
         queue.put((pipe, None, e))
@@ -61,27 +164,7 @@ def _reader_thread(pipe, queue):
     return t
 
 
-def _combine_lines(datas):
-    combined = []
-    for data in datas:
-        if len(combined) == 0 or combined[-1].endswith("\n"):
-            combined.append(data)
-        else:
-            combined[-1] = combined[-1] + data
-    return combined
-
-
-def popen(args, stdout_callback, stderr_callback, **kwargs):
-    def ignore_line(line):
-        pass
-
-    if stdout_callback is None:
-        stdout_callback = ignore_line
-    if stderr_callback is None:
-        stderr_callback = ignore_line
-
-    p = logged_subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
+def _read_pipes_with_threads(readers):
     queue = Queue()
 
     # Create/destroy reader outside of the threads, since there
@@ -100,52 +183,71 @@ def popen(args, stdout_callback, stderr_callback, **kwargs):
     #
     # We don't close these readers, because it seems to result
     # in a double-close on the underlying file.
-    stdout_wrapper = codecs.getreader('utf-8')(p.stdout, errors='replace')
-    stderr_wrapper = codecs.getreader('utf-8')(p.stderr, errors='replace')
-
-    stdout_thread = _reader_thread(stdout_wrapper, queue)
-    stderr_thread = _reader_thread(stderr_wrapper, queue)
-
-    stdout_buffer = []
-    stderr_buffer = []
+    readers_by_wrapper = dict()
+    threads_by_wrapper = dict()
+    for reader in readers:
+        wrapper = codecs.getreader('utf-8')(reader.pipe, errors='replace')
+        readers_by_wrapper[wrapper] = reader
+        threads_by_wrapper[wrapper] = _reader_thread(wrapper, queue)
 
     first_error = None
-    stdout_joined = False
-    stderr_joined = False
-    while not (queue.empty() and (stdout_joined and stderr_joined)):
+    while not (queue.empty() and len(threads_by_wrapper) == 0):
         (which, data, error) = queue.get()
         if error is not None and first_error is None:
             first_error = error
         if data is None:
-            if which is stdout_wrapper:
-                stdout_thread.join()
-                stdout_joined = True
-                assert not stdout_thread.is_alive()
-            else:
-                assert which is stderr_wrapper
-                stderr_thread.join()
-                stderr_joined = True
-                assert not stderr_thread.is_alive()
+            thread = threads_by_wrapper.pop(which)
+            thread.join()
+            assert not thread.is_alive()
         else:
-            if which is stdout_wrapper:
-                stdout_callback(data)
-                stdout_buffer.append(data)
-            else:
-                assert which is stderr_wrapper
-                stderr_callback(data)
-                stderr_buffer.append(data)
+            reader = readers_by_wrapper[which]
+            reader.callback(data)
+            reader.retained.add(data)
 
     assert queue.empty()
 
+    return first_error
+
+
+def _ignore_data(data):
+    pass
+
+
+def popen(args, stdout_callback, stderr_callback, stdout_retain=RETAIN_ALL, stderr_retain=RETAIN_ALL, **kwargs):
+    """Run a subprocess, passing its output to the callbacks as it arrives.
+
+    The callbacks get unicode chunks which are a line or part of
+    a line. ``stdout_retain`` and ``stderr_retain`` say how much
+    output to keep for the return value: ``RETAIN_ALL``,
+    ``RETAIN_JSON_DOCUMENT``, a number of characters from the end,
+    or None for nothing.
+
+    Returns:
+        tuple of the finished ``Popen``, stdout lines, and stderr lines
+    """
+    if stdout_callback is None:
+        stdout_callback = _ignore_data
+    if stderr_callback is None:
+        stderr_callback = _ignore_data
+
+    p = logged_subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    stdout_retained = _RetainedLines(stdout_retain)
+    stderr_retained = _RetainedLines(stderr_retain)
+    readers = [_PipeReader(p.stdout, stdout_callback, stdout_retained),
+               _PipeReader(p.stderr, stderr_callback, stderr_retained)]
+
+    if _pipes_are_selectable():
+        first_error = _read_pipes_with_selector(readers)
+    else:
+        first_error = _read_pipes_with_threads(readers)
+
     p.stdout.close()
     p.stderr.close()
 
     p.wait()
 
-    stdout_buffer = _combine_lines(stdout_buffer)
-    stderr_buffer = _combine_lines(stderr_buffer)
-
     if first_error is not None:
         raise first_error
 
-    return (p, stdout_buffer, stderr_buffer)
+    return (p, stdout_retained.lines(), stderr_retained.lines())
@@ -16,6 +16,8 @@ import random
 from pprint import pprint
 
 import anaconda_project.internal.conda_api as conda_api
+from anaconda_project import verbose
+from anaconda_project.frontend import ProgressEvent
 
 from anaconda_project.internal.test.tmpfile_utils import (with_directory_contents, tmp_script_commandline)
 
@@ -195,6 +197,23 @@ sys.exit(1)
     with_directory_contents(dict(), do_test)
 
 
+def test_conda_invoke_json_after_progress_records(monkeypatch):
+    def get_command(extra_args):
+        return tmp_script_commandline("""from __future__ import print_function
+import sys
+sys.stdout.write('{"fetch": "foo", "progress": 0.5}\\n\\0')
+sys.stdout.write('{"fetch": "foo", "progress": 1.0}\\n\\0')
+print('{"root_prefix": "/foo"}')
+sys.exit(0)
+""")
+
+    def do_test(dirname):
+        monkeypatch.setattr('anaconda_project.internal.conda_api._get_conda_command', get_command)
+        assert dict(root_prefix="/foo") == conda_api.info()
+
+    with_directory_contents(dict(), do_test)
+
+
 def test_conda_invoke_zero_returncode_with_stuff_on_stderr(monkeypatch, capsys):
     def get_command(extra_args):
         return tmp_script_commandline("""from __future__ import print_function
@@ -231,7 +250,12 @@ sys.exit(0)
 
 
 def test_conda_create_gets_channels(monkeypatch):
-    def mock_call_conda(extra_args, json_mode=False, platform=None, stdout_callback=None, stderr_callback=None):
+    def mock_call_conda(extra_args,
+                        json_mode=False,
+                        platform=None,
+                        stdout_callback=None,
+                        stderr_callback=None,
+                        progress_callback=None):
         assert ['create', '--yes', '--prefix', '/prefix', '--channel', 'foo', 'python'] == extra_args
 
     monkeypatch.setattr('anaconda_project.internal.conda_api._call_conda', mock_call_conda)
@@ -239,13 +263,136 @@ def test_conda_create_gets_channels(monkeypatch):
 
 
 def test_conda_install_gets_channels(monkeypatch):
-    def mock_call_conda(extra_args, json_mode=False, platform=None, stdout_callback=None, stderr_callback=None):
+    def mock_call_conda(extra_args,
+                        json_mode=False,
+                        platform=None,
+                        stdout_callback=None,
+                        stderr_callback=None,
+                        progress_callback=None):
         assert ['install', '--yes', '--prefix', '/prefix', '--channel', 'foo', 'python'] == extra_args
 
     monkeypatch.setattr('anaconda_project.internal.conda_api._call_conda', mock_call_conda)
     conda_api.install(prefix='/prefix', pkgs=['python'], channels=['foo'])
 
 
+def test_progress_parser(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('time.time', lambda: now[0])
+    events = []
+    parser = conda_api._ProgressParser(events.append)
+
+    now[0] = 102.0
+    # records split across chunks, and some that aren't progress
+    parser.feed('{"fetch": "numpy-1.14.0         | 10 KB     | ", "finished": false, ')
+    parser.feed('"maxval": 1, "progress": 0.5}\n\0{"something": "else"}\n\0not json\0')
+    now[0] = 103.0
+    parser.feed('{"fetch": "numpy-1.14.0         | 10 KB     | ", "finished": true, "maxval": 1, "progress": 1}\n\0')
+    # older condas count bytes
+    parser.feed('{"fetch": "bokeh-0.12.4-py36_0.tar.bz2", "finished": false, "maxval": 4000, "progress": 1000}\n\0')
+    now[0] = 104.0
+    parser.feed('{"success": true}\n')
+    now[0] = 110.0
+    durations = parser.finish()
+
+    assert [('solve', 2.0), ('fetch', 1.0), ('link', 7.0)] == durations
+    assert [ProgressEvent(phase='fetch',
+                          package='numpy-1.14.0',
+                          fraction=0.5,
+                          bytes=5120,
+                          seconds=0.0), ProgressEvent(phase='fetch',
+                                                      package='numpy-1.14.0',
+                                                      fraction=1.0,
+                                                      bytes=10240,
+                                                      seconds=1.0), ProgressEvent(phase='fetch',
+                                                                                  package='bokeh-0.12.4-py36_0.tar.bz2',
+                                                                                  fraction=0.25,
+                                                                                  bytes=1000,
+                                                                                  seconds=1.0),
+            ProgressEvent(phase='solve',
+                          package=None,
+                          fraction=1.0,
+                          bytes=None,
+                          seconds=2.0), ProgressEvent(phase='fetch',
+                                                      package=None,
+                                                      fraction=1.0,
+                                                      bytes=None,
+                                                      seconds=1.0), ProgressEvent(phase='link',
+                                                                                  package=None,
+                                                                                  fraction=1.0,
+                                                                                  bytes=None,
+                                                                                  seconds=7.0)] == events
+
+
+def test_progress_parser_without_records(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('time.time', lambda: now[0])
+    events = []
+    parser = conda_api._ProgressParser(events.append)
+    parser.feed('{"success": true}\n')
+    now[0] = 101.0
+
+    assert [('solve', 1.0)] == parser.finish()
+    assert [ProgressEvent(phase='solve', package=None, fraction=1.0, bytes=None, seconds=1.0)] == events
+
+
+def test_conda_install_with_progress_callback(monkeypatch):
+    def get_command(extra_args):
+        assert '--json' == extra_args[-1]
+        return tmp_script_commandline("""from __future__ import print_function
+import sys
+sys.stdout.write('{"fetch": "foo-1.0 | 1 KB | ", "finished": false, "maxval": 1, "progress": 0.5}\\n\\0')
+sys.stdout.write('{"fetch": "foo-1.0 | 1 KB | ", "finished": true, "maxval": 1, "progress": 1}\\n\\0')
+print('{"success": true}')
+sys.exit(0)
+""")
+
+    def do_test(dirname):
+        monkeypatch.setattr('anaconda_project.internal.conda_api._get_conda_command', get_command)
+        stdout = []
+        events = []
+        conda_api.install(prefix=dirname, pkgs=['foo'], stdout_callback=stdout.append, progress_callback=events.append)
+
+        assert [] == stdout
+        assert [('fetch', 'foo-1.0', 0.5, 512), ('fetch', 'foo-1.0', 1.0, 1024)] == [
+            (event.phase, event.package, event.fraction, event.bytes) for event in events if event.package is not None
+        ]
+        assert ['solve', 'fetch', 'link'] == [event.phase for event in events if event.package is None]
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_conda_install_without_progress_callback(monkeypatch):
+    def get_command(extra_args):
+        assert '--json' not in extra_args
+        return tmp_script_commandline("""from __future__ import print_function
+import sys
+print('Solving environment: done')
+sys.exit(0)
+""")
+
+    class Logger(object):
+        def __init__(self):
+            self.messages = []
+
+        def info(self, message, *args):
+            self.messages.append(message % args)
+
+    def do_test(dirname):
+        monkeypatch.setattr('anaconda_project.internal.conda_api._get_conda_command', get_command)
+        logger = Logger()
+        verbose.push_verbose_logger(logger)
+        try:
+            stdout = []
+            conda_api.install(prefix=dirname, pkgs=['foo'], stdout_callback=stdout.append)
+        finally:
+            verbose.pop_verbose_logger()
+
+        assert 'Solving environment: done' == "".join(stdout).strip()
+        assert logger.messages[-1].startswith('conda install took ')
+
+    with_directory_contents(dict(), do_test)
+
+
 def test_resolve_root_prefix():
     prefix = conda_api.resolve_env_to_prefix('root')
     assert prefix is not None
@@ -581,6 +728,17 @@ def test_pip_style_specs():
         assert conda_api.parse_spec(case[0]) == case[1]
 
 
+def test_parse_spec_is_cached():
+    conda_api._parse_spec_cache.clear()
+    parsed = conda_api.parse_spec('foo=1.0=2')
+    assert parsed is conda_api.parse_spec('foo=1.0=2')
+    # failures are cached too
+    assert conda_api.parse_spec('=') is None
+    assert conda_api.parse_spec('=') is None
+    assert 2 == conda_api._parse_spec_cache.hits
+    assert 2 == conda_api._parse_spec_cache.misses
+
+
 def test_parse_platform():
     for p in conda_api.default_platforms_plus_32_bit:
         (name, bits) = conda_api.parse_platform(p)
@@ -16,14 +16,15 @@ import time
 from pprint import pprint
 
 from anaconda_project.env_spec import EnvSpec
-from anaconda_project.conda_manager import (CondaManagerError, CondaLockSet)
+from anaconda_project.conda_manager import (CondaManagerError, CondaLockSet, CondaEnvironmentDeviations)
 from anaconda_project.version import version
-from anaconda_project.frontend import NullFrontend
+from anaconda_project.frontend import NullFrontend, ProgressEvent
 
 from anaconda_project.internal.default_conda_manager import (DefaultCondaManager, _extract_common)
 import anaconda_project.internal.pip_api as pip_api
 import anaconda_project.internal.conda_api as conda_api
 
+from anaconda_project.internal.test.fake_frontend import FakeFrontend
 from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
 from anaconda_project.internal.test.test_conda_api import monkeypatch_conda_not_to_use_links
 
@@ -267,6 +268,72 @@ def test_conda_create_and_install_and_remove(monkeypatch):
 
 
 @pytest.mark.slow
+def test_conda_create_reports_progress(monkeypatch):
+    class ProgressFrontend(FakeFrontend):
+        structured_progress = True
+
+        def __init__(self):
+            super(ProgressFrontend, self).__init__()
+            self.events = []
+
+        def progress(self, event):
+            self.events.append(event)
+
+    events = [ProgressEvent(phase='fetch',
+                            package='ipython-6.0',
+                            fraction=0.5,
+                            bytes=None,
+                            seconds=1.0), ProgressEvent(phase='fetch',
+                                                        package='ipython-6.0',
+                                                        fraction=1.0,
+                                                        bytes=None,
+                                                        seconds=2.0), ProgressEvent(phase='fetch',
+                                                                                    package='ipython-6.0',
+                                                                                    fraction=1.0,
+                                                                                    bytes=None,
+                                                                                    seconds=2.0),
+              ProgressEvent(phase='solve',
+                            package=None,
+                            fraction=1.0,
+                            bytes=None,
+                            seconds=0.5), ProgressEvent(phase='fetch',
+                                                        package=None,
+                                                        fraction=1.0,
+                                                        bytes=None,
+                                                        seconds=2.0)]
+
+    def mock_create(prefix, pkgs, channels, stdout_callback, stderr_callback, progress_callback=None):
+        if progress_callback is None:
+            stdout_callback("Solving environment: done\n")
+        else:
+            for event in events:
+                progress_callback(event)
+        os.makedirs(os.path.join(prefix, 'conda-meta'))
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api.create', mock_create)
+
+    def do_test(dirname):
+        deviations = CondaEnvironmentDeviations(summary="Not created",
+                                                missing_packages=('ipython', ),
+                                                wrong_version_packages=(),
+                                                missing_pip_packages=(),
+                                                wrong_version_pip_packages=())
+
+        frontend = ProgressFrontend()
+        manager = DefaultCondaManager(frontend=frontend)
+        manager.fix_environment_deviations(os.path.join(dirname, "with_progress"), test_spec, deviations)
+        assert events == frontend.events
+        assert [] == frontend.logs
+
+        # everyone else gets conda's usual output
+        frontend = FakeFrontend()
+        manager = DefaultCondaManager(frontend=frontend)
+        manager.fix_environment_deviations(os.path.join(dirname, "without_progress"), test_spec, deviations)
+        assert ["Solving environment: done"] == frontend.logs
+
+    with_directory_contents(dict(), do_test)
+
+
 def test_timestamp_file_works(monkeypatch):
     monkeypatch_conda_not_to_use_links(monkeypatch)
 
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+from anaconda_project.internal import lru_cache
+
+
+def test_get_and_put():
+    cache = lru_cache.LRUCache("test", 3)
+    assert cache.hit_rate is None
+    assert cache.get('a') is None
+    assert 'nope' == cache.get('a', 'nope')
+    cache.put('a', 1)
+    cache.put('b', None)
+    assert 1 == cache.get('a')
+    assert cache.get('b', 'nope') is None
+    assert 2 == len(cache)
+    assert 2 == cache.hits
+    assert 2 == cache.misses
+    assert 0.5 == cache.hit_rate
+
+    cache.put('a', 2)
+    assert 2 == cache.get('a')
+    assert 2 == len(cache)
+
+    cache.clear()
+    assert 0 == len(cache)
+    assert cache.hit_rate is None
+
+
+def test_drops_least_recently_used():
+    cache = lru_cache.LRUCache("test", 3)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, key)
+    # using 'a' makes 'b' the oldest
+    assert 'a' == cache.get('a')
+    cache.put('d', 'd')
+    assert 3 == len(cache)
+    assert cache.get('b') is None
+    assert 'a' == cache.get('a')
+    assert 'c' == cache.get('c')
+    assert 'd' == cache.get('d')
+
+
+def test_log_hit_rates():
+    used = lru_cache.LRUCache("used", 3)
+    lru_cache.LRUCache("unused", 3)
+    used.put('a', 1)
+    used.get('a')
+    used.get('b')
+    used.get('a')
+
+    class Logger(object):
+        def __init__(self):
+            self.messages = []
+
+        def info(self, message, *args):
+            self.messages.append(message % args)
+
+    logger = Logger()
+    lru_cache.log_hit_rates(logger)
+    assert "used cache: 2 hits, 1 misses (66.7% hit rate), 1 entries" in logger.messages
+    assert [] == [message for message in logger.messages if message.startswith("unused")]
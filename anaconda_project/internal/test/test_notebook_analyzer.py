@@ -9,6 +9,7 @@ from __future__ import absolute_import, print_function, unicode_literals
 
 import json
 import os
+import time
 
 import anaconda_project.internal.notebook_analyzer as notebook_analyzer
 
@@ -93,3 +94,163 @@ def test_extras_with_io_error(monkeypatch):
     assert [] != errors
     assert extras is None
     assert 'Failed to read or parse' in errors[0]
+
+
+def _extras_of_json(json_string):
+    def check(dirname):
+        errors = []
+        result = notebook_analyzer.extras(os.path.join(dirname, "foo.ipynb"), errors)
+        return (result, errors)
+
+    return with_directory_contents({"foo.ipynb": json_string}, check)
+
+
+def test_extras_skips_outputs_and_other_keys():
+    ipynb = {
+        "metadata": {"kernelspec": {"name": "python3",
+                                    "tricky": "[{\"source\": [\"@fusion.register\"]}"}},
+        "cells": [
+            {"cell_type": "markdown",
+             "outputs": [{"data": {"text/plain": ["}]{[\\\"", "@fusion.register\n"]}}, 42, None, True, 1.5e3],
+             "source": ["hello\n"]}, ["not", "a", "cell"], {"cell_type": "code",
+                                                            "source": "@fusion.register\n"},
+            {"cell_type": "code",
+             "execution_count": 3,
+             "source": ["# a comment\n", "@fusion.register\n", "def f():\n", "    pass\n"],
+             "outputs": []}
+        ],
+        "nbformat": 4
+    }
+    (result, errors) = _extras_of_json(json.dumps(ipynb, indent=1))
+    assert [] == errors
+    assert {'registers_fusion_function': True} == result
+
+    # a string source was never looked at
+    del ipynb['cells'][3]
+    (result, errors) = _extras_of_json(json.dumps(ipynb))
+    assert [] == errors
+    assert {} == result
+
+
+def test_extras_of_not_a_notebook():
+    for json_string in ('[]', '"cells"', '{}', '{"cells": 3}', '{"cells": [1, 2]}', '  null  '):
+        (result, errors) = _extras_of_json(json_string)
+        assert [] == errors
+        assert {} == result
+
+
+def test_extras_of_broken_json():
+    for json_string in ('', '{', '{"cells": [', '{"cells" 3}', '{"cells": [{"source": ["x"}]}', '{"a": "b',
+                        '{"a": 1 "b": 2}', '{3: 4}', '{"cells": [{"source": [nope]}]}', 'not valid json', '{} {}'):
+        (result, errors) = _extras_of_json(json_string)
+        assert result is None
+        assert 1 == len(errors)
+        assert 'Failed to read or parse' in errors[0]
+
+
+def test_extras_are_cached(monkeypatch):
+    def check(dirname):
+        monkeypatch.setenv('ANACONDA_PROJECT_CACHE_PATH', os.path.join(dirname, "cache"))
+        filename = os.path.join(dirname, "foo.ipynb")
+        when = time.time() - 100
+        os.utime(filename, (when, when))
+
+        reads = []
+        real_read_extras = notebook_analyzer._read_extras
+
+        def counting_read_extras(filename):
+            reads.append(filename)
+            return real_read_extras(filename)
+
+        monkeypatch.setattr('anaconda_project.internal.notebook_analyzer._read_extras', counting_read_extras)
+
+        errors = []
+        assert {'registers_fusion_function': True} == notebook_analyzer.extras(filename, errors)
+        assert {'registers_fusion_function': True} == notebook_analyzer.extras(filename, errors)
+        assert [] == errors
+        assert 1 == len(reads)
+        assert 1 == len(os.listdir(os.path.join(dirname, "cache", "notebooks")))
+
+        # a new mtime means we look again
+        with open(filename, 'w') as f:
+            f.write(json.dumps(_fake_notebook_json_with_code("pass")))
+        os.utime(filename, (when + 1, when + 1))
+        assert {} == notebook_analyzer.extras(filename, errors)
+        assert 2 == len(reads)
+
+    json_string = json.dumps(_fake_notebook_json_with_code("@fusion.register\ndef f():\n    pass"))
+    with_directory_contents({"foo.ipynb": json_string}, check)
+
+
+def test_extras_cached_in_one_file_per_project(monkeypatch):
+    def check(dirname):
+        cache_dir = os.path.join(dirname, "cache", "notebooks")
+        monkeypatch.setenv('ANACONDA_PROJECT_CACHE_PATH', os.path.join(dirname, "cache"))
+        names = ["foo.ipynb", "bar.ipynb", os.path.join("sub", "baz.ipynb")]
+        filenames = [os.path.join(dirname, name) for name in names]
+        when = time.time() - 100
+        for filename in filenames:
+            os.utime(filename, (when, when))
+
+        errors = []
+        assert [{}, {}, {}] == notebook_analyzer.extras_for_notebooks(filenames, errors, project_directory=dirname)
+        assert [] == errors
+        assert 1 == len(os.listdir(cache_dir))
+        with open(notebook_analyzer._cache_filename(dirname)) as f:
+            assert set(filenames) == set(json.load(f)['notebooks'].keys())
+
+        # deleted notebooks are dropped from the cache
+        os.remove(filenames[1])
+        assert {} == notebook_analyzer.extras(filenames[0], errors, project_directory=dirname)
+        assert [] == errors
+        assert 1 == len(os.listdir(cache_dir))
+        with open(notebook_analyzer._cache_filename(dirname)) as f:
+            assert set([filenames[0], filenames[2]]) == set(json.load(f)['notebooks'].keys())
+
+    notebook = json.dumps(_fake_notebook_json_with_code("pass"))
+    with_directory_contents({"foo.ipynb": notebook, "bar.ipynb": notebook, "sub/baz.ipynb": notebook}, check)
+
+
+def test_extras_not_cached_if_just_modified(monkeypatch):
+    def check(dirname):
+        monkeypatch.setenv('ANACONDA_PROJECT_CACHE_PATH', os.path.join(dirname, "cache"))
+        errors = []
+        assert {} == notebook_analyzer.extras(os.path.join(dirname, "foo.ipynb"), errors)
+        assert [] == errors
+        assert not os.path.exists(os.path.join(dirname, "cache"))
+
+    with_directory_contents({"foo.ipynb": json.dumps(_fake_notebook_json_with_code("pass"))}, check)
+
+
+def test_extras_for_notebooks_in_order():
+    def check(dirname):
+        names = ["nb%d.ipynb" % i for i in range(20)]
+        filenames = [os.path.join(dirname, name) for name in names]
+
+        errors = []
+        all_extras = notebook_analyzer.extras_for_notebooks(filenames, errors)
+        expected = [({'registers_fusion_function': True} if i % 3 == 0 else {}) for i in range(20)]
+        expected[5] = None
+        expected[11] = None
+        assert expected == all_extras
+        assert 2 == len(errors)
+        assert "nb5.ipynb" in errors[0]
+        assert "nb11.ipynb" in errors[1]
+
+    contents = dict()
+    for i in range(20):
+        code = "@fusion.register\ndef f():\n    pass" if i % 3 == 0 else "pass"
+        contents["nb%d.ipynb" % i] = json.dumps(_fake_notebook_json_with_code(code))
+    contents["nb5.ipynb"] = "{"
+    contents["nb11.ipynb"] = "not json"
+    with_directory_contents(contents, check)
+
+
+def test_extras_of_huge_notebook_not_analyzed(monkeypatch):
+    def check(filename):
+        monkeypatch.setattr('anaconda_project.internal.notebook_analyzer._MAX_ANALYZED_SIZE', 10)
+        errors = []
+        assert {} == notebook_analyzer.extras(filename, errors)
+        assert [] == errors
+
+    _with_code_in_notebook_file("@fusion.register\ndef f():\n    pass", check)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import gzip
+import io
+import os
+
+import pytest
+
+from anaconda_project.internal import parallel_compress
+
+# some compressible but not trivially compressible data
+_DATA = b''.join([("line %d of %s\n" % (i, "x" * (i % 37))).encode('utf-8') for i in range(20000)])
+
+
+def _compress(compression, data, chunk_size=1000, **kwargs):
+    out = io.BytesIO()
+    with parallel_compress.ParallelCompressedFile(out, compression, **kwargs) as compressed:
+        for i in range(0, len(data), chunk_size):
+            compressed.write(data[i:i + chunk_size])
+    return out.getvalue()
+
+
+def _decompress(compression, data):
+    if compression == 'gz':
+        return gzip.GzipFile(fileobj=io.BytesIO(data), mode='rb').read()
+    elif compression == 'xz':
+        import lzma
+        return lzma.decompress(data)
+    else:
+        return parallel_compress.zstd_reader(io.BytesIO(data)).read()
+
+
+def _skip_if_unavailable(compression):
+    if parallel_compress.unavailable_reason(compression) is not None:
+        pytest.skip(parallel_compress.unavailable_reason(compression))
+
+
+@pytest.mark.parametrize('compression', ['gz', 'xz', 'zst'])
+def test_round_trip_many_blocks(compression):
+    _skip_if_unavailable(compression)
+    compressed = _compress(compression, _DATA, block_size=64 * 1024, workers=3)
+    assert len(compressed) < len(_DATA)
+    assert _DATA == _decompress(compression, compressed)
+
+
+@pytest.mark.parametrize('compression', ['gz', 'xz', 'zst'])
+def test_round_trip_one_worker(compression):
+    _skip_if_unavailable(compression)
+    compressed = _compress(compression, _DATA, block_size=64 * 1024, workers=1)
+    assert _DATA == _decompress(compression, compressed)
+
+
+@pytest.mark.parametrize('compression', ['gz', 'xz', 'zst'])
+def test_round_trip_empty(compression):
+    _skip_if_unavailable(compression)
+    compressed = _compress(compression, b'')
+    assert len(compressed) > 0
+    assert b'' == _decompress(compression, compressed)
+
+
+def test_write_bigger_than_block_size():
+    compressed = _compress('gz', _DATA, chunk_size=len(_DATA), block_size=1000, workers=2)
+    assert _DATA == _decompress('gz', compressed)
+
+
+def test_output_does_not_depend_on_workers():
+    one = _compress('gz', _DATA, block_size=64 * 1024, workers=1)
+    several = _compress('gz', _DATA, block_size=64 * 1024, workers=4)
+    assert one == several
+
+
+def test_compression_level():
+    fast = _compress('gz', _DATA, level=1)
+    best = _compress('gz', _DATA, level=9)
+    assert len(best) < len(fast)
+    assert _DATA == _decompress('gz', fast)
+
+
+def test_check_level():
+    assert parallel_compress.check_level('gz', None) is None
+    assert parallel_compress.check_level('gz', 0) is None
+    assert parallel_compress.check_level('zst', 22) is None
+    assert "Compression level for zst must be between 1 and 22, not 0." == parallel_compress.check_level('zst', 0)
+
+
+def test_close_twice():
+    out = io.BytesIO()
+    compressed = parallel_compress.ParallelCompressedFile(out, 'gz')
+    assert compressed.writable()
+    compressed.write(b'hello')
+    compressed.flush()
+    # nothing written until we close
+    assert b'' == out.getvalue()
+    compressed.close()
+    value = out.getvalue()
+    compressed.close()
+    assert value == out.getvalue()
+    assert b'hello' == _decompress('gz', value)
+
+
+def test_abort_on_exception():
+    out = io.BytesIO()
+    with pytest.raises(RuntimeError):
+        with parallel_compress.ParallelCompressedFile(out, 'gz', block_size=10, workers=2) as compressed:
+            compressed.write(b'x' * 100)
+            raise RuntimeError("oops")
+    # we didn't write the final block or the pending ones
+    assert len(out.getvalue()) < len(_compress('gz', b'x' * 100, block_size=10, workers=2))
+
+
+def test_error_compressing_block(monkeypatch):
+    def broken_compress(data, level):
+        raise IOError("NOPE")
+
+    monkeypatch.setitem(parallel_compress._BLOCK_COMPRESSORS, 'gz', broken_compress)
+    out = io.BytesIO()
+    with pytest.raises(IOError) as excinfo:
+        with parallel_compress.ParallelCompressedFile(out, 'gz', block_size=10, workers=2) as compressed:
+            compressed.write(b'x' * 100)
+    assert "NOPE" in str(excinfo.value)
+
+
+def test_write_to_real_file(tmpdir):
+    filename = os.path.join(str(tmpdir), "foo.gz")
+    with open(filename, 'wb') as f:
+        with parallel_compress.ParallelCompressedFile(f, 'gz', block_size=1000) as compressed:
+            compressed.write(_DATA)
+    with gzip.open(filename, 'rb') as f:
+        assert _DATA == f.read()
+
+
+def test_ordered_map_keeps_order():
+    import time
+
+    def slow_for_small(i):
+        # make earlier items finish later
+        time.sleep((10 - i) * 0.001)
+        return i * 2
+
+    assert [i * 2 for i in range(10)] == list(parallel_compress.ordered_map(slow_for_small, range(10), workers=4))
+    assert [] == list(parallel_compress.ordered_map(slow_for_small, [], workers=4))
+
+
+def test_ordered_map_raises_in_order():
+    def fail_on_three(i):
+        if i == 3:
+            raise IOError("NOPE")
+        return i
+
+    results = []
+    with pytest.raises(IOError) as excinfo:
+        for result in parallel_compress.ordered_map(fail_on_three, range(10), workers=2):
+            results.append(result)
+    assert "NOPE" in str(excinfo.value)
+    assert [0, 1, 2] == results
+
+
+def test_ordered_map_closed_early():
+    seen = []
+
+    def record(i):
+        seen.append(i)
+        return i
+
+    results = parallel_compress.ordered_map(record, range(1000), workers=2)
+    assert 0 == next(results)
+    results.close()
+    # we didn't go on to compute everything
+    assert len(seen) < 1000
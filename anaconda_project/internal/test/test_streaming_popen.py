@@ -7,6 +7,7 @@
 # -----------------------------------------------------------------------------
 from __future__ import absolute_import, print_function
 
+import json
 import os
 import platform
 import pytest
@@ -20,7 +21,16 @@ def add_lineseps(lines):
     return list(map(lambda l: l + os.linesep, lines))
 
 
-def test_streaming():
+def use_threads_if(monkeypatch, use_threads):
+    if use_threads:
+        monkeypatch.setattr("anaconda_project.internal.streaming_popen._pipes_are_selectable", lambda: False)
+    elif not streaming_popen._pipes_are_selectable():
+        pytest.skip("can't select() on pipes here")
+
+
+@pytest.mark.parametrize('use_threads', [False, True])
+def test_streaming(monkeypatch, use_threads):
+    use_threads_if(monkeypatch, use_threads)
     print_stuff = tmp_script_commandline(u"""# -*- coding: utf-8 -*-
 from __future__ import print_function
 import sys
@@ -94,7 +104,9 @@ sys.exit(2)
     assert p.returncode is 2
 
 
-def test_bad_utf8():
+@pytest.mark.parametrize('use_threads', [False, True])
+def test_bad_utf8(monkeypatch, use_threads):
+    use_threads_if(monkeypatch, use_threads)
     print_bad = tmp_script_commandline(u"""# -*- coding: utf-8 -*-
 from __future__ import print_function
 import os
@@ -133,7 +145,9 @@ sys.exit(0)
     assert "".join(expected_err) == "".join(stderr_from_callback)
 
 
-def test_callbacks_are_none():
+@pytest.mark.parametrize('use_threads', [False, True])
+def test_callbacks_are_none(monkeypatch, use_threads):
+    use_threads_if(monkeypatch, use_threads)
     print_stuff = tmp_script_commandline(u"""# -*- coding: utf-8 -*-
 from __future__ import print_function
 import sys
@@ -155,7 +169,9 @@ sys.exit(0)
     assert p.returncode is 0
 
 
-def test_io_error(monkeypatch):
+@pytest.mark.parametrize('use_threads', [False, True])
+def test_io_error(monkeypatch, use_threads):
+    use_threads_if(monkeypatch, use_threads)
     print_hello = tmp_script_commandline("""from __future__ import print_function
 import os
 import sys
@@ -180,8 +196,71 @@ sys.exit(0)
         raise IOError("Nope")
 
     monkeypatch.setattr("anaconda_project.internal.streaming_popen._read_from_stream", mock_read)
+    monkeypatch.setattr("anaconda_project.internal.streaming_popen._read_from_pipe", mock_read)
 
     with pytest.raises(IOError) as excinfo:
         streaming_popen.popen(print_hello, on_stdout, on_stderr)
 
     assert "Nope" in str(excinfo.value)
+
+
+@pytest.mark.parametrize('use_threads', [False, True])
+def test_retain_tail_or_nothing(monkeypatch, use_threads):
+    use_threads_if(monkeypatch, use_threads)
+
+    print_lots = tmp_script_commandline(u"""from __future__ import print_function
+import sys
+
+for i in range(10000):
+    print("line %d" % i)
+    print("error %d" % i, file=sys.stderr)
+
+sys.exit(0)
+""")
+
+    stdout_from_callback = []
+
+    def on_stdout(data):
+        stdout_from_callback.append(data)
+
+    (p, out_lines, err_lines) = streaming_popen.popen(print_lots,
+                                                      on_stdout,
+                                                      None,
+                                                      stdout_retain=None,
+                                                      stderr_retain=9 * len("error 9999" + os.linesep))
+
+    assert [] == out_lines
+    assert "".join(add_lineseps(["line %d" % i for i in range(10000)])) == "".join(stdout_from_callback)
+
+    assert add_lineseps(["error %d" % i for i in range(9991, 10000)]) == err_lines
+    assert p.returncode == 0
+
+
+@pytest.mark.parametrize('use_threads', [False, True])
+def test_retain_json_document(monkeypatch, use_threads):
+    use_threads_if(monkeypatch, use_threads)
+
+    print_json = tmp_script_commandline(u"""from __future__ import print_function
+import json
+import sys
+
+for i in range(1000):
+    sys.stdout.write(json.dumps(dict(fetch="foo", progress=i / 1000.0)) + "\\n\\0")
+print(json.dumps(dict(success=True), indent=2))
+
+sys.exit(0)
+""")
+
+    stdout_from_callback = []
+
+    def on_stdout(data):
+        stdout_from_callback.append(data)
+
+    (p, out_lines, err_lines) = streaming_popen.popen(print_json,
+                                                      on_stdout,
+                                                      None,
+                                                      stdout_retain=streaming_popen.RETAIN_JSON_DOCUMENT)
+
+    assert dict(success=True) == json.loads("".join(out_lines))
+    assert 1000 == "".join(stdout_from_callback).count("\0")
+    assert p.returncode == 0
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import os
+
+from anaconda_project.internal.user_cache import user_cache_directory
+
+
+def test_user_cache_directory_override(monkeypatch):
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_PATH', os.path.join("some", "cache"))
+    assert os.path.join("some", "cache") == user_cache_directory()
+    assert os.path.join("some", "cache", "foo", "bar") == user_cache_directory("foo", "bar")
+
+
+def test_user_cache_directory_linux(monkeypatch):
+    monkeypatch.delenv('ANACONDA_PROJECT_CACHE_PATH', raising=False)
+    monkeypatch.setattr('sys.platform', 'linux')
+    monkeypatch.setenv('XDG_CACHE_HOME', os.path.join("xdg", "cache"))
+    assert os.path.join("xdg", "cache", "anaconda-project", "foo") == user_cache_directory("foo")
+    monkeypatch.delenv('XDG_CACHE_HOME')
+    assert os.path.join(os.path.expanduser("~"), ".cache", "anaconda-project") == user_cache_directory()
+
+
+def test_user_cache_directory_mac(monkeypatch):
+    monkeypatch.delenv('ANACONDA_PROJECT_CACHE_PATH', raising=False)
+    monkeypatch.setattr('sys.platform', 'darwin')
+    assert os.path.join(os.path.expanduser("~"), "Library", "Caches", "anaconda-project") == user_cache_directory()
+
+
+def test_user_cache_directory_windows(monkeypatch):
+    monkeypatch.delenv('ANACONDA_PROJECT_CACHE_PATH', raising=False)
+    monkeypatch.setattr('sys.platform', 'win32')
+    monkeypatch.setenv('LOCALAPPDATA', os.path.join("local", "app", "data"))
+    assert os.path.join("local", "app", "data", "anaconda-project", "Cache") == user_cache_directory()
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Where we keep per-user state that's only there to save work."""
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+
+
+def user_cache_directory(*subdirs):
+    """Get a directory in the per-user cache; it may not exist yet.
+
+    ANACONDA_PROJECT_CACHE_PATH overrides the usual location for
+    the platform.
+    """
+    base = os.environ.get('ANACONDA_PROJECT_CACHE_PATH')
+    if not base:
+        if sys.platform == 'win32':
+            local_app_data = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join("~", "AppData", "Local"))
+            base = os.path.join(local_app_data, "anaconda-project", "Cache")
+        elif sys.platform == 'darwin':
+            base = os.path.expanduser(os.path.join("~", "Library", "Caches", "anaconda-project"))
+        else:
+            xdg_cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join("~", ".cache"))
+            base = os.path.join(xdg_cache_home, "anaconda-project")
+    return os.path.join(base, *subdirs)
@@ -14,7 +14,7 @@ import os
 from os.path import join
 
 from anaconda_project.env_spec import (EnvSpec, _anaconda_default_env_spec, _find_importable_spec,
-                                       _find_out_of_sync_importable_spec)
+                                       _find_out_of_sync_importable_spec, _IMPORTABLE_FILENAMES)
 from anaconda_project.requirements_registry.registry import RequirementsRegistry
 from anaconda_project.requirements_registry.requirement import EnvVarRequirement
 from anaconda_project.requirements_registry.requirements.conda_env import (CondaEnvRequirement,
@@ -22,8 +22,12 @@ from anaconda_project.requirements_registry.requirements.conda_env import (Conda
 from anaconda_project.requirements_registry.requirements.download import DownloadRequirement
 from anaconda_project.requirements_registry.requirements.service import ServiceRequirement
 from anaconda_project.project_commands import (ProjectCommand, all_known_command_attributes)
+# the command types used to be defined here
+from anaconda_project.project_commands import (  # noqa: F401
+    COMMAND_TYPE_CONDA_APP_ENTRY, COMMAND_TYPE_SHELL, COMMAND_TYPE_WINDOWS, COMMAND_TYPE_NOTEBOOK,
+    COMMAND_TYPE_BOKEH_APP, ALL_COMMAND_TYPES)
 from anaconda_project.project_file import ProjectFile
-from anaconda_project.project_lock_file import ProjectLockFile
+from anaconda_project.project_lock_file import ProjectLockFile, _is_package_index, _resolve_package_index
 from anaconda_project.archiver import _list_relative_paths_for_unignored_project_files
 from anaconda_project.version import version
 from anaconda_project.conda_manager import CondaLockSet
@@ -37,17 +41,6 @@ import anaconda_project.internal.conda_api as conda_api
 import anaconda_project.internal.pip_api as pip_api
 from anaconda_project.internal import plugins as plugins_api
 
-# These strings are used in the command line options to anaconda-project,
-# so changing them has back-compat consequences.
-COMMAND_TYPE_CONDA_APP_ENTRY = 'conda_app_entry'
-COMMAND_TYPE_SHELL = 'unix'
-COMMAND_TYPE_WINDOWS = 'windows'
-COMMAND_TYPE_NOTEBOOK = 'notebook'
-COMMAND_TYPE_BOKEH_APP = 'bokeh_app'
-
-ALL_COMMAND_TYPES = (COMMAND_TYPE_CONDA_APP_ENTRY, COMMAND_TYPE_SHELL, COMMAND_TYPE_WINDOWS, COMMAND_TYPE_NOTEBOOK,
-                     COMMAND_TYPE_BOKEH_APP)
-
 
 class ProjectProblem(object):
     """A possibly-autofixable problem with a project."""
@@ -132,7 +125,50 @@ def _fatal_problem(problems):
             return True
     return False
 
+# these are computed per env spec along with the requirements, not with the env specs
+_ENV_SPEC_REQUIREMENT_SECTIONS = ('variables', 'downloads', 'services')
+
+
+def _env_specs_inputs(project_file):
+    # what the env specs and lock sets are computed from in the project file
+    env_specs = project_file.get_value('env_specs', None)
+    if is_dict(env_specs):
+        env_specs = [(name, [(key, repr(value))
+                             for (key, value) in attrs.items() if key not in _ENV_SPEC_REQUIREMENT_SECTIONS] if
+                      is_dict(attrs) else repr(attrs)) for (name, attrs) in env_specs.items()]
+    else:
+        env_specs = repr(env_specs)
+    return (env_specs, repr(project_file.get_value('packages', None)), repr(project_file.get_value('channels', None)),
+            repr(project_file.get_value('platforms', None)), repr(project_file.get_value(
+                ['skip_imports', 'environment'], None)))
+
+
+def _requirements_inputs(project_file):
+    # what the requirements are computed from in the project file
+    inputs = [repr(project_file.get_value(section, None)) for section in _ENV_SPEC_REQUIREMENT_SECTIONS]
+    env_specs = project_file.get_value('env_specs', None)
+    if is_dict(env_specs):
+        for (name, attrs) in env_specs.items():
+            if is_dict(attrs):
+                inputs.append((name, [repr(attrs.get(section, None)) for section in _ENV_SPEC_REQUIREMENT_SECTIONS]))
+    return inputs
+
+
+def _importable_files_signature(directory_path):
+    # environment.yml and friends, which we check the env specs against
+    signature = []
+    for filename in _IMPORTABLE_FILENAMES:
+        try:
+            stat_result = os.stat(os.path.join(directory_path, filename))
+            signature.append((getattr(stat_result, 'st_mtime_ns', stat_result.st_mtime), stat_result.st_size))
+        except OSError:
+            signature.append(None)
+    return signature
+
 
+# The validated config only lives as long as its Project; it isn't
+# saved between runs, because problems carry fix functions and
+# requirements refer to the registry, so neither can be serialized.
 class _ConfigCache(object):
     def __init__(self, directory_path, registry):
         self.directory_path = directory_path
@@ -152,6 +188,27 @@ class _ConfigCache(object):
         self.locking_globally_enabled = False
         self.default_env_spec_name = None
         self.global_base_env_spec = None
+        # section name => (inputs, problems, requirements) from the last time we computed it
+        self._sections = dict()
+        # goes up each time we make new EnvSpec objects
+        self._env_specs_version = 0
+
+    def _update_section(self, name, inputs, updater, problems, requirements):
+        # Sections are only recomputed when something they are
+        # computed from has changed; otherwise we reuse the problems
+        # and requirements from last time, and the attributes the
+        # updater set last time are still right.
+        cached = self._sections.get(name)
+        if cached is None or cached[0] != inputs:
+            section_problems = []
+            section_requirements = dict()
+            updater(section_problems, section_requirements)
+            cached = (inputs, section_problems, section_requirements)
+            self._sections[name] = cached
+        (_, section_problems, section_requirements) = cached
+        problems.extend(section_problems)
+        for (env_spec_name, env_spec_requirements) in section_requirements.items():
+            requirements.setdefault(env_spec_name, []).extend(env_spec_requirements)
 
     def update(self, project_file, lock_file):
         if project_file.change_count == self.project_file_count and \
@@ -185,26 +242,51 @@ class _ConfigCache(object):
                                        ('name', 'description', 'icon', 'variables', 'downloads', 'services',
                                         'env_specs', 'commands', 'packages', 'channels', 'platforms', 'skip_imports'))
 
-            _unknown_field_suggestions(lock_file, problems, lock_file.root, ('env_specs', 'locking_enabled'))
+            _unknown_field_suggestions(lock_file, problems, lock_file.root,
+                                       ('env_specs', 'locking_enabled', 'package_table'))
 
             self._update_name(problems, project_file)
             self._update_description(problems, project_file)
             self._update_icon(problems, project_file)
-            self._update_lock_sets(problems, lock_file)
-            self._update_env_specs(problems, project_file, lock_file)
-            # future: we could un-hardcode this so plugins can add stuff here
-            self._update_variables(requirements, problems, project_file)
-            self._update_downloads(requirements, problems, project_file)
-            self._update_services(requirements, problems, project_file)
+
+            def update_env_specs(problems, requirements):
+                self._update_lock_sets(problems, lock_file)
+                self._update_env_specs(problems, project_file, lock_file)
+                self._env_specs_version += 1
+
+            # the lock file can be large, so rather than compare its
+            # contents we recompute whenever it has been reloaded or
+            # changed at all; the env specs depend on most of it anyway.
+            self._update_section('env_specs', (lock_file.change_count, _env_specs_inputs(project_file),
+                                               _importable_files_signature(self.directory_path)), update_env_specs,
+                                 problems, requirements)
+
+            def update_requirements(problems, requirements):
+                # future: we could un-hardcode this so plugins can add stuff here
+                self._update_variables(requirements, problems, project_file)
+                self._update_downloads(requirements, problems, project_file)
+                self._update_services(requirements, problems, project_file)
+
+            self._update_section('requirements', (self._env_specs_version, _requirements_inputs(project_file)),
+                                 update_requirements, problems, requirements)
+
             # this MUST be after we _update_variables since we may get CondaEnvRequirement
             # options in the variables section, and after _update_env_specs
             # since we use those
             self._update_conda_env_requirements(requirements, problems, project_file)
 
-            # this MUST be after we update env reqs so we have the valid env spec names
-            self._update_commands(problems, project_file, requirements)
+            # the notebooks in the project are an input to the commands section
+            notebooks = self._list_notebooks(project_file, requirements)
 
-            self._verify_command_dependencies(problems, project_file)
+            def update_commands(problems, requirements):
+                # this MUST be after we update env reqs so we have the valid env spec names
+                self._update_commands(problems, project_file, notebooks)
+                self._verify_command_dependencies(problems, project_file)
+
+            self._update_section('commands', (self._env_specs_version, self.default_env_spec_name,
+                                              repr(project_file.get_value('commands', None)),
+                                              repr(project_file.get_value(['skip_imports', 'notebooks'])), notebooks),
+                                 update_commands, problems, requirements)
 
         self.requirements = requirements
         self.problems = _make_problems_into_objects(problems)
@@ -463,6 +545,20 @@ class _ConfigCache(object):
 
         return (deps, pip_deps)
 
+    def _resolve_package_indexes(self, problems, lock_file, name, platform, package_table, packages):
+        resolved = []
+        for item in packages:
+            if _is_package_index(item):
+                spec = _resolve_package_index(package_table, item)
+                if spec is None:
+                    _file_problem(problems, lock_file,
+                                  "Package %d for %s in env spec '%s' in lock file isn't in 'package_table:'" %
+                                  (item, platform, name))
+                    continue
+                item = spec
+            resolved.append(item)
+        return resolved
+
     def _update_lock_sets(self, problems, lock_file):
         self.lock_sets = dict()
         self.locking_globally_enabled = False
@@ -473,6 +569,13 @@ class _ConfigCache(object):
         else:
             self.locking_globally_enabled = enabled
 
+        package_table = lock_file.get_value(['package_table'], [])
+        if not (is_list(package_table) and all(is_string(spec) for spec in package_table)):
+            _file_problem(problems, lock_file,
+                          "'package_table:' section in lock file should be a list of package specs, found %r" %
+                          (package_table, ))
+            package_table = []
+
         lock_sets = lock_file.get_value(['env_specs'], {})
         if not is_dict(lock_sets):
             _file_problem(problems, lock_file, ("'env_specs:' section in lock file should be a dictionary from " +
@@ -517,8 +620,12 @@ class _ConfigCache(object):
 
             for platform in packages_by_platform.keys():
                 previous_problem_count = len(problems)
+                packages = packages_by_platform[platform]
+                if is_list(packages):
+                    packages = self._resolve_package_indexes(problems, lock_file, name, platform, package_table,
+                                                             packages)
                 # this may set problems due to invalid package specs
-                (deps, pip_deps) = self._parse_packages(problems, lock_file, platform, packages_by_platform)
+                (deps, pip_deps) = self._parse_packages(problems, lock_file, platform, {platform: packages})
 
                 if len(problems) > previous_problem_count:
                     continue
@@ -749,12 +856,9 @@ class _ConfigCache(object):
                     else:
                         # If conda ever had RPM-like "Obsoletes" then this situation _may_ happen
                         # in correct scenarios.
-                        lock_set_names = set()
-                        for package in conda_packages:
-                            parsed = conda_api.parse_spec(package)
-                            if parsed is not None:
-                                lock_set_names.add(parsed.name)
-                        unlocked_names = env_spec.conda_package_names_set - lock_set_names
+                        lock_set_names = env_spec.lock_set.package_specs_by_name_for_platform(platform)
+                        unlocked_names = set(
+                            [name for name in env_spec.conda_package_names_set if name not in lock_set_names])
                         if len(unlocked_names) > 0:
                             text = "Lock file is missing %s packages for env spec %s on %s (%s)" % (
                                 len(unlocked_names), env_spec.name, platform, ",".join(sorted(list(unlocked_names))))
@@ -852,7 +956,7 @@ class _ConfigCache(object):
         requirement = CondaEnvRequirement(registry=self.registry, env_specs=self.env_specs)
         self._add_requirement(requirements, self.global_base_env_spec, requirement)
 
-    def _update_commands(self, problems, project_file, requirements):
+    def _update_commands(self, problems, project_file, notebooks):
         failed = False
 
         first_command_name = None
@@ -956,7 +1060,7 @@ class _ConfigCache(object):
                 if not failed:
                     commands[name] = ProjectCommandClass(name=name, attributes=copied_attrs)
 
-        self._verify_notebook_commands(commands, problems, requirements, project_file)
+        self._verify_notebook_commands(commands, problems, notebooks, project_file)
 
         if failed:
             self.commands = dict()
@@ -971,19 +1075,11 @@ class _ConfigCache(object):
             # note: this may be None
             self.default_command_name = first_command_name
 
-    def _verify_notebook_commands(self, commands, problems, requirements, project_file):
-        skipped_notebooks = project_file.get_value(['skip_imports', 'notebooks'])
-        if skipped_notebooks is not None:
-            if skipped_notebooks is True:
-                # skip ALL notebooks forever
-                return
-            elif not is_list(skipped_notebooks):
-                _file_problem(
-                    problems, project_file,
-                    "'skip_imports: notebooks:' value should be a list, found {}".format(repr(skipped_notebooks)))
-                return
-        else:
-            skipped_notebooks = []
+    def _list_notebooks(self, project_file, requirements):
+        # Returns (sorted notebook names, errors); the names are None if we couldn't list the files.
+        if project_file.get_value(['skip_imports', 'notebooks']) is True:
+            # we won't look at them
+            return ((), ())
 
         recorder = _new_error_recorder(_null_frontend())
         flat_requirements = []
@@ -993,9 +1089,7 @@ class _ConfigCache(object):
                                                                  frontend=recorder,
                                                                  requirements=flat_requirements)
         if files is None:
-            problems.extend(recorder.pop_errors())
-            assert problems != []
-            return
+            return (None, tuple(recorder.pop_errors()))
 
         # chop out hidden directories. The
         # main reason to ignore dot directories is that they
@@ -1008,7 +1102,27 @@ class _ConfigCache(object):
         files = [f.replace("\\", "/") for f in files]
 
         # use a deterministic order because the first command is the default
-        files = sorted(files)
+        return (tuple(sorted([f for f in files if f.endswith('.ipynb')])), ())
+
+    def _verify_notebook_commands(self, commands, problems, notebooks, project_file):
+        skipped_notebooks = project_file.get_value(['skip_imports', 'notebooks'])
+        if skipped_notebooks is not None:
+            if skipped_notebooks is True:
+                # skip ALL notebooks forever
+                return
+            elif not is_list(skipped_notebooks):
+                _file_problem(
+                    problems, project_file,
+                    "'skip_imports: notebooks:' value should be a list, found {}".format(repr(skipped_notebooks)))
+                return
+        else:
+            skipped_notebooks = []
+
+        (files, list_errors) = notebooks
+        if files is None:
+            problems.extend(list_errors)
+            assert problems != []
+            return
 
         def need_to_import_notebook(relative_name):
             for command in commands.values():
@@ -1020,19 +1134,26 @@ class _ConfigCache(object):
 
             return True
 
-        def make_add_notebook_func(relative_name, env_spec_name):
-            def add_notebook(project):
-                errors = []
-                extras = notebook_analyzer.extras(os.path.join(self.directory_path, relative_name), errors)
-                # TODO this is broken, need to refactor so fix functions can return
-                # errors and probably also log progress indication.
-                assert [] == errors
+        def add_notebook_commands(project, relative_names, env_spec_name):
+            errors = []
+            all_extras = notebook_analyzer.extras_for_notebooks(
+                [os.path.join(self.directory_path, relative_name) for relative_name in relative_names],
+                errors,
+                project_directory=self.directory_path)
+            # TODO this is broken, need to refactor so fix functions can return
+            # errors and probably also log progress indication.
+            assert [] == errors
+
+            for (relative_name, extras) in zip(relative_names, all_extras):
                 assert extras is not None
-
                 command_dict = {'notebook': relative_name, 'env_spec': env_spec_name}
                 command_dict.update(extras)
                 project.project_file.set_value(['commands', relative_name], command_dict)
 
+        def make_add_notebook_func(relative_name, env_spec_name):
+            def add_notebook(project):
+                add_notebook_commands(project, [relative_name], env_spec_name)
+
             return add_notebook
 
         def make_no_add_notebook_func(relative_name):
@@ -1045,9 +1166,8 @@ class _ConfigCache(object):
 
         need_to_import = []
         for relative_name in files:
-            if relative_name.endswith('.ipynb'):
-                if need_to_import_notebook(relative_name):
-                    need_to_import.append(relative_name)
+            if need_to_import_notebook(relative_name):
+                need_to_import.append(relative_name)
 
         # make tests deterministic
         need_to_import.sort()
@@ -1063,13 +1183,12 @@ class _ConfigCache(object):
                 only_a_suggestion=True)
             problems.append(problem)
         elif len(need_to_import) > 1:
-            add_funcs = [make_add_notebook_func(relative_name, self.default_env_spec_name)
-                         for relative_name in need_to_import]
             no_add_funcs = [make_no_add_notebook_func(relative_name) for relative_name in need_to_import]
+            env_spec_name = self.default_env_spec_name
 
             def add_all(project):
-                for f in add_funcs:
-                    f(project)
+                # analyzed all at once, since there could be a lot of them
+                add_notebook_commands(project, need_to_import, env_spec_name)
 
             def no_add_all(project):
                 for f in no_add_funcs:
@@ -1123,7 +1242,7 @@ class Project(object):
     the project directory or global user configuration.
     """
 
-    def __init__(self, directory_path, plugin_registry=None, frontend=None):
+    def __init__(self, directory_path, plugin_registry=None, frontend=None, read_only=False):
         """Construct a Project with the given directory and plugin registry.
 
         Args:
@@ -1131,6 +1250,9 @@ class Project(object):
             plugin_registry (RequirementsRegistry): where to look up Requirement and Provider instances,
                                                     None for default
             frontend (Frontend): the UX using this Project instance
+            read_only (bool): True to load the project and lock files quickly, as
+                              plain values, for code that won't modify their
+                              values in place (see ``YamlFile``)
         """
         self._directory_path = os.path.realpath(directory_path)
 
@@ -1141,8 +1263,10 @@ class Project(object):
             else:
                 return [_anaconda_default_env_spec(shared_base_spec=None)]
 
-        self._project_file = ProjectFile.load_for_directory(directory_path, default_env_specs_func=load_default_specs)
-        self._lock_file = ProjectLockFile.load_for_directory(directory_path)
+        self._project_file = ProjectFile.load_for_directory(directory_path,
+                                                            default_env_specs_func=load_default_specs,
+                                                            read_only=read_only)
+        self._lock_file = ProjectLockFile.load_for_directory(directory_path, read_only=read_only)
         self._directory_basename = os.path.basename(self._directory_path)
         self._config_cache = _ConfigCache(self._directory_path, plugin_registry)
         if frontend is None:
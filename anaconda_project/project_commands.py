@@ -34,6 +34,17 @@ standard_command_attributes = ('description', 'env_spec', 'supports_http_options
 extra_command_attributes = ('registers_fusion_function', )
 all_known_command_attributes = standard_command_attributes + extra_command_attributes
 
+# These strings are used in the command line options to anaconda-project,
+# so changing them has back-compat consequences.
+COMMAND_TYPE_CONDA_APP_ENTRY = 'conda_app_entry'
+COMMAND_TYPE_SHELL = 'unix'
+COMMAND_TYPE_WINDOWS = 'windows'
+COMMAND_TYPE_NOTEBOOK = 'notebook'
+COMMAND_TYPE_BOKEH_APP = 'bokeh_app'
+
+ALL_COMMAND_TYPES = (COMMAND_TYPE_CONDA_APP_ENTRY, COMMAND_TYPE_SHELL, COMMAND_TYPE_WINDOWS, COMMAND_TYPE_NOTEBOOK,
+                     COMMAND_TYPE_BOKEH_APP)
+
 
 def _is_windows():
     # it's tempting to cache this but it hoses our test monkeypatching so don't.
@@ -49,7 +49,7 @@ class ProjectFile(YamlFile):
     """
 
     @classmethod
-    def load_for_directory(cls, directory, default_env_specs_func=_empty_default_env_spec):
+    def load_for_directory(cls, directory, default_env_specs_func=_empty_default_env_spec, read_only=False):
         """Load the project file from the given directory, even if it doesn't exist.
 
         If the directory has no project file, the loaded
@@ -66,6 +66,7 @@ class ProjectFile(YamlFile):
         Args:
             directory (str): path to the project directory
             default_env_specs_func (function makes list of EnvSpec): if file is created, use these
+            read_only (bool): see ``YamlFile``
 
         Returns:
             a new ``ProjectFile``
@@ -74,10 +75,13 @@ class ProjectFile(YamlFile):
         for name in possible_project_file_names:
             path = os.path.join(directory, name)
             if os.path.isfile(path):
-                return ProjectFile(path)
-        return ProjectFile(os.path.join(directory, DEFAULT_PROJECT_FILENAME), default_env_specs_func)
+                return ProjectFile(path, read_only=read_only)
+        return ProjectFile(
+            os.path.join(directory, DEFAULT_PROJECT_FILENAME),
+            default_env_specs_func,
+            read_only=read_only)
 
-    def __init__(self, filename, default_env_specs_func=_empty_default_env_spec):
+    def __init__(self, filename, default_env_specs_func=_empty_default_env_spec, read_only=False):
         """Construct a ``ProjectFile`` with the given filename and requirement registry.
 
         It's easier to use ``ProjectFile.load_for_directory()`` in most cases.
@@ -92,10 +96,11 @@ class ProjectFile(YamlFile):
         Args:
             filename (str): path to the project file
             default_env_specs_func (function makes list of EnvSpec): if file is created, use these
+            read_only (bool): see ``YamlFile``
 
         """
         self._default_env_specs_func = default_env_specs_func
-        super(ProjectFile, self).__init__(filename)
+        super(ProjectFile, self).__init__(filename, read_only=read_only)
 
     def _default_content(self):
         header = (
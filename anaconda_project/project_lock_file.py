@@ -19,7 +19,8 @@ except ImportError:  # pragma: no cover
     # this is the upstream version
     import ruamel.yaml as ryaml  # pragma: no cover
 
-from anaconda_project.yaml_file import YamlFile, _CommentedMap, _block_style_all_nodes
+from anaconda_project.yaml_file import YamlFile, _CommentedMap, _CommentedSeq, _block_style_all_nodes
+from anaconda_project.internal.py2_compat import is_string, is_list, is_dict
 
 # these are in the order we'll use them if multiple are present
 possible_project_lock_file_names = ("anaconda-project-lock.yml", "anaconda-project-lock.yaml")
@@ -27,11 +28,24 @@ possible_project_lock_file_names = ("anaconda-project-lock.yml", "anaconda-proje
 DEFAULT_PROJECT_LOCK_FILENAME = possible_project_lock_file_names[0]
 
 
+def _is_package_index(item):
+    # bool is a subclass of int but "true" isn't an index
+    return isinstance(item, int) and not isinstance(item, bool)
+
+
+def _resolve_package_index(package_table, item):
+    """Get the package spec an item in a packages list refers to, or None if it's not a valid index."""
+    if _is_package_index(item) and 0 <= item < len(package_table) and is_string(package_table[item]):
+        return package_table[item]
+    else:
+        return None
+
+
 class ProjectLockFile(YamlFile):
     """Represents the ``anaconda-project-lock.yml`` file which describes locked package versions."""
 
     @classmethod
-    def load_for_directory(cls, directory):
+    def load_for_directory(cls, directory, read_only=False):
         """Load the project lock file from the given directory, even if it doesn't exist.
 
         If the directory has no project file, the loaded
@@ -47,6 +61,7 @@ class ProjectLockFile(YamlFile):
 
         Args:
             directory (str): path to the project directory
+            read_only (bool): see ``YamlFile``
 
         Returns:
             a new ``ProjectLockFile``
@@ -55,10 +70,10 @@ class ProjectLockFile(YamlFile):
         for name in possible_project_lock_file_names:
             path = os.path.join(directory, name)
             if os.path.isfile(path):
-                return ProjectLockFile(path)
-        return ProjectLockFile(os.path.join(directory, DEFAULT_PROJECT_LOCK_FILENAME))
+                return ProjectLockFile(path, read_only=read_only)
+        return ProjectLockFile(os.path.join(directory, DEFAULT_PROJECT_LOCK_FILENAME), read_only=read_only)
 
-    def __init__(self, filename):
+    def __init__(self, filename, read_only=False):
         """Construct a ``ProjectLockFile`` with the given filename.
 
         It's easier to use ``ProjectLockFile.load_for_directory()`` in most cases.
@@ -72,8 +87,9 @@ class ProjectLockFile(YamlFile):
 
         Args:
             filename (str): path to the project file
+            read_only (bool): see ``YamlFile``
         """
-        super(ProjectLockFile, self).__init__(filename)
+        super(ProjectLockFile, self).__init__(filename, read_only=read_only)
 
     def _default_content(self):
         header = (
@@ -150,6 +166,9 @@ class ProjectLockFile(YamlFile):
         as_json = lock_set.to_json()
         self.set_value(['env_specs', env_spec_name], as_json)
 
+        if self._uses_package_table():
+            self._update_package_table()
+
     def _disable_locking(self, env_spec_name):
         """Library-internal method."""
         if env_spec_name is None:
@@ -159,3 +178,76 @@ class ProjectLockFile(YamlFile):
             self.set_value(['env_specs', env_spec_name, 'locked'], False)
             self.unset_value(['env_specs', env_spec_name, 'packages'])
             self.unset_value(['env_specs', env_spec_name, 'platforms'])
+
+        if self._uses_package_table():
+            self._update_package_table()
+
+    def _uses_package_table(self):
+        """Library-internal method."""
+        return self.get_value(['package_table'], None) is not None
+
+    def _use_package_table(self, enabled):
+        """Library-internal method.
+
+        With a package table, each package spec is listed once in
+        ``package_table:`` and the per-platform package lists refer
+        to it by index, so packages shared between env specs aren't
+        repeated.
+        """
+        if enabled == self._uses_package_table():
+            return
+        if enabled:
+            self.set_value(['package_table'], [])
+            self._update_package_table()
+        else:
+            for (path, specs) in list(self._resolved_package_lists()):
+                self._set_package_list(path, specs)
+            self.unset_value(['package_table'])
+
+    def _resolved_package_lists(self):
+        package_table = self.get_value(['package_table'], None)
+        if not is_list(package_table):
+            package_table = []
+        env_specs = self.get_value(['env_specs'], None)
+        if not is_dict(env_specs):
+            return
+        for (name, lock_set) in env_specs.items():
+            if not is_dict(lock_set) or not is_dict(lock_set.get('packages', None)):
+                continue
+            for (platform, items) in lock_set['packages'].items():
+                if not is_list(items):
+                    continue
+                resolved = []
+                for item in items:
+                    spec = _resolve_package_index(package_table, item)
+                    resolved.append(item if spec is None else spec)
+                yield (['env_specs', name, 'packages', platform], resolved)
+
+    def _set_package_list(self, path, items):
+        seq = _CommentedSeq(items)
+        _block_style_all_nodes(seq)
+        self.set_value(path, seq)
+
+    def _update_package_table(self):
+        # Entries keep their index as long as something still uses
+        # them, so relocking one env spec doesn't renumber packages
+        # in the others; new specs are appended in sorted order.
+        old_table = self.get_value(['package_table'], None)
+        if not is_list(old_table):
+            old_table = []
+        package_lists = list(self._resolved_package_lists())
+        used = set()
+        for (path, items) in package_lists:
+            used.update([item for item in items if is_string(item)])
+
+        new_table = []
+        indexes = dict()
+        for spec in [spec for spec in old_table if is_string(spec)] + sorted(used):
+            if spec in used and spec not in indexes:
+                indexes[spec] = len(new_table)
+                new_table.append(spec)
+
+        if new_table != old_table:
+            self._set_package_list(['package_table'], new_table)
+        for (path, items) in package_lists:
+            self._set_package_list(path, [indexes[item] if is_string(item) else item for item in items])
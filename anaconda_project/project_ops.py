@@ -10,13 +10,12 @@ from __future__ import absolute_import
 
 import codecs
 import contextlib
+import hashlib
 import os
 import shutil
-import tempfile
 
 from anaconda_project.project import Project, ALL_COMMAND_TYPES
 from anaconda_project import archiver
-from anaconda_project import client
 from anaconda_project import prepare
 from anaconda_project import provide
 from anaconda_project.local_state_file import LocalStateFile
@@ -28,6 +27,8 @@ from anaconda_project.requirements_registry.requirements.download import _hash_a
 from anaconda_project.requirements_registry.requirements.service import ServiceRequirement
 from anaconda_project.requirements_registry.providers.conda_env import _remove_env_path
 from anaconda_project.internal.simple_status import SimpleStatus
+from anaconda_project.internal.makedirs import makedirs_ok_if_exists
+from anaconda_project.internal.user_cache import user_cache_directory
 import anaconda_project.conda_manager as conda_manager
 from anaconda_project.internal.conda_api import (parse_spec, default_platforms_with_current)
 import anaconda_project.internal.notebook_analyzer as notebook_analyzer
@@ -757,7 +758,7 @@ def remove_packages(project, env_spec_name, packages):
     return status
 
 
-def _update_and_lock(project, env_spec_name, update):
+def _update_and_lock(project, env_spec_name, update, package_table=None):
     failed = _check_problems(project)
     if failed is not None:
         return failed
@@ -811,6 +812,16 @@ def _update_and_lock(project, env_spec_name, update):
             # we'll save later after doing all the other stuff too
             need_save = True
 
+    if package_table is not None and package_table != project.lock_file._uses_package_table():
+        project.lock_file._use_package_table(package_table)
+        need_save = True
+        if package_table:
+            project.frontend.info("Moved locked packages into a shared package table in %s." %
+                                  project.lock_file.basename)
+        else:
+            project.frontend.info("Listed locked packages separately for each env spec in %s." %
+                                  project.lock_file.basename)
+
     conda = conda_manager.new_conda_manager(frontend=project.frontend)
 
     # note that "envs" are frozen from the original project state,
@@ -888,20 +899,26 @@ def _update_and_lock(project, env_spec_name, update):
     return SimpleStatus(success=True, description=description)
 
 
-def lock(project, env_spec_name):
+def lock(project, env_spec_name, package_table=None):
     """Attempt to freeze dependency versions in anaconda-project-lock.yml.
 
     If the env_spec_name is None rather than a name,
     all env specs are frozen.
 
+    If package_table is True, each locked package is listed once in a
+    ``package_table:`` shared by all env specs, and env specs refer to
+    it by index. If it's False, each env spec lists its own packages.
+    If it's None, the lock file keeps the layout it already has.
+
     Args:
         project (Project): the project
         env_spec_name (str): environment spec name or None for all environment specs
+        package_table (bool): whether to use a shared package table, or None to leave it alone
 
     Returns:
         ``Status`` instance
     """
-    return _update_and_lock(project, env_spec_name, update=False)
+    return _update_and_lock(project, env_spec_name, update=False, package_table=package_table)
 
 
 def update(project, env_spec_name):
@@ -1369,7 +1386,7 @@ def add_command(project, name, command_type, command, env_spec_name=None, suppor
         errors = []
         # TODO missing notebook should be an error caught before here
         if os.path.isfile(notebook_file):
-            extras = notebook_analyzer.extras(notebook_file, errors)
+            extras = notebook_analyzer.extras(notebook_file, errors, project_directory=project.directory_path)
         else:
             extras = {}
         if len(errors) > 0:
@@ -1675,17 +1692,40 @@ def clean(project, prepare_result):
         return SimpleStatus(success=False, description="Failed to clean everything up.", errors=errors)
 
 
-def archive(project, filename):
+def archive(project, filename, compression_level=None, reproducible=False, check_unchanged=False, base=None):
     """Make an archive of the non-ignored files in the project.
 
+    gzip, xz, and zstd compression use all available cores.
+
+    A reproducible archive is byte-for-byte the same each time
+    it's made from the same files: timestamps, owners, and
+    permissions are normalized, and it starts with a manifest of
+    the files' sizes and sha256 hashes. With check_unchanged, an
+    existing reproducible archive with the same manifest is left
+    alone rather than being rewritten.
+
+    With a base, which can be a reproducible archive or the manifest
+    from one, this makes a reproducible delta archive with only the
+    files that differ from the base, plus a list of deleted files.
+    Unpacking a delta archive applies it to an existing project.
+
     Args:
         project (``Project``): the project
-        filename (str): name of a zip, tar.gz, or tar.bz2 archive file
+        filename (str): name of a zip, tar.gz, tar.bz2, tar.xz, or tar.zst archive file
+        compression_level (int): compression level, or None for the format's default
+        reproducible (bool): make a reproducible archive
+        check_unchanged (bool): make a reproducible archive, unless filename already is one for the same files
+        base (str): reproducible archive or manifest file to make a delta archive against
 
     Returns:
-        a ``Status``, if failed has ``errors``
+        a ``Status``, if failed has ``errors``, on success has an ``unchanged`` property
     """
-    return archiver._archive_project(project, filename)
+    return archiver._archive_project(project,
+                                     filename,
+                                     compression_level=compression_level,
+                                     reproducible=reproducible,
+                                     check_unchanged=check_unchanged,
+                                     base=base)
 
 
 def unarchive(filename, project_dir, parent_dir=None, frontend=None):
@@ -1695,7 +1735,9 @@ def unarchive(filename, project_dir, parent_dir=None, frontend=None):
     to put evil links in it, for example), but this function
     doesn't load or validate the unpacked project.
 
-    The target directory must not exist or it's an error.
+    The target directory must not exist or it's an error, unless
+    this is a delta archive, which is applied to the existing
+    target directory instead.
 
     project_dir can be None to auto-choose one.
 
@@ -1703,7 +1745,7 @@ def unarchive(filename, project_dir, parent_dir=None, frontend=None):
     if project_dir is None.
 
     Args:
-        filename (str): name of a zip, tar.gz, or tar.bz2 archive file
+        filename (str): name of a zip, tar.gz, tar.bz2, tar.xz, or tar.zst archive file
         project_dir (str): the directory to place the project inside
         parent_dir (str): directory to place project_dir within
 
@@ -1737,21 +1779,31 @@ def upload(project, site=None, username=None, token=None, log_level=None):
 
     suffix = ".tar.bz2"
 
-    # delete=True breaks on windows if you use tmp_tarfile.name to re-open the file,
-    # so don't use delete=True.
-    tmp_tarfile = tempfile.NamedTemporaryFile(delete=False, prefix="anaconda_upload_", suffix=suffix)
-    tmp_tarfile.close()  # immediately un-use it to avoid file-in-use errors on Windows
+    # we keep the last archive we uploaded, so if the files haven't
+    # changed since then we can send it again without rebuilding it.
+    archive_dir = user_cache_directory("uploads", hashlib.sha1(project.directory_path.encode('utf-8')).hexdigest())
     try:
-        status = archive(project, tmp_tarfile.name)
-        if not status:
-            return status
-        status = client._upload(project,
-                                tmp_tarfile.name,
-                                uploaded_basename=(project.name + suffix),
-                                site=site,
-                                username=username,
-                                token=token,
-                                log_level=log_level)
+        makedirs_ok_if_exists(archive_dir)
+    except (IOError, OSError) as e:
+        return SimpleStatus(success=False, description="Failed to create upload archive.", errors=[str(e)])
+    archive_filename = os.path.join(archive_dir, project.name + suffix)
+
+    # the archive's size, file count, and MD5 come from writing
+    # it, so we only read it again to send it.
+    status = archiver._archive_project(project, archive_filename, check_unchanged=True, compute_md5=True)
+    if not status:
         return status
-    finally:
-        os.remove(tmp_tarfile.name)
+    if status.unchanged:
+        # the client works these out from the file we already have
+        status = None
+    # client imports binstar_client, which is slow to import,
+    # so only load it when we need it
+    from anaconda_project import client
+    return client._upload(project,
+                          archive_filename,
+                          uploaded_basename=(project.name + suffix),
+                          site=site,
+                          username=username,
+                          token=token,
+                          log_level=log_level,
+                          archive_status=status)
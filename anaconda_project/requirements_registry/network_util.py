@@ -7,6 +7,7 @@
 # -----------------------------------------------------------------------------
 """Network utilities for use by plugins."""
 import socket
+import threading
 
 
 def _get_urlparse():
@@ -39,3 +40,28 @@ def can_connect_to_socket(host, port, timeout_seconds=0.5):
         return True
     except IOError:
         return False
+
+
+def can_connect_to_sockets(addresses, timeout_seconds=0.5):
+    """Check whether we can connect to each of several servers, all at once.
+
+    Args:
+        addresses (list of tuple): (host, port) pairs
+        timeout_seconds (float): how long to wait for failure
+    Returns:
+        list of bool, True for each address we could connect to
+    """
+    connected = [None] * len(addresses)
+
+    # a thread per address rather than a ThreadPool, whose worker
+    # handling relies on time.sleep(), which tests like to mock
+    def check(i):
+        (host, port) = addresses[i]
+        connected[i] = can_connect_to_socket(host=host, port=port, timeout_seconds=timeout_seconds)
+
+    threads = [threading.Thread(target=check, args=(i, )) for i in range(len(addresses))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return connected
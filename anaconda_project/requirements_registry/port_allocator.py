@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Choosing free ports for services, without two prepares choosing the same one.
+
+Reservations are kept in the per-user cache directory, so
+prepares of different projects see each other's.
+
+Services that can be told to listen on port 0 should do that
+and let the OS choose instead.
+"""
+from __future__ import absolute_import, print_function
+
+import codecs
+import contextlib
+import json
+import os
+import socket
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover (windows only)
+    fcntl = None  # pragma: no cover (windows only)
+    import msvcrt  # pragma: no cover (windows only)
+
+import anaconda_project.requirements_registry.network_util as network_util
+from anaconda_project.internal.makedirs import makedirs_ok_if_exists
+from anaconda_project.internal.user_cache import user_cache_directory
+
+RESERVATIONS_FILENAME = "port-reservations.json"
+
+# ports that pass the bind check are also probed with connect(),
+# this many at a time, in case something on another address has them
+_PROBE_BATCH_SIZE = 8
+_PROBE_TIMEOUT_SECONDS = 0.1
+
+
+def _can_bind(port):
+    # Binding fails if anything is listening on the port. We
+    # don't set SO_REUSEADDR, so a port that was just closed
+    # counts as busy too; the service might fail to bind it.
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        s.bind(('', port))
+        return True
+    except (IOError, OSError):
+        return False
+    finally:
+        s.close()
+
+
+def _first_free_port(candidates):
+    bindable = [port for port in candidates if _can_bind(port)]
+    for start in range(0, len(bindable), _PROBE_BATCH_SIZE):
+        batch = bindable[start:start + _PROBE_BATCH_SIZE]
+        connected = network_util.can_connect_to_sockets(
+            [('localhost', port) for port in batch],
+            timeout_seconds=_PROBE_TIMEOUT_SECONDS)
+        for (port, port_connected) in zip(batch, connected):
+            if not port_connected:
+                return port
+    return None
+
+
+def _lock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)  # pragma: no cover (windows only)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # pragma: no cover (windows only)
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)  # pragma: no cover (windows only)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)  # pragma: no cover (windows only)
+
+
+def _same_file(f, path):
+    try:
+        return os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+    except AttributeError:  # pragma: no cover (windows py2 only)
+        return True  # pragma: no cover (windows py2 only)
+    except OSError:
+        return False
+
+
+def _reservations_filename():
+    return os.path.join(user_cache_directory("ports"), RESERVATIONS_FILENAME)
+
+
+@contextlib.contextmanager
+def _locked_reservations():
+    # yields a dict of owner to port which is saved afterward; the
+    # file is also the lock, so we delete it only while holding it,
+    # and check we didn't lock a file someone else just deleted.
+    path = _reservations_filename()
+    makedirs_ok_if_exists(os.path.dirname(path))
+    while True:
+        f = codecs.open(path, 'a+', 'utf-8')
+        _lock(f)
+        if _same_file(f, path):
+            break
+        _unlock(f)
+        f.close()
+
+    try:
+        f.seek(0)
+        try:
+            reservations = json.loads(f.read() or "{}")
+        except ValueError:
+            reservations = dict()
+        if not isinstance(reservations, dict):
+            reservations = dict()
+
+        try:
+            yield reservations
+        finally:
+            # saved even if the block raised, so we don't leave
+            # an empty file behind or keep stale reservations
+            if len(reservations) == 0:
+                try:
+                    os.remove(path)
+                except OSError:  # pragma: no cover (windows only)
+                    pass  # pragma: no cover (windows only)
+            else:
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(reservations, indent=2, sort_keys=True))
+                f.flush()
+    finally:
+        _unlock(f)
+        f.close()
+
+
+class PortReservation(object):
+    """A port chosen by ``reserve_port()``."""
+
+    def __init__(self, port):
+        """Create a reservation of the port, which may be None."""
+        self.port = port
+
+    def cancel(self):
+        """Don't keep the port reserved, for example because the service failed to start."""
+        self.port = None
+
+
+@contextlib.contextmanager
+def reserve_port(owner, lower_port, upper_port):
+    """Choose a free port in a range, and reserve it for the owner.
+
+    This holds a lock on the reservations file for the whole
+    ``with`` block, so start the service inside the
+    block; other prepares choosing a port will wait until it has
+    bound. The reservation is saved when the block ends, unless
+    the block cancels it or raises.
+
+    Args:
+        owner (str): who the port is for, unique on this machine, such as the service's directory
+        lower_port (int): first port to consider
+        upper_port (int): last port to consider
+
+    Returns:
+        a context manager giving a ``PortReservation``, with a ``port`` of None if all were in use
+    """
+    with _locked_reservations() as reservations:
+        reservations.pop(owner, None)
+        # skip ports reserved by others, unless the reservation is
+        # stale; since we hold the lock, any service that got a
+        # reservation has already had its chance to bind.
+        for (other, port) in list(reservations.items()):
+            if not isinstance(port, int) or _can_bind(port):
+                del reservations[other]
+        taken = set(reservations.values())
+        candidates = [port for port in range(lower_port, upper_port + 1) if port not in taken]
+
+        reservation = PortReservation(_first_free_port(candidates))
+        try:
+            yield reservation
+        except Exception:
+            reservation.cancel()
+            raise
+        finally:
+            if reservation.port is not None:
+                reservations[owner] = reservation.port
+
+
+def release_port(owner):
+    """Remove the owner's reservation, if any."""
+    if not os.path.isfile(_reservations_filename()):
+        return
+    with _locked_reservations() as reservations:
+        reservations.pop(owner, None)
@@ -8,25 +8,48 @@
 """Redis-related providers."""
 from __future__ import print_function
 
-import codecs
-import errno
 import os
-import subprocess
 import sys
 import time
 
-from anaconda_project.requirements_registry.provider import (EnvVarProvider, ProviderAnalysis,
-                                                             shutdown_service_run_state, delete_service_directory)
+from anaconda_project.requirements_registry.provider import (EnvVarProvider, ProviderAnalysis, delete_service_directory,
+                                                             _service_directory)
 import anaconda_project.requirements_registry.network_util as network_util
+import anaconda_project.requirements_registry.port_allocator as port_allocator
+import anaconda_project.requirements_registry.service_supervisor as service_supervisor
 from anaconda_project.provide import PROVIDE_MODE_DEVELOPMENT
 from anaconda_project.frontend import _new_error_recorder
 from anaconda_project.internal import py2_compat
-from anaconda_project.internal import logged_subprocess
 
 _DEFAULT_SYSTEM_REDIS_HOST = "localhost"
 _DEFAULT_SYSTEM_REDIS_PORT = 6379
 _DEFAULT_SYSTEM_REDIS_URL = "redis://%s:%d" % (_DEFAULT_SYSTEM_REDIS_HOST, _DEFAULT_SYSTEM_REDIS_PORT)
 
+# analyze() runs on every status check, several times per prepare,
+# so it probes with a short timeout and remembers the answers briefly
+_PROBE_TIMEOUT_SECONDS = 0.2
+_LIVENESS_TTL_SECONDS = 2.0
+
+# (host, port) => (alive, checked_at); kept in memory so analyze()
+# doesn't write to the local state file
+_liveness_cache = dict()
+
+
+def _redis_service_spec(port, pidfile, logfile, env):
+    return service_supervisor.ServiceSpec(
+        name='redis-server',
+        command=['redis-server', '--pidfile', pidfile, '--logfile', logfile, '--daemonize', 'yes', '--port', str(port)],
+        # Redis may write its pidfile late (or not at all), so once
+        # the port answers we forge ahead; the pidfile is only
+        # needed if the shutdown command doesn't work.
+        readiness_probes=[service_supervisor.TcpProbe('localhost', port)],
+        # note: --port doesn't work, only -p, and the failure with --port is silent.
+        shutdown_commands=[['redis-cli', '-p', str(port), 'shutdown']],
+        logfile=logfile,
+        pidfile=pidfile,
+        daemonizes=True,
+        env=env)
+
 
 class _RedisProviderAnalysis(ProviderAnalysis):
     """Subtype of ProviderAnalysis with extra fields RedisProvider needs to track."""
@@ -130,22 +153,49 @@ class RedisProvider(EnvVarProvider):
         super(RedisProvider, self).set_config_values_as_strings(requirement, environ, local_state_file,
                                                                 default_env_spec_name, overrides, values)
 
-    def _previously_run_redis_url_if_alive(self, run_state):
-        if 'port' in run_state and network_util.can_connect_to_socket(host='localhost', port=run_state['port']):
-            return "redis://localhost:{port}".format(port=run_state['port'])
-        else:
-            return None
+    def _check_liveness(self, addresses):
+        # returns a dict from (host, port) to whether we could connect,
+        # using answers this process got recently
+        now = time.time()
+        alive = dict()
+        to_probe = []
+        for address in addresses:
+            entry = _liveness_cache.get(address)
+            if entry is not None and 0 <= (now - entry[1]) < _LIVENESS_TTL_SECONDS:
+                alive[address] = entry[0]
+            else:
+                to_probe.append(address)
+
+        if len(to_probe) == 0:
+            return alive
 
-    def _can_connect_to_system_default(self):
-        return network_util.can_connect_to_socket(host=_DEFAULT_SYSTEM_REDIS_HOST, port=_DEFAULT_SYSTEM_REDIS_PORT)
+        connected = network_util.can_connect_to_sockets(to_probe, timeout_seconds=_PROBE_TIMEOUT_SECONDS)
+        for (address, address_connected) in zip(to_probe, connected):
+            alive[address] = address_connected
+            _liveness_cache[address] = (address_connected, now)
+        return alive
 
     def analyze(self, requirement, environ, local_state_file, default_env_spec_name, overrides):
         """Override superclass to store additional fields in the analysis."""
         analysis = super(RedisProvider, self).analyze(requirement, environ, local_state_file, default_env_spec_name,
                                                       overrides)
+        source = analysis.config['source']
         run_state = local_state_file.get_service_run_state(requirement.env_var)
-        previous = self._previously_run_redis_url_if_alive(run_state)
-        systemwide = self._can_connect_to_system_default()
+
+        # only probe for the instances the configured source could use
+        previous_address = None
+        system_address = None
+        if source in ('find_project', 'find_all') and 'port' in run_state:
+            previous_address = ('localhost', run_state['port'])
+        if source in ('find_system', 'find_all'):
+            system_address = (_DEFAULT_SYSTEM_REDIS_HOST, _DEFAULT_SYSTEM_REDIS_PORT)
+        addresses = [address for address in (previous_address, system_address) if address is not None]
+        alive = self._check_liveness(addresses)
+
+        previous = None
+        if alive.get(previous_address, False):
+            previous = "redis://localhost:{port}".format(port=previous_address[1])
+        systemwide = alive.get(system_address, False)
 
         return _RedisProviderAnalysis(analysis.config,
                                       analysis.missing_env_vars_to_configure,
@@ -162,18 +212,16 @@ class RedisProvider(EnvVarProvider):
         config = context.status.analysis.config
 
         def ensure_redis(run_state):
-            # this is pretty lame, we'll want to get fancier at a
-            # future time (e.g. use Chalmers, stuff like
-            # that). The desired semantic is a new copy of Redis
-            # dedicated to this project directory; it should not
-            # require the user to have set up anything in advance,
-            # e.g. if we use Chalmers we should automatically take
-            # care of configuring/starting Chalmers itself.
+            # The desired semantic is a new copy of Redis dedicated
+            # to this project directory; it should not require the
+            # user to have set up anything in advance.
             url = context.status.analysis.existing_scoped_instance_url
             if url is not None:
                 frontend.info("Using redis-server we started previously at {url}".format(url=url))
                 return url
 
+            # if we started one before, it has crashed or was
+            # stopped behind our back, so start a replacement
             run_state.clear()
 
             workdir = context.ensure_service_directory(requirement.env_var)
@@ -181,106 +229,30 @@ class RedisProvider(EnvVarProvider):
             logfile = os.path.join(workdir, "redis.log")
 
             # 6379 is the default Redis port; leave that one free
-            # for a systemwide Redis. Try looking for a port above
-            # it. This is a pretty huge hack and a race condition,
-            # but Redis doesn't as far as I know have "let the OS
-            # pick the port" mode.
+            # for a systemwide Redis. Redis doesn't have a "let the
+            # OS pick the port" mode, so we pick one above it, and
+            # hold the reservation lock until redis-server has bound
+            # it so a concurrent prepare (of any project) can't pick
+            # the same one.
             LOWER_PORT = config['lower_port']
             UPPER_PORT = config['upper_port']
-            port = LOWER_PORT
-            while port <= UPPER_PORT:
-                if not network_util.can_connect_to_socket(host='localhost', port=port):
-                    break
-                port += 1
-            if port > UPPER_PORT:
-                frontend.error(("All ports from {lower} to {upper} were in use, " +
-                                "could not start redis-server on one of them.").format(lower=LOWER_PORT,
-                                                                                       upper=UPPER_PORT))
-                return None
-
-            # be sure we don't get confused by an old log file
-            try:
-                os.remove(logfile)
-            except IOError:  # pragma: no cover (py3 only)
-                pass
-            except OSError:  # pragma: no cover (py2 only)
-                pass
-
-            command = ['redis-server', '--pidfile', pidfile, '--logfile', logfile, '--daemonize', 'yes', '--port',
-                       str(port)]
-            frontend.info("Starting " + repr(command))
-
-            # we don't close_fds=True because on Windows that is documented to
-            # keep us from collected stderr. But on Unix it's kinda broken not
-            # to close_fds. Hmm.
-            try:
-                popen = logged_subprocess.Popen(args=command,
-                                                stderr=subprocess.PIPE,
-                                                env=py2_compat.env_without_unicode(context.environ))
-            except Exception as e:
-                frontend.error("Error executing redis-server: %s" % (str(e)))
-                return None
-
-            # communicate() waits for the process to exit, which
-            # is supposed to happen immediately due to --daemonize
-            (out, err) = popen.communicate()
-            assert out is None  # because we didn't PIPE it
-            err = err.decode(errors='replace')
-
-            url = None
-            if popen.returncode == 0:
-                # now we need to wait for Redis to be ready; we
-                # are not sure whether it will create the port or
-                # pidfile first, so wait for both.
-                port_is_ready = False
-                pidfile_is_ready = False
-                MAX_WAIT_TIME = 10
-                so_far = 0
-                while so_far < MAX_WAIT_TIME:
-                    increment = MAX_WAIT_TIME / 500.0
-                    time.sleep(increment)
-                    so_far += increment
-                    if not port_is_ready:
-                        if network_util.can_connect_to_socket(host='localhost', port=port):
-                            port_is_ready = True
-
-                    if not pidfile_is_ready:
-                        if os.path.exists(pidfile):
-                            pidfile_is_ready = True
-
-                    if port_is_ready and pidfile_is_ready:
-                        break
-
-                # if we time out with no pidfile we forge ahead at this point
-                if port_is_ready:
-                    run_state['port'] = port
-                    url = "redis://localhost:{port}".format(port=port)
-
-                    # note: --port doesn't work, only -p, and the failure with --port is silent.
-                    run_state['shutdown_commands'] = [['redis-cli', '-p', str(port), 'shutdown']]
-                else:
-                    frontend.info(
-                        "redis-server started successfully, but we timed out trying to connect to it on port %d" %
-                        (port))
-
-            if url is None:
-                for line in err.split("\n"):
-                    if line != "":
-                        frontend.info(line)
-                try:
-                    with codecs.open(logfile, 'r', 'utf-8') as log:
-                        for line in log.readlines():
-                            frontend.info(line)
-                except IOError as e:
-                    # just be silent if redis-server failed before creating a log file,
-                    # that's fine. Hopefully it had some stderr.
-                    if e.errno != errno.ENOENT:
-                        frontend.info("Failed to read {logfile}: {error}".format(logfile=logfile, error=e))
-
-                frontend.error("redis-server process failed or timed out, exited with code {code}".format(
-                    code=popen.returncode))
-
-            return url
+            with port_allocator.reserve_port(os.path.abspath(workdir), LOWER_PORT, UPPER_PORT) as reservation:
+                port = reservation.port
+                if port is None:
+                    frontend.error(("All ports from {lower} to {upper} were in use, " +
+                                    "could not start redis-server on one of them.").format(lower=LOWER_PORT,
+                                                                                           upper=UPPER_PORT))
+                    return None
+
+                spec = _redis_service_spec(port, pidfile, logfile, env=py2_compat.env_without_unicode(context.environ))
+                if service_supervisor.start_services([spec], frontend)[0] is None:
+                    reservation.cancel()
+                    return None
+
+            run_state.update(spec.run_state())
+            run_state['port'] = port
+            _liveness_cache[('localhost', port)] = (True, time.time())
+            return "redis://localhost:{port}".format(port=port)
 
         return context.transform_service_run_state(requirement.env_var, ensure_redis)
 
@@ -325,6 +297,9 @@ class RedisProvider(EnvVarProvider):
 
     def unprovide(self, requirement, environ, local_state_file, overrides, requirement_status=None):
         """Override superclass to shut down any redis-server we started."""
-        status = shutdown_service_run_state(local_state_file, requirement.env_var)
+        port = local_state_file.get_service_run_state(requirement.env_var).get('port')
+        _liveness_cache.pop(('localhost', port), None)
+        status = service_supervisor.stop_service(local_state_file, requirement.env_var)
+        port_allocator.release_port(os.path.abspath(_service_directory(local_state_file, requirement.env_var)))
         delete_service_directory(local_state_file, requirement.env_var)
         return status
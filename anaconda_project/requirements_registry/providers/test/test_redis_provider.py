@@ -492,7 +492,8 @@ def test_fail_to_prepare_local_redis_server_no_port_available(monkeypatch, capsy
         project = project_no_dedicated_env(dirname)
         result = _prepare_printing_errors(project, environ=minimal_environ())
         assert not result
-        assert 73 == len(can_connect_args_list)
+        # the system default is probed once, then the whole range
+        assert 71 == len(can_connect_args_list)
 
     with_directory_contents_completing_project_file(
         {DEFAULT_PROJECT_FILENAME: """
@@ -514,7 +515,8 @@ def test_do_not_start_local_redis_server_in_prod_mode(monkeypatch, capsys):
         project = project_no_dedicated_env(dirname)
         result = _prepare_printing_errors(project, environ=minimal_environ(), mode=provide.PROVIDE_MODE_PRODUCTION)
         assert not result
-        assert 3 == len(can_connect_args_list)
+        # the check is cached, though analyze runs more than once
+        assert 1 == len(can_connect_args_list)
 
     with_directory_contents_completing_project_file(
         {DEFAULT_PROJECT_FILENAME: """
@@ -536,7 +538,8 @@ def test_do_not_start_local_redis_server_in_check_mode(monkeypatch, capsys):
         project = project_no_dedicated_env(dirname)
         result = _prepare_printing_errors(project, environ=minimal_environ(), mode=provide.PROVIDE_MODE_CHECK)
         assert not result
-        assert 3 == len(can_connect_args_list)
+        # the check is cached, though analyze runs more than once
+        assert 1 == len(can_connect_args_list)
 
     with_directory_contents_completing_project_file(
         {DEFAULT_PROJECT_FILENAME: """
@@ -593,7 +596,7 @@ def test_redis_server_configure_custom_port_range(monkeypatch, capsys):
         project = project_no_dedicated_env(dirname)
         result = _prepare_printing_errors(project, environ=minimal_environ())
         assert not result
-        assert 36 == len(can_connect_args_list)
+        assert 34 == len(can_connect_args_list)
 
     with_directory_contents_completing_project_file(
         {DEFAULT_PROJECT_FILENAME: """
@@ -828,3 +831,89 @@ def test_set_scope_in_local_state(monkeypatch):
 services:
   REDIS_URL: redis
 """}, prepare_after_setting_scope)
+
+
+def _monkeypatch_can_connect_to_socket_recording(monkeypatch, listening_ports):
+    probed = []
+
+    def mock_can_connect_to_socket(host, port, timeout_seconds=0.5):
+        probed.append(port)
+        return port in listening_ports
+
+    monkeypatch.setattr("anaconda_project.requirements_registry.network_util.can_connect_to_socket",
+                        mock_can_connect_to_socket)
+
+    return probed
+
+
+def test_analyze_caches_liveness_briefly(monkeypatch):
+    probed = _monkeypatch_can_connect_to_socket_recording(monkeypatch, listening_ports=(6380, ))
+    now = [1000.0]
+    monkeypatch.setattr('time.time', lambda: now[0])
+
+    def check(dirname):
+        local_state = LocalStateFile.load_for_directory(dirname)
+        local_state.set_service_run_state('REDIS_URL', dict(port=6380))
+        requirement = _redis_requirement()
+        provider = RedisProvider()
+
+        def analyze():
+            return provider.analyze(requirement, dict(), local_state, 'default', UserConfigOverrides())
+
+        analysis = analyze()
+        assert "redis://localhost:6380" == analysis.existing_scoped_instance_url
+        assert not analysis.default_system_exists
+        assert [6379, 6380] == sorted(probed)
+        # analyzing doesn't touch the local state file
+        assert dict(port=6380) == local_state.get_service_run_state('REDIS_URL')
+        assert not os.path.exists(local_state.filename)
+
+        # cached
+        now[0] += 1
+        analysis = analyze()
+        assert "redis://localhost:6380" == analysis.existing_scoped_instance_url
+        assert 2 == len(probed)
+
+        # expired
+        now[0] += 5
+        analysis = analyze()
+        assert "redis://localhost:6380" == analysis.existing_scoped_instance_url
+        assert 4 == len(probed)
+
+    with_directory_contents(dict(), check)
+
+
+def test_analyze_probes_only_what_scope_uses(monkeypatch):
+    probed = _monkeypatch_can_connect_to_socket_recording(monkeypatch, listening_ports=(6379, 6380))
+
+    def check(dirname):
+        local_state = LocalStateFile.load_for_directory(dirname)
+        local_state.set_service_run_state('REDIS_URL', dict(port=6380))
+        requirement = _redis_requirement()
+        provider = RedisProvider()
+
+        local_state.set_value(['service_options', 'REDIS_URL', 'scope'], 'project')
+        analysis = provider.analyze(requirement, dict(), local_state, 'default', UserConfigOverrides())
+        assert "redis://localhost:6380" == analysis.existing_scoped_instance_url
+        assert not analysis.default_system_exists
+        assert [6380] == probed
+
+        del probed[:]
+        local_state.set_service_run_state('REDIS_URL', dict(port=6380))
+        local_state.set_value(['service_options', 'REDIS_URL', 'scope'], 'system')
+        analysis = provider.analyze(requirement, dict(), local_state, 'default', UserConfigOverrides())
+        assert analysis.existing_scoped_instance_url is None
+        assert analysis.default_system_exists
+        assert [6379] == probed
+
+        # a URL from the environment doesn't need either
+        del probed[:]
+        analysis = provider.analyze(requirement,
+                                    dict(REDIS_URL="redis://example.com:1234"),
+                                    local_state,
+                                    'default',
+                                    UserConfigOverrides())
+        assert 'environ' == analysis.config['source']
+        assert [] == probed
+
+    with_directory_contents(dict(), check)
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Starting, checking, and stopping the service processes that providers run."""
+from __future__ import absolute_import, print_function
+
+import codecs
+import errno
+import os
+import platform
+import signal
+import subprocess
+import time
+
+import anaconda_project.requirements_registry.network_util as network_util
+from anaconda_project.requirements_registry.provider import shutdown_service_run_state
+from anaconda_project.internal import logged_subprocess
+from anaconda_project.internal.simple_status import SimpleStatus
+
+
+class TcpProbe(object):
+    """Ready when we can connect to a port."""
+
+    def __init__(self, host, port, timeout_seconds=0.5):
+        """Create a probe of host:port."""
+        self.host = host
+        self.port = port
+        self.timeout_seconds = timeout_seconds
+
+    def is_ready(self):
+        """Check the port once."""
+        return network_util.can_connect_to_socket(host=self.host, port=self.port, timeout_seconds=self.timeout_seconds)
+
+    def describe(self):
+        """Say what we're waiting for, to finish "timed out ..."."""
+        return "trying to connect to it on port %d" % self.port
+
+
+class ServiceSpec(object):
+    """How to start, check, and stop one service process."""
+
+    def __init__(self,
+                 name,
+                 command,
+                 readiness_probes,
+                 shutdown_commands=(),
+                 logfile=None,
+                 pidfile=None,
+                 daemonizes=False,
+                 env=None,
+                 startup_timeout_seconds=10.0):
+        """Describe a service.
+
+        Args:
+            name (str): name for messages, such as "redis-server"
+            command (list of str): command line to start it
+            readiness_probes (list): probes which must all pass for the service to be ready
+            shutdown_commands (list of list of str): commands to stop it gracefully
+            logfile (str): where the service logs, shown if it fails to start
+            pidfile (str): file holding the process ID, used to stop it if shutdown commands fail
+            daemonizes (bool): True if the command forks the service and exits
+            env (dict): environment for the command
+            startup_timeout_seconds (float): how long to wait for it to be ready
+        """
+        self.name = name
+        self.command = command
+        self.readiness_probes = list(readiness_probes)
+        self.shutdown_commands = [list(command) for command in shutdown_commands]
+        self.logfile = logfile
+        self.pidfile = pidfile
+        self.daemonizes = daemonizes
+        self.env = env
+        self.startup_timeout_seconds = startup_timeout_seconds
+
+    def unready_probe(self):
+        """Get the first probe that isn't ready, or None if the service is ready."""
+        for probe in self.readiness_probes:
+            if not probe.is_ready():
+                return probe
+        return None
+
+    def run_state(self):
+        """Get what to save in the service run state to stop this service later."""
+        state = dict(shutdown_commands=self.shutdown_commands)
+        if self.pidfile is not None:
+            state['pidfile'] = self.pidfile
+        return state
+
+
+def _sleep_with_backoff(delays):
+    # sleep the next delay, returning how long we slept
+    delay = delays[0]
+    time.sleep(delay)
+    delays[0] = min(delay * 2, 0.25)
+    return delay
+
+
+def _remove_if_exists(path):
+    try:
+        os.remove(path)
+    except (IOError, OSError):
+        pass
+
+
+class _Startup(object):
+    def __init__(self, spec, frontend):
+        self.spec = spec
+        self.frontend = frontend
+        self.process = None
+        self.err = ''
+        self.ready = False
+        self.ready_seconds = None
+        self.done = False
+
+    def launch(self):
+        spec = self.spec
+        # be sure we don't get confused by an old log or pid file
+        for path in (spec.logfile, spec.pidfile):
+            if path is not None:
+                _remove_if_exists(path)
+
+        self.frontend.info("Starting " + repr(spec.command))
+        try:
+            if spec.daemonizes:
+                self.process = logged_subprocess.Popen(args=spec.command, stderr=subprocess.PIPE, env=spec.env)
+                # communicate() waits for the process to exit, which
+                # is supposed to happen immediately since it daemonizes
+                (out, err) = self.process.communicate()
+                self.err = err.decode(errors='replace')
+            else:
+                log = open(spec.logfile if spec.logfile is not None else os.devnull, 'ab')
+                try:
+                    self.process = logged_subprocess.Popen(args=spec.command,
+                                                           stdout=log,
+                                                           stderr=subprocess.STDOUT,
+                                                           env=spec.env)
+                finally:
+                    log.close()
+                if spec.pidfile is not None:
+                    with codecs.open(spec.pidfile, 'w', 'utf-8') as f:
+                        f.write("%d\n" % self.process.pid)
+        except Exception as e:
+            self.frontend.error("Error executing %s: %s" % (spec.name, str(e)))
+            self.done = True
+            return
+
+        if spec.daemonizes and self.process.returncode != 0:
+            self._failed()
+
+    def poll(self, elapsed, timed_out):
+        if self.done:
+            return
+        probe = self.spec.unready_probe()
+        if probe is None:
+            self.ready = True
+            self.ready_seconds = elapsed
+            self.done = True
+        elif not self.spec.daemonizes and self.process.poll() is not None:
+            self._failed()
+        elif timed_out:
+            self.frontend.info("%s started successfully, but we timed out %s" % (self.spec.name, probe.describe()))
+            if self.spec.daemonizes:
+                _stop_daemon(self.spec)
+            else:
+                _terminate(self.process.pid, self.process)
+            self._failed()
+
+    def _failed(self):
+        self.done = True
+        for line in self.err.split("\n"):
+            if line != "":
+                self.frontend.info(line)
+        if self.spec.logfile is not None:
+            try:
+                with codecs.open(self.spec.logfile, 'r', 'utf-8') as log:
+                    for line in log.readlines():
+                        self.frontend.info(line)
+            except IOError as e:
+                # just be silent if the service failed before creating a log file,
+                # that's fine. Hopefully it had some stderr.
+                if e.errno != errno.ENOENT:
+                    self.frontend.info("Failed to read {logfile}: {error}".format(logfile=self.spec.logfile, error=e))
+
+        self.frontend.error("{name} process failed or timed out, exited with code {code}".format(name=self.spec.name,
+                                                                                                 code=self.process.poll(
+                                                                                                 )))
+
+
+def _run_shutdown_commands(commands, env=None):
+    # True if there were commands and they all succeeded
+    succeeded = len(commands) > 0
+    with open(os.devnull, 'w') as devnull:
+        for command in commands:
+            try:
+                if logged_subprocess.call(command, stdout=devnull, stderr=devnull, env=env) != 0:
+                    succeeded = False
+            except OSError:
+                succeeded = False
+    return succeeded
+
+
+def _stop_daemon(spec):
+    # a daemon that never became ready may still be running,
+    # and nobody else knows about it to stop it later
+    if _run_shutdown_commands(spec.shutdown_commands, env=spec.env):
+        return
+    pid = _read_pidfile(spec.pidfile) if spec.pidfile is not None else None
+    if pid is not None and _terminate(pid):
+        _remove_if_exists(spec.pidfile)
+
+
+def start_services(specs, frontend):
+    """Start services, then wait until each is ready or has failed.
+
+    All the services are started before waiting on any of them,
+    and readiness is polled with exponential backoff, so
+    starting several services takes about as long as the
+    slowest one.
+
+    Args:
+        specs (list of ServiceSpec): the services
+        frontend (Frontend): for messages
+
+    Returns:
+        list of the seconds each service took to be ready, or None
+        for services that failed
+    """
+    startups = [_Startup(spec, frontend) for spec in specs]
+    for startup in startups:
+        startup.launch()
+
+    start = time.time()
+    slept = 0.0
+    delays = [0.005]
+    while True:
+        # mocking out time.sleep() also speeds up timing out
+        elapsed = max(time.time() - start, slept)
+        pending = [startup for startup in startups if not startup.done]
+        for startup in pending:
+            startup.poll(elapsed, timed_out=(elapsed >= startup.spec.startup_timeout_seconds))
+        if all([startup.done for startup in startups]):
+            break
+        slept += _sleep_with_backoff(delays)
+
+    return [startup.ready_seconds if startup.ready else None for startup in startups]
+
+
+def _process_exists(pid, process=None):
+    if process is not None:
+        return process.poll() is None
+    try:
+        # reap it, in case it's our own child
+        os.waitpid(pid, os.WNOHANG)
+    except OSError:
+        pass
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError as e:
+        return e.errno == errno.EPERM
+
+
+def _terminate(pid, process=None, timeout_seconds=5.0):
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except OSError:
+        return not _process_exists(pid, process)
+    if platform.system() == 'Windows':
+        # SIGTERM is TerminateProcess(), and signal 0 would be too
+        return True  # pragma: no cover (windows only)
+
+    slept = 0.0
+    delays = [0.005]
+    while slept < timeout_seconds:
+        if not _process_exists(pid, process):
+            return True
+        slept += _sleep_with_backoff(delays)
+
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except OSError:
+        pass
+    if process is not None:
+        # SIGKILL can't be ignored, so this won't hang
+        process.wait()
+    return not _process_exists(pid, process)
+
+
+def _read_pidfile(pidfile):
+    try:
+        with codecs.open(pidfile, 'r', 'utf-8') as f:
+            return int(f.read().strip())
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def stop_service(local_state_file, service_name):
+    """Stop a service that was started with a ``ServiceSpec.run_state()``.
+
+    This runs the service's shutdown commands, then if there
+    weren't any or they failed, it terminates the process in the
+    pidfile (asking it nicely first).
+
+    Args:
+        local_state_file (LocalStateFile): local state
+        service_name (str): the name the run state is saved under
+
+    Returns:
+        a ``Status`` instance potentially containing errors
+    """
+    state = local_state_file.get_service_run_state(service_name)
+    status = shutdown_service_run_state(local_state_file, service_name)
+    if status and len(state.get('shutdown_commands', [])) > 0:
+        return status
+
+    pidfile = state.get('pidfile')
+    pid = _read_pidfile(pidfile) if pidfile is not None else None
+    if pid is None:
+        return status
+    if _terminate(pid):
+        _remove_if_exists(pidfile)
+        return SimpleStatus(success=True, description=("Successfully shut down %s." % service_name))
+    else:
+        return SimpleStatus(success=False,
+                            description=("Failed to shut down %s." % service_name),
+                            errors=(list(status.errors) + ["Process %d for %s did not exit." % (pid, service_name)]))
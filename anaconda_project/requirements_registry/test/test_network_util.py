@@ -34,3 +34,23 @@ def test_cannot_connect_to_socket():
     s.close()
 
     assert not network_util.can_connect_to_socket("127.0.0.1", port)
+
+
+def test_can_connect_to_sockets():
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(("127.0.0.1", 0))
+    s.listen(1)
+    port = s.getsockname()[1]
+
+    closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    closed.bind(("127.0.0.1", 0))
+    closed.listen(1)
+    closed_port = closed.getsockname()[1]
+    closed.close()
+
+    try:
+        addresses = [("127.0.0.1", port), ("127.0.0.1", closed_port), ("127.0.0.1", port)]
+        assert [True, False, True] == network_util.can_connect_to_sockets(addresses)
+        assert [] == network_util.can_connect_to_sockets([])
+    finally:
+        s.close()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import codecs
+import json
+import os
+import socket
+
+import pytest
+
+from anaconda_project.requirements_registry import port_allocator
+from anaconda_project.internal.makedirs import makedirs_ok_if_exists
+
+
+def _listening_socket():
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(('127.0.0.1', 0))
+    s.listen(1)
+    return s
+
+
+def _reservations():
+    with codecs.open(port_allocator._reservations_filename(), 'r', 'utf-8') as f:
+        return json.loads(f.read())
+
+
+def _write_reservations(reservations):
+    makedirs_ok_if_exists(os.path.dirname(port_allocator._reservations_filename()))
+    with codecs.open(port_allocator._reservations_filename(), 'w', 'utf-8') as f:
+        f.write(json.dumps(reservations))
+
+
+def test_reserve_skips_bound_port_and_persists():
+    listener = _listening_socket()
+    try:
+        busy = listener.getsockname()[1]
+        with port_allocator.reserve_port('FOO', busy, busy + 20) as reservation:
+            assert reservation.port is not None
+            assert reservation.port != busy
+        assert dict(FOO=reservation.port) == _reservations()
+    finally:
+        listener.close()
+
+    port_allocator.release_port('FOO')
+    assert not os.path.exists(port_allocator._reservations_filename())
+    # releasing again is fine
+    port_allocator.release_port('FOO')
+
+
+def test_reservations_kept_in_user_cache(monkeypatch, tmpdir):
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_PATH', str(tmpdir))
+    # the other project's service is listening on its port
+    monkeypatch.setattr('anaconda_project.requirements_registry.port_allocator._can_bind', lambda port: port != 5000)
+    monkeypatch.setattr('anaconda_project.requirements_registry.network_util.can_connect_to_socket',
+                        lambda host, port, timeout_seconds: False)
+    # another project's prepare already reserved the first port
+    _write_reservations({'/project/one/services/REDIS_URL': 5000})
+    with port_allocator.reserve_port('/project/two/services/REDIS_URL', 5000, 5010) as reservation:
+        assert 5001 == reservation.port
+    with codecs.open(str(tmpdir.join("ports", port_allocator.RESERVATIONS_FILENAME)), 'r', 'utf-8') as f:
+        reservations = json.loads(f.read())
+    assert {'/project/one/services/REDIS_URL': 5000, '/project/two/services/REDIS_URL': 5001} == reservations
+
+
+def test_reserve_skips_port_reserved_by_another_owner(monkeypatch):
+    listener = _listening_socket()
+    try:
+        port = listener.getsockname()[1]
+        _write_reservations(dict(BAR=port))
+        # only the bind check would fail, so pretend it didn't
+        real_can_bind = port_allocator._can_bind
+        monkeypatch.setattr('anaconda_project.requirements_registry.port_allocator._can_bind',
+                            lambda p: p != port or real_can_bind(p))
+        with port_allocator.reserve_port('FOO', port, port) as reservation:
+            assert reservation.port is None
+        # nothing was added, and BAR's port is still in use
+        assert dict(BAR=port) == _reservations()
+    finally:
+        listener.close()
+
+
+def test_reserve_drops_stale_reservations(monkeypatch):
+    monkeypatch.setattr('anaconda_project.requirements_registry.port_allocator._can_bind', lambda port: True)
+    monkeypatch.setattr('anaconda_project.requirements_registry.network_util.can_connect_to_socket',
+                        lambda host, port, timeout_seconds: False)
+    _write_reservations(dict(BAR=5000, BAZ="garbage", FOO=5001))
+
+    with port_allocator.reserve_port('FOO', 5000, 5010) as reservation:
+        # BAR's service isn't listening anymore, and FOO's old
+        # reservation is replaced
+        assert 5000 == reservation.port
+    assert dict(FOO=5000) == _reservations()
+
+
+def test_reserve_probes_connect_in_parallel_batches(monkeypatch):
+    probed = []
+
+    def mock_can_connect(host, port, timeout_seconds):
+        probed.append(port)
+        return port < 5010
+
+    monkeypatch.setattr('anaconda_project.requirements_registry.port_allocator._can_bind', lambda port: True)
+    monkeypatch.setattr('anaconda_project.requirements_registry.network_util.can_connect_to_socket', mock_can_connect)
+    with port_allocator.reserve_port('FOO', 5000, 5100) as reservation:
+        assert 5010 == reservation.port
+    # stops after the batch with a free port
+    assert list(range(5000, 5016)) == sorted(probed)
+
+
+def test_reserve_all_ports_in_use(monkeypatch):
+    monkeypatch.setattr('anaconda_project.requirements_registry.port_allocator._can_bind', lambda port: False)
+    with port_allocator.reserve_port('FOO', 5000, 5010) as reservation:
+        assert reservation.port is None
+    assert not os.path.exists(port_allocator._reservations_filename())
+
+
+def test_reservation_not_saved_on_cancel_or_exception(monkeypatch):
+    monkeypatch.setattr('anaconda_project.requirements_registry.port_allocator._can_bind', lambda port: True)
+    monkeypatch.setattr('anaconda_project.requirements_registry.network_util.can_connect_to_socket',
+                        lambda host, port, timeout_seconds: False)
+
+    with port_allocator.reserve_port('FOO', 5000, 5010) as reservation:
+        assert 5000 == reservation.port
+        reservation.cancel()
+    assert not os.path.exists(port_allocator._reservations_filename())
+
+    with pytest.raises(RuntimeError):
+        with port_allocator.reserve_port('FOO', 5000, 5010) as reservation:
+            raise RuntimeError("service failed")
+    assert reservation.port is None
+    assert not os.path.exists(port_allocator._reservations_filename())
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import os
+import socket
+
+from anaconda_project.local_state_file import LocalStateFile
+from anaconda_project.requirements_registry import service_supervisor
+from anaconda_project.requirements_registry.service_supervisor import ServiceSpec, TcpProbe
+from anaconda_project.internal.test.fake_frontend import FakeFrontend
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents, tmp_script_commandline
+
+_LISTENING_SERVICE = """from __future__ import print_function
+import socket
+import sys
+import time
+
+print("listening on %s" % sys.argv[1])
+sys.stdout.flush()
+s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+s.bind(("127.0.0.1", int(sys.argv[1])))
+s.listen(5)
+time.sleep(60)
+"""
+
+
+def _free_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def _listening_service_spec(dirname, name):
+    port = _free_port()
+    return ServiceSpec(name=name,
+                       command=tmp_script_commandline(_LISTENING_SERVICE) + [str(port)],
+                       readiness_probes=[TcpProbe('127.0.0.1', port)],
+                       logfile=os.path.join(dirname, name + ".log"),
+                       pidfile=os.path.join(dirname, name + ".pid"))
+
+
+def test_start_and_stop_services():
+    def check(dirname):
+        frontend = FakeFrontend()
+        specs = [_listening_service_spec(dirname, "first"), _listening_service_spec(dirname, "second")]
+        ready_seconds = service_supervisor.start_services(specs, frontend)
+
+        assert [] == frontend.errors
+        assert ["Starting " + repr(spec.command) for spec in specs] == frontend.logs
+        assert 2 == len(ready_seconds)
+        for (spec, seconds) in zip(specs, ready_seconds):
+            assert seconds is not None
+            assert spec.unready_probe() is None
+            assert os.path.exists(spec.pidfile)
+
+        local_state_file = LocalStateFile.load_for_directory(dirname)
+        for spec in specs:
+            local_state_file.set_service_run_state(spec.name, spec.run_state())
+        local_state_file.save()
+
+        for spec in specs:
+            status = service_supervisor.stop_service(local_state_file, spec.name)
+            assert status
+            assert "Successfully shut down %s." % spec.name == status.status_description
+            assert spec.unready_probe() is not None
+            assert not os.path.exists(spec.pidfile)
+            assert dict() == local_state_file.get_service_run_state(spec.name)
+
+    with_directory_contents(dict(), check)
+
+
+def test_service_exits_before_ready():
+    def check(dirname):
+        frontend = FakeFrontend()
+        spec = ServiceSpec(name="quitter",
+                           command=tmp_script_commandline("""from __future__ import print_function
+import sys
+print("I quit")
+sys.exit(3)
+"""),
+                           readiness_probes=[TcpProbe('127.0.0.1', _free_port())],
+                           logfile=os.path.join(dirname, "quitter.log"))
+
+        assert [None] == service_supervisor.start_services([spec], frontend)
+        assert "I quit\n" in frontend.logs
+        assert ["quitter process failed or timed out, exited with code 3"] == frontend.errors
+
+    with_directory_contents(dict(), check)
+
+
+def test_service_times_out(monkeypatch):
+    slept = []
+
+    def mock_sleep(seconds):
+        slept.append(seconds)
+
+    def check(dirname):
+        monkeypatch.setattr('time.sleep', mock_sleep)
+        frontend = FakeFrontend()
+        spec = _listening_service_spec(dirname, "slow")
+        # nothing will listen on this port
+        unused_port = _free_port()
+        spec.readiness_probes = [TcpProbe('127.0.0.1', unused_port)]
+        spec.startup_timeout_seconds = 1.0
+
+        assert [None] == service_supervisor.start_services([spec], frontend)
+        assert ("slow started successfully, but we timed out trying to connect to it on port %d" %
+                unused_port) in frontend.logs
+        assert 1 == len(frontend.errors)
+        assert frontend.errors[0].startswith("slow process failed or timed out, exited with code ")
+        # it got killed, so it has an exit code
+        assert not frontend.errors[0].endswith("None")
+        # the delays back off, up to a limit
+        assert slept[0] < slept[1] < slept[2]
+        assert 0.25 == max(slept)
+
+    with_directory_contents(dict(), check)
+
+
+_DAEMONIZING_SERVICE = """from __future__ import print_function
+import sys
+
+# the "daemon" never listens, but says it's process 12345
+with open(sys.argv[1], "w") as f:
+    f.write("12345\\n")
+"""
+
+
+def _daemon_spec(dirname, shutdown_commands):
+    return ServiceSpec(name="daemon",
+                       command=tmp_script_commandline(_DAEMONIZING_SERVICE) + [os.path.join(dirname, "daemon.pid")],
+                       readiness_probes=[TcpProbe('127.0.0.1', _free_port())],
+                       shutdown_commands=shutdown_commands,
+                       pidfile=os.path.join(dirname, "daemon.pid"),
+                       daemonizes=True,
+                       startup_timeout_seconds=1.0)
+
+
+def test_daemon_stopped_with_shutdown_commands_when_it_times_out(monkeypatch):
+    def check(dirname):
+        monkeypatch.setattr('time.sleep', lambda seconds: None)
+        terminated = []
+        monkeypatch.setattr('anaconda_project.requirements_registry.service_supervisor._terminate',
+                            lambda pid: terminated.append(pid) or True)
+        frontend = FakeFrontend()
+        shutdown_marker = os.path.join(dirname, "shut-down")
+        spec = _daemon_spec(dirname, [tmp_script_commandline("open(%r, 'w').close()" % shutdown_marker)])
+
+        assert [None] == service_supervisor.start_services([spec], frontend)
+        assert os.path.exists(shutdown_marker)
+        # the shutdown command worked, so we left the process alone
+        assert [] == terminated
+        assert ["daemon process failed or timed out, exited with code 0"] == frontend.errors
+
+    with_directory_contents(dict(), check)
+
+
+def test_daemon_terminated_if_shutdown_commands_fail_when_it_times_out(monkeypatch):
+    def check(dirname):
+        monkeypatch.setattr('time.sleep', lambda seconds: None)
+        terminated = []
+        monkeypatch.setattr('anaconda_project.requirements_registry.service_supervisor._terminate',
+                            lambda pid: terminated.append(pid) or True)
+        frontend = FakeFrontend()
+        spec = _daemon_spec(dirname, [['false']])
+
+        assert [None] == service_supervisor.start_services([spec], frontend)
+        assert [12345] == terminated
+        assert not os.path.exists(spec.pidfile)
+        assert ["daemon process failed or timed out, exited with code 0"] == frontend.errors
+
+    with_directory_contents(dict(), check)
+
+
+def test_service_command_not_found():
+    def check(dirname):
+        frontend = FakeFrontend()
+        spec = ServiceSpec(name="nope",
+                           command=['this-is-not-on-the-path'],
+                           readiness_probes=[TcpProbe('127.0.0.1', _free_port())],
+                           daemonizes=True)
+
+        assert [None] == service_supervisor.start_services([spec], frontend)
+        assert 1 == len(frontend.errors)
+        assert frontend.errors[0].startswith("Error executing nope: ")
+
+    with_directory_contents(dict(), check)
+
+
+def test_stop_service_without_run_state():
+    def check(dirname):
+        local_state_file = LocalStateFile.load_for_directory(dirname)
+        status = service_supervisor.stop_service(local_state_file, "FOO")
+        assert status
+        assert "Nothing to do to shut down FOO." == status.status_description
+
+    with_directory_contents(dict(), check)
+
+
+def test_stop_service_with_shutdown_commands_and_no_pidfile():
+    def check(dirname):
+        local_state_file = LocalStateFile.load_for_directory(dirname)
+        local_state_file.set_service_run_state("FOO", dict(shutdown_commands=[['false']]))
+        status = service_supervisor.stop_service(local_state_file, "FOO")
+        assert not status
+        assert "Shutdown commands failed for FOO." == status.status_description
+
+    with_directory_contents(dict(), check)
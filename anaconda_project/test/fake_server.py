@@ -7,6 +7,8 @@
 # -----------------------------------------------------------------------------
 from __future__ import absolute_import, print_function
 
+import base64
+import hashlib
 import json
 import socket
 import sys
@@ -63,9 +65,11 @@ class ProjectViewHandler(RequestHandler):
                     assert 'basename' in body
                     assert body['basename'] == self.application.server.expected_basename
                     post_url = self.application.server.url + "fake_s3"
+                    stage_info = {"post_url": post_url,
+                                  "form_data": {"x-should-be-passed-back-to-us": "12345"},
+                                  "dist_id": "rev42"}
                     self.set_header('Content-Type', 'application/json')
-                    self.write(('{"post_url":"%s", ' + '"form_data":{"x-should-be-passed-back-to-us":"12345"},' +
-                                '"dist_id":"rev42"}\n') % (post_url))
+                    self.write(json.dumps(stage_info) + "\n")
             elif operation == 'commit/rev42':
                 if 'commit' in self.application.server.fail_these:
                     self.set_status(501)
@@ -87,6 +91,9 @@ class ProjectViewHandler(RequestHandler):
                     fileinfo = self.request.files['file'][0]
                     assert fileinfo['filename'] == self.application.server.expected_basename
                     assert len(fileinfo['body']) > 100  # shouldn't be some tiny or empty thing
+                    body_md5 = base64.b64encode(hashlib.md5(fileinfo['body']).digest()).decode('ascii')
+                    assert self.get_body_argument('Content-MD5').strip() == body_md5
+                    assert int(self.get_body_argument('Content-Length')) == len(fileinfo['body'])
         else:
             self.set_status(status_code=404)
 
@@ -140,6 +147,9 @@ def _monkeypatch_client_config(monkeypatch, url):
     def _mock_get_config(user=True, site=True, remote_site=None):
         return {'url': url}
 
+    # don't wait around before retrying failed requests to the fake S3
+    monkeypatch.setattr('anaconda_project.client._UPLOAD_RETRY_DELAY', 0)
+
     # get_config moved into a `config` submodule at some point in anaconda-client
     try:
         import binstar_client.utils.config  # noqa # (unused import)
@@ -61,7 +61,7 @@ def test_load_project(monkeypatch):
 
     monkeypatch.setattr('anaconda_project.project.Project', MockProject)
     p = api.AnacondaProject()
-    kwargs = dict(directory_path='foo', frontend=37)
+    kwargs = dict(directory_path='foo', frontend=37, read_only=True)
     project = p.load_project(**kwargs)
     assert kwargs == project.kwargs
 
@@ -391,7 +391,7 @@ def test_lock(monkeypatch):
     monkeypatch.setattr('anaconda_project.project_ops.lock', mock_lock)
 
     p = api.AnacondaProject()
-    kwargs = dict(project=43, env_spec_name='foo')
+    kwargs = dict(project=43, env_spec_name='foo', package_table=True)
     result = p.lock(**kwargs)
     assert 42 == result
     assert kwargs == params['kwargs']
@@ -621,7 +621,7 @@ def test_archive(monkeypatch):
     monkeypatch.setattr('anaconda_project.project_ops.archive', mock_archive)
 
     p = api.AnacondaProject()
-    kwargs = dict(project=43, filename=123)
+    kwargs = dict(project=43, filename=123, compression_level=456, reproducible=True, check_unchanged=False, base=789)
     result = p.archive(**kwargs)
     assert 42 == result
     assert kwargs == params['kwargs']
@@ -7,7 +7,15 @@
 # -----------------------------------------------------------------------------
 from __future__ import absolute_import, print_function
 
+import io
 import os
+import subprocess
+import tarfile
+import time
+import zipfile
+import zlib
+
+import pytest
 
 from anaconda_project import archiver
 from anaconda_project import project_ops
@@ -161,3 +169,497 @@ def test_file_pattern_matcher_with_directories():
     tests['/foo/'] = tests['/foo']
 
     _test_file_pattern_matcher(tests, is_directory=True)
+
+
+def test_list_project_prunes_ignored_directories(monkeypatch):
+    def check(dirname):
+        seen = []
+        original_scandir = archiver._scandir
+
+        def recording_scandir(path):
+            seen.append(os.path.relpath(path, dirname))
+            return original_scandir(path)
+
+        def ignore_envs(info):
+            return info.relative_path == 'envs'
+
+        monkeypatch.setattr('anaconda_project.archiver._scandir', recording_scandir)
+        frontend = FakeFrontend()
+        infos = archiver._list_project(dirname, ignore_envs, frontend)
+
+        assert [] == frontend.errors
+        paths = sorted([(info.relative_path, info.is_directory) for info in infos])
+        assert [('a', True), (os.path.join('a', 'b'), True), (os.path.join('a', 'b', 'c.txt'), False),
+                ('foo.py', False)] == paths
+        # we never listed the contents of the ignored directory
+        assert sorted(['.', 'a', os.path.join('a', 'b')]) == sorted(seen)
+
+        for info in infos:
+            assert info.full_path == os.path.join(dirname, info.relative_path)
+            assert info.unixified_relative_path == info.relative_path.replace(os.sep, '/')
+            assert info.basename == os.path.basename(info.relative_path)
+            assert info.stat.st_size == os.lstat(info.full_path).st_size
+            assert not info.is_symlink
+            assert not hasattr(info, '__dict__')
+
+    with_directory_contents({"foo.py": "print('hi')\n", "a/b/c.txt": "hello", "envs/default/bin/python": ""}, check)
+
+
+def test_list_project_without_scandir_entries(monkeypatch):
+    def check(dirname):
+        def listdir_scandir(path):
+            return [archiver._ListdirEntry(path, name) for name in os.listdir(path)]
+
+        monkeypatch.setattr('anaconda_project.archiver._scandir', listdir_scandir)
+        frontend = FakeFrontend()
+        infos = archiver._list_project(dirname, lambda info: False, frontend)
+
+        by_path = dict((info.relative_path, info) for info in infos)
+        assert sorted(['a', os.path.join('a', 'b.txt')]) == sorted(by_path.keys())
+        assert by_path['a'].is_directory
+        assert not by_path['a'].is_symlink
+        assert 5 == by_path[os.path.join('a', 'b.txt')].stat.st_size
+        assert by_path['a'].stat.st_mtime == by_path['a']._entry.stat(follow_symlinks=True).st_mtime
+
+    with_directory_contents({"a/b.txt": "hello"}, check)
+
+
+def test_list_project_skips_unreadable_subdirectory(monkeypatch):
+    def check(dirname):
+        original_scandir = archiver._scandir
+
+        def failing_scandir(path):
+            if os.path.basename(path) == 'a':
+                raise OSError("NOPE")
+            return original_scandir(path)
+
+        monkeypatch.setattr('anaconda_project.archiver._scandir', failing_scandir)
+        frontend = FakeFrontend()
+        infos = archiver._list_project(dirname, lambda info: False, frontend)
+        assert [] == frontend.errors
+        assert sorted(['a', 'foo.py']) == sorted([info.relative_path for info in infos])
+
+    with_directory_contents({"foo.py": "", "a/b.txt": "hello"}, check)
+
+
+def test_file_info_without_entry():
+    def check(dirname):
+        full_path = os.path.join(dirname, "foo.py")
+        info = archiver._FileInfo(full_path=full_path, relative_path="foo.py", is_directory=False)
+        assert not info.is_symlink
+        assert 3 == info.stat.st_size
+        # cached
+        assert info.stat is info.stat
+
+    with_directory_contents({"foo.py": "abc"}, check)
+
+
+def test_list_git_files_applies_ignore_filter_to_parent_directories(monkeypatch):
+    def check(dirname):
+        def no_scandir(path):
+            raise AssertionError("should not walk %s" % path)
+
+        monkeypatch.setattr('anaconda_project.archiver._scandir', no_scandir)
+
+        git_files = ['foo.py', 'a/b/c.txt', 'ignoreddir/x.py', 'deleted.py']
+
+        def ignore_dirs_named_ignoreddir(info):
+            return info.is_directory and info.basename == 'ignoreddir'
+
+        frontend = FakeFrontend()
+        infos = archiver._list_project(dirname, ignore_dirs_named_ignoreddir, frontend, git_files=git_files)
+        assert [] == frontend.errors
+        paths = sorted([(info.relative_path, info.is_directory) for info in infos])
+        assert [('a', True), (os.path.join('a', 'b'), True), (os.path.join('a', 'b', 'c.txt'), False),
+                ('foo.py', False)] == paths
+        for info in infos:
+            assert info.full_path == os.path.join(dirname, info.relative_path)
+
+    with_directory_contents({"foo.py": "", "a/b/c.txt": "hello", "ignoreddir/x.py": ""}, check)
+
+
+def test_list_git_files_walks_submodules():
+    def check(dirname):
+        git_files = ['foo.py', 'sub']
+        frontend = FakeFrontend()
+        infos = archiver._list_project(dirname, lambda info: False, frontend, git_files=git_files)
+        assert [] == frontend.errors
+        assert sorted(['foo.py', 'sub', os.path.join('sub', 'bar.py')]) == sorted([info.relative_path for info in infos
+                                                                                   ])
+
+    with_directory_contents({"foo.py": "", "sub/bar.py": "", "notlisted.py": ""}, check)
+
+
+def test_enumerate_git_project_files():
+    def check(dirname):
+        subprocess.check_call(['git', 'init', '-q', dirname])
+        frontend = FakeFrontend()
+        infos = archiver._enumerate_archive_files(dirname, frontend, requirements=[])
+        assert [] == frontend.errors
+        assert sorted(['.gitignore', '.projectignore', 'foo.py', 'node_modules', 'untracked']) == sorted(
+            [info.relative_path for info in infos if info.is_directory or os.sep not in info.relative_path])
+        assert os.path.join('untracked', 'x.py') in [info.relative_path for info in infos]
+        assert os.path.join('node_modules', 'kept.js') in [info.relative_path for info in infos]
+        assert os.path.join('node_modules', 'lib', 'big.js') not in [info.relative_path for info in infos]
+
+    with_directory_contents(
+        {
+            "foo.py": "",
+            "ignored.py": "",
+            ".gitignore": "/ignored.py\n/build/\n",
+            ".projectignore": "/node_modules/lib/\n",
+            "build/out.o": "",
+            "node_modules/lib/big.js": "",
+            "node_modules/kept.js": "",
+            "untracked/x.py": ""
+        }, check)
+
+
+def _set_mtime_in_past(path, seconds_ago):
+    when = time.time() - seconds_ago
+    os.utime(path, (when, when))
+
+
+def test_file_index_reused_until_a_directory_changes(monkeypatch):
+    def check(dirname):
+        for path in (dirname, os.path.join(dirname, 'sub'), os.path.join(dirname, '.projectignore')):
+            _set_mtime_in_past(path, 100)
+
+        walks = []
+        real_walk = archiver._walk_project
+
+        def counting_walk(*args, **kwargs):
+            walks.append(1)
+            return real_walk(*args, **kwargs)
+
+        monkeypatch.setattr('anaconda_project.archiver._walk_project', counting_walk)
+
+        def listing():
+            frontend = FakeFrontend()
+            infos = archiver._enumerate_archive_files(dirname, frontend, requirements=[])
+            assert [] == frontend.errors
+            return sorted([info.relative_path for info in infos])
+
+        first = listing()
+        assert [os.path.join('sub', 'b.py')] == [path for path in first if path.endswith('.py')]
+        assert listing() == first
+        assert 1 == len(walks)
+
+        # replacing a file with a new one changes the directory's
+        # mtime but not the names in it
+        with open(os.path.join(dirname, 'sub', 'b.py.tmp'), 'w') as f:
+            f.write("new")
+        os.rename(os.path.join(dirname, 'sub', 'b.py.tmp'), os.path.join(dirname, 'sub', 'b.py'))
+        _set_mtime_in_past(os.path.join(dirname, 'sub'), 70)
+        assert listing() == first
+        assert 1 == len(walks)
+
+        # adding a file changes the names
+        with open(os.path.join(dirname, 'sub', 'c.py'), 'w') as f:
+            f.write("")
+        _set_mtime_in_past(os.path.join(dirname, 'sub'), 50)
+        assert os.path.join('sub', 'c.py') in listing()
+        assert 2 == len(walks)
+
+        # so does changing what's ignored
+        with open(os.path.join(dirname, '.projectignore'), 'w') as f:
+            f.write("/sub/\n")
+        _set_mtime_in_past(os.path.join(dirname, '.projectignore'), 50)
+        assert [] == [path for path in listing() if path.startswith('sub')]
+        assert 3 == len(walks)
+
+    with_directory_contents({"sub/b.py": "", ".projectignore": "/a.pyc\n", "a.pyc": ""}, check)
+
+
+def test_file_index_notices_file_replaced_by_directory():
+    def check(dirname):
+        for path in (dirname, os.path.join(dirname, 'foo')):
+            _set_mtime_in_past(path, 100)
+
+        def listing():
+            frontend = FakeFrontend()
+            infos = archiver._enumerate_archive_files(dirname, frontend, requirements=[])
+            assert [] == frontend.errors
+            return sorted([(info.relative_path, info.is_directory) for info in infos])
+
+        assert [('foo', False)] == listing()
+
+        os.remove(os.path.join(dirname, 'foo'))
+        os.mkdir(os.path.join(dirname, 'foo'))
+        with open(os.path.join(dirname, 'foo', 'x.ipynb'), 'w') as f:
+            f.write("{}")
+        _set_mtime_in_past(os.path.join(dirname, 'foo', 'x.ipynb'), 70)
+        _set_mtime_in_past(os.path.join(dirname, 'foo'), 70)
+        _set_mtime_in_past(dirname, 70)
+        assert [('foo', True), (os.path.join('foo', 'x.ipynb'), False)] == listing()
+
+    with_directory_contents({"foo": ""}, check)
+
+
+def test_file_index_notices_new_file_in_unlisted_git_directory(monkeypatch):
+    def check(dirname):
+        subprocess.check_call(['git', 'init', '-q', dirname])
+        os.mkdir(os.path.join(dirname, 'empty'))
+        for path in ('empty', 'only_ignored', 'build', '.gitignore', os.path.join('.git', 'info', 'exclude'), ''):
+            _set_mtime_in_past(os.path.join(dirname, path), 100)
+
+        listings = []
+        real_list_unignored_files = archiver._list_unignored_files
+
+        def counting_list_unignored_files(*args, **kwargs):
+            listings.append(1)
+            return real_list_unignored_files(*args, **kwargs)
+
+        monkeypatch.setattr('anaconda_project.archiver._list_unignored_files', counting_list_unignored_files)
+
+        def listing():
+            frontend = FakeFrontend()
+            infos = archiver._enumerate_archive_files(dirname, frontend, requirements=[])
+            assert [] == frontend.errors
+            return sorted([info.relative_path for info in infos])
+
+        assert ['.gitignore', 'foo.py'] == listing()
+        assert ['.gitignore', 'foo.py'] == listing()
+        assert 1 == len(listings)
+
+        for path in (os.path.join('empty', 'new.py'), os.path.join('only_ignored', 'new.py')):
+            with open(os.path.join(dirname, path), 'w') as f:
+                f.write("")
+            _set_mtime_in_past(os.path.join(dirname, path), 70)
+            _set_mtime_in_past(os.path.dirname(os.path.join(dirname, path)), 70)
+            assert path in listing()
+
+    with_directory_contents(
+        {"foo.py": "",
+         ".gitignore": "*.o\n/build/\n",
+         "only_ignored/a.o": "",
+         "build/b.py": ""}, check)
+
+
+def test_file_index_not_kept_if_directory_just_changed(monkeypatch):
+    def check(dirname):
+        walks = []
+        real_walk = archiver._walk_project
+
+        def counting_walk(*args, **kwargs):
+            walks.append(1)
+            return real_walk(*args, **kwargs)
+
+        monkeypatch.setattr('anaconda_project.archiver._walk_project', counting_walk)
+        archiver._enumerate_archive_files(dirname, FakeFrontend(), requirements=[])
+        archiver._enumerate_archive_files(dirname, FakeFrontend(), requirements=[])
+        # the directory was created moments ago so the listing could be stale
+        assert 2 == len(walks)
+
+    with_directory_contents({"a.py": ""}, check)
+
+
+def test_file_index_gives_fresh_stat(monkeypatch):
+    def check(dirname):
+        _set_mtime_in_past(dirname, 100)
+        frontend = FakeFrontend()
+        [info] = archiver._enumerate_archive_files(dirname, frontend, requirements=[])
+        assert 1 == info.stat.st_size
+        with open(os.path.join(dirname, 'a.py'), 'w') as f:
+            f.write("changed")
+        [info] = archiver._enumerate_archive_files(dirname, frontend, requirements=[])
+        assert len("changed") == info.stat.st_size
+
+    with_directory_contents({"a.py": "x"}, check)
+
+
+def test_looks_incompressible():
+    assert not archiver._looks_incompressible(b'')
+    assert not archiver._looks_incompressible(os.urandom(100))
+    assert not archiver._looks_incompressible(b'hello world\n' * 1000)
+    assert archiver._looks_incompressible(os.urandom(10000))
+
+
+def test_compress_zip_member():
+    def check(dirname):
+        with open(os.path.join(dirname, "random.bin"), 'wb') as f:
+            f.write(os.urandom(100000))
+
+        infos = archiver._list_project(dirname, lambda info: False, FakeFrontend())
+        by_path = dict((info.relative_path, info) for info in infos)
+
+        results = dict()
+        for (name, info) in by_path.items():
+            results[name] = archiver._compress_zip_member(info, "proj/" + name, 9)
+
+        (zinfo, compressed) = results['dir']
+        assert zinfo.filename == 'proj/dir/'
+        assert compressed is None
+
+        for name in ('text.txt', 'image.png', 'random.bin'):
+            (zinfo, compressed) = results[name]
+            with open(by_path[name].full_path, 'rb') as f:
+                original = f.read()
+            data = compressed.read()
+            compressed.close()
+            assert zinfo.filename == "proj/" + name
+            assert zinfo.file_size == len(original)
+            assert zinfo.compress_size == len(data)
+            assert zinfo.CRC == zlib.crc32(original) & 0xffffffff
+            if name == 'text.txt':
+                assert zinfo.compress_type == zipfile.ZIP_DEFLATED
+                assert zlib.decompress(data, -zlib.MAX_WBITS) == original
+            else:
+                assert zinfo.compress_type == zipfile.ZIP_STORED
+                assert data == original
+
+    with_directory_contents(
+        {
+            "text.txt": "hello world\n" * 1000,
+            # compressible, but we go by the extension
+            "image.png": "not really a png\n" * 1000,
+            "dir": None
+        },
+        check)
+
+
+def test_reproducible_mtime(monkeypatch):
+    monkeypatch.delenv('SOURCE_DATE_EPOCH', raising=False)
+    assert archiver._REPRODUCIBLE_MTIME == archiver._reproducible_mtime()
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1500000000')
+    assert 1500000000 == archiver._reproducible_mtime()
+    # zip can't go earlier than 1980
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '0')
+    assert archiver._REPRODUCIBLE_MTIME == archiver._reproducible_mtime()
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', 'not a number')
+    assert archiver._REPRODUCIBLE_MTIME == archiver._reproducible_mtime()
+
+
+def test_read_archive_manifest_without_one():
+    def check(dirname):
+        assert archiver._read_archive_manifest(os.path.join(dirname, "nope.zip")) is None
+        assert archiver._read_archive_manifest(os.path.join(dirname, "garbage.tar.gz")) is None
+        assert archiver._read_archive_manifest(os.path.join(dirname, "foo.txt")) is None
+
+        # a manifest from some other tool
+        archivefile = os.path.join(dirname, "other.zip")
+        with zipfile.ZipFile(archivefile, 'w') as zf:
+            zf.writestr("proj/" + archiver._MANIFEST_FILENAME, b'{"version": 42}')
+        assert archiver._read_archive_manifest(archivefile) is None
+
+    with_directory_contents({"garbage.tar.gz": "not a tarball", "foo.txt": ""}, check)
+
+
+def test_reproducible_symlinks():
+    if not hasattr(os, 'symlink'):
+        return  # pragma: no cover (Windows)
+
+    def check(dirname):
+        os.symlink("foo.py", os.path.join(dirname, "link.py"))
+        infos = archiver._list_project(dirname, lambda info: False, FakeFrontend())
+        by_name = dict((info.relative_path, info) for info in infos)
+
+        tarinfo = archiver._tar_info(by_name['link.py'], "proj/link.py", None, reproducible_mtime=1500000000)
+        assert tarinfo.issym()
+        assert "foo.py" == tarinfo.linkname
+        assert 0o777 == tarinfo.mode
+        assert 1500000000 == tarinfo.mtime
+
+        # zip stores what the link points to
+        zinfo = archiver._zip_info(by_name['link.py'],
+                                   "proj/link.py",
+                                   zipfile.ZIP_DEFLATED,
+                                   reproducible_mtime=1500000000)
+        assert len("print('hello')\n") == zinfo.file_size
+        assert (0o100644 << 16) == zinfo.external_attr
+        assert archiver._zip_info(by_name['link.py'], "proj/link.py", zipfile.ZIP_DEFLATED) is None
+
+        manifest = archiver._make_manifest("proj", infos)
+        assert {'link.py': 'foo.py'} == manifest['symlinks']
+        assert ['foo.py'] == sorted(manifest['files'].keys())
+
+    with_directory_contents({"foo.py": "print('hello')\n"}, check)
+
+
+def test_delta_deletions_outside_project():
+    def check(dirname):
+        frontend = FakeFrontend()
+        project_dir = os.path.realpath(dirname)
+        manifest = dict(delta=dict(deleted=['foo.py', 'a/../b.py']))
+        assert [os.path.join(project_dir, 'foo.py'), os.path.join(project_dir, 'b.py')] == archiver._delta_deletions(
+            project_dir, manifest, frontend)
+
+        for path in ('../foo.py', 'a/../..', '..'):
+            frontend = FakeFrontend()
+            manifest = dict(delta=dict(deleted=['foo.py', path]))
+            assert archiver._delta_deletions(project_dir, manifest, frontend) is None
+            assert [("Archive deletes '%s' which is outside '%s'." % (path, project_dir))] == frontend.errors
+
+    with_directory_contents({"foo.py": "", "a/b.py": ""}, check)
+
+
+def test_extract_files_zip_in_parallel(monkeypatch):
+    monkeypatch.setattr('anaconda_project.archiver._PARALLEL_EXTRACT_SIZE', 10)
+
+    def check(dirname):
+        archivefile = os.path.join(dirname, "foo.zip")
+        contents = dict(("proj/%s.txt" % i, ("%d" % i) * (i * 5)) for i in range(20))
+        with zipfile.ZipFile(archivefile, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("proj/emptydir/", b'')
+            for (name, content) in contents.items():
+                zf.writestr(name, content)
+
+        unpacked = os.path.join(dirname, "unpacked")
+        src_and_dest = [(name, os.path.join(unpacked, os.path.basename(name))) for name in sorted(contents.keys())]
+        src_and_dest.append(("proj/emptydir/", os.path.join(unpacked, "emptydir")))
+        frontend = FakeFrontend()
+        archiver._extract_files_zip(archivefile, src_and_dest, frontend, workers=3)
+
+        assert os.path.isdir(os.path.join(unpacked, "emptydir"))
+        for (name, content) in contents.items():
+            with open(os.path.join(unpacked, os.path.basename(name)), 'r') as f:
+                assert content == f.read()
+        # messages come out in order
+        assert [("Unpacking %s to %s" % (src, dest)) for (src, dest) in src_and_dest] == frontend.logs
+
+    with_directory_contents(dict(), check)
+
+
+def test_extract_files_zip_in_parallel_fails(monkeypatch):
+    monkeypatch.setattr('anaconda_project.archiver._PARALLEL_EXTRACT_SIZE', 10)
+
+    def check(dirname):
+        archivefile = os.path.join(dirname, "foo.zip")
+        with zipfile.ZipFile(archivefile, 'w') as zf:
+            zf.writestr("proj/small.txt", "x")
+            zf.writestr("proj/big.txt", "x" * 100)
+
+        unpacked = os.path.join(dirname, "unpacked")
+        os.makedirs(os.path.join(unpacked, "big.txt"))
+        src_and_dest = [("proj/big.txt", os.path.join(unpacked, "big.txt")),
+                        ("proj/small.txt", os.path.join(unpacked, "small.txt"))]
+        with pytest.raises(EnvironmentError):
+            archiver._extract_files_zip(archivefile, src_and_dest, FakeFrontend(), workers=2)
+        # we kept going with the small file in the meantime
+        assert os.path.isfile(os.path.join(unpacked, "small.txt"))
+
+    with_directory_contents(dict(), check)
+
+
+def test_extract_files_tar_skips_links_with_wanted_names():
+    def check(dirname):
+        archivefile = os.path.join(dirname, "foo.tar")
+        with tarfile.open(archivefile, 'w') as tf:
+            tarinfo = tarfile.TarInfo("proj/a")
+            tarinfo.size = 5
+            tf.addfile(tarinfo, io.BytesIO(b"hello"))
+            tarinfo = tarfile.TarInfo("proj/a")
+            tarinfo.type = tarfile.SYMTYPE
+            tarinfo.linkname = "/etc/passwd"
+            tf.addfile(tarinfo)
+
+        assert ["proj/a"] == archiver._list_files_tar(archivefile)
+        unpacked = os.path.join(dirname, "unpacked")
+        frontend = FakeFrontend()
+        archiver._extract_files_tar(archivefile, [("proj/a", os.path.join(unpacked, "a"))], frontend)
+        assert not os.path.islink(os.path.join(unpacked, "a"))
+        with open(os.path.join(unpacked, "a"), 'r') as f:
+            assert "hello" == f.read()
+        assert [("Unpacking proj/a to %s" % os.path.join(unpacked, "a"))] == frontend.logs
+
+    with_directory_contents(dict(), check)
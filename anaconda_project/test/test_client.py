@@ -9,7 +9,10 @@ from __future__ import absolute_import, print_function
 
 import os
 
+import requests
+
 import anaconda_project.project_ops as project_ops
+from anaconda_project import archiver
 from anaconda_project.client import _upload, _Client
 from anaconda_project.test.fake_server import fake_server
 from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
@@ -130,3 +133,91 @@ def test_upload_failing_commit(monkeypatch):
             assert '501' in status.errors[0]
 
     with_directory_contents(dict(), check)
+
+
+def test_upload_with_archive_status(monkeypatch):
+    def check(dirname):
+        with fake_server(monkeypatch, expected_basename='foo.tar.bz2'):
+            project = project_ops.create(dirname)
+            archivefile = os.path.join(dirname, "tmp.tar.bz2")
+            archive_status = archiver._archive_project(project, archivefile, compute_md5=True)
+            assert archive_status
+
+            def mock_compute_hash(*args, **kwargs):
+                raise AssertionError("should not read the archive to hash it")
+
+            def mock_file_count(*args, **kwargs):
+                raise AssertionError("should not read the archive to count files")
+
+            monkeypatch.setattr('binstar_client.utils.compute_hash', mock_compute_hash)
+            monkeypatch.setattr('anaconda_project.client._Client._file_count', mock_file_count)
+
+            status = _upload(project, archivefile, "foo.tar.bz2", site='unit_test', archive_status=archive_status)
+            assert status
+
+    with_directory_contents(dict(), check)
+
+
+def test_upload_with_wrong_md5_in_archive_status(monkeypatch):
+    def check(dirname):
+        with fake_server(monkeypatch, expected_basename='foo.tar.bz2'):
+            project = project_ops.create(dirname)
+            archivefile = os.path.join(dirname, "tmp.tar.bz2")
+            archive_status = archiver._archive_project(project, archivefile, compute_md5=True)
+            archive_status.md5 = b'\0' * 16
+
+            # the fake S3 checks the MD5
+            status = _upload(project, archivefile, "foo.tar.bz2", site='unit_test', archive_status=archive_status)
+            assert not status
+            assert '500' in status.errors[0]
+
+    with_directory_contents(dict(), check)
+
+
+def test_upload_retries_s3(monkeypatch):
+    def check(dirname):
+        with fake_server(monkeypatch, expected_basename='foo.tar.bz2'):
+            project = project_ops.create(dirname)
+            archivefile = os.path.join(dirname, "tmp.tar.bz2")
+            archive_status = archiver._archive_project(project, archivefile, compute_md5=True)
+
+            real_post = requests.Session.post
+            posts = []
+
+            def flaky_post(self, url, *args, **kwargs):
+                if url.endswith("fake_s3"):
+                    posts.append(url)
+                    if len(posts) == 1:
+                        raise requests.ConnectionError("connection reset")
+                return real_post(self, url, *args, **kwargs)
+
+            monkeypatch.setattr('requests.Session.post', flaky_post)
+
+            status = _upload(project, archivefile, "foo.tar.bz2", site='unit_test', archive_status=archive_status)
+            assert status
+            assert 2 == len(posts)
+
+    with_directory_contents(dict(), check)
+
+
+def test_upload_gives_up_retrying_s3(monkeypatch):
+    def check(dirname):
+        with fake_server(monkeypatch, expected_basename='foo.tar.bz2'):
+            project = project_ops.create(dirname)
+            archivefile = os.path.join(dirname, "tmp.tar.bz2")
+            archive_status = archiver._archive_project(project, archivefile, compute_md5=True)
+
+            real_post = requests.Session.post
+
+            def failing_post(self, url, *args, **kwargs):
+                if url.endswith("fake_s3"):
+                    raise requests.ConnectionError("connection reset")
+                return real_post(self, url, *args, **kwargs)
+
+            monkeypatch.setattr('requests.Session.post', failing_post)
+
+            status = _upload(project, archivefile, "foo.tar.bz2", site='unit_test', archive_status=archive_status)
+            assert not status
+            assert 'Upload failed after 5 attempts: connection reset' in status.errors[0]
+
+    with_directory_contents(dict(), check)
@@ -68,6 +68,53 @@ def test_lock_set_properties(monkeypatch):
     assert lock_set.platforms == ('linux-64', 'win-32')
 
 
+def test_lock_set_merges_like_combining_lists():
+    from anaconda_project.env_spec import _combine_conda_package_lists
+
+    by_platform = {'all': ["a=1=0", "b=1=0", "=", "a=2=0"],
+                   'unix': ["b=2=0", "c=1=0"],
+                   'linux': ["c=2=0", "=", "d=1=0"],
+                   'linux-64': ["a=3=0", "e=1=0", "e=2=0"],
+                   'win': ["b=3=0"]}
+    lock_set = CondaLockSet(by_platform, platforms=['linux-64', 'linux-32', 'osx-64', 'win-64'])
+
+    keys_by_platform = {'linux-64': ('all', 'unix', 'linux', 'linux-64'),
+                        'linux-32': ('all', 'unix', 'linux', 'linux-32'),
+                        'osx-64': ('all', 'unix', 'osx', 'osx-64'),
+                        'win-64': ('all', 'win', 'win-64')}
+    for (platform, keys) in keys_by_platform.items():
+        expected = ()
+        for key in keys:
+            expected = _combine_conda_package_lists(expected, by_platform.get(key, []))
+        assert expected == lock_set.package_specs_for_platform(platform)
+
+    assert ("b=2=0", "c=2=0", "=", "d=1=0", "a=3=0", "e=1=0",
+            "e=2=0") == lock_set.package_specs_for_platform('linux-64')
+    # invalid specs aren't in the index, and later duplicates win
+    assert dict(b="b=2=0",
+                c="c=2=0",
+                d="d=1=0",
+                a="a=3=0",
+                e="e=2=0") == lock_set.package_specs_by_name_for_platform('linux-64')
+
+
+def test_lock_set_is_immutable():
+    specs = ["a=1=0"]
+    lock_set = CondaLockSet({'all': specs}, platforms=['linux-64'])
+    merged = lock_set.package_specs_for_platform('linux-64')
+    assert ("a=1=0", ) == merged
+
+    # changing what we passed in doesn't change the lock set
+    specs.append("b=1=0")
+    assert ("a=1=0", ) == lock_set.package_specs_for_platform('linux-64')
+    assert lock_set.equivalent_to(CondaLockSet({'all': ("a=1=0", )}, platforms=['linux-64']))
+
+    # we only merge the lists once
+    assert merged is lock_set.package_specs_for_platform('linux-64')
+    assert lock_set.package_specs_by_name_for_platform('linux-64') is \
+        lock_set.package_specs_by_name_for_platform('linux-64')
+
+
 def test_lock_set_to_json(monkeypatch):
     lock_set = CondaLockSet(
         {'all': ["something=0.5=2", "bokeh=0.12.4=1"],
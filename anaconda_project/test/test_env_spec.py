@@ -413,3 +413,33 @@ def test_platforms_affect_hash():
 
     assert without_platforms_spec.logical_hash == without_platforms_spec.locked_hash
     assert without_platforms_spec.logical_hash == without_platforms_spec.import_hash
+
+
+def test_diamond_inheritance_keeps_last_duplicate():
+    base = EnvSpec(name="base", conda_packages=['a=1', 'b', 'c'], channels=['x'], pip_packages=['pip1==1'])
+    left = EnvSpec(name="left",
+                   conda_packages=['a=2', 'd'],
+                   channels=['y', 'x'],
+                   inherit_from_names=('base', ),
+                   inherit_from=(base, ))
+    right = EnvSpec(name="right",
+                    conda_packages=['b=3', 'c', 'c=4'],
+                    channels=['z'],
+                    pip_packages=['pip1==2'],
+                    inherit_from_names=('base', ),
+                    inherit_from=(base, ))
+    bottom = EnvSpec(name="bottom",
+                     conda_packages=['d=5'],
+                     channels=[],
+                     inherit_from_names=('left', 'right'),
+                     inherit_from=(left, right))
+
+    # the base is only combined in once, and later specs win
+    assert ('a=2', 'b=3', 'c', 'c=4', 'd=5') == bottom.conda_packages
+    assert ('y', 'x', 'z') == bottom.channels
+    assert ('pip1==2', ) == bottom.pip_packages
+    assert set(['a', 'b', 'c', 'd']) == bottom.conda_package_names_set
+
+    # what we inherit is only combined once
+    assert bottom.conda_packages is bottom.conda_packages
+    assert bottom.pip_packages is bottom.pip_packages
@@ -7,6 +7,7 @@
 # -----------------------------------------------------------------------------
 from __future__ import absolute_import
 
+from anaconda_project.frontend import ProgressEvent, _new_error_recorder
 from anaconda_project.internal.test.fake_frontend import FakeFrontend
 
 
@@ -39,3 +40,28 @@ def test_partial_messages_with_windows_line_endings():
     # d is stuck in the buffer
     assert frontend.logs == ['a', 'b', 'c']
     assert frontend._info_buf == 'd'
+
+
+def test_progress_goes_through_error_recorder():
+    class ProgressFrontend(FakeFrontend):
+        structured_progress = True
+
+        def __init__(self):
+            super(ProgressFrontend, self).__init__()
+            self.events = []
+
+        def progress(self, event):
+            self.events.append(event)
+
+    event = ProgressEvent(phase='fetch', package='foo', fraction=0.5, bytes=None, seconds=0.0)
+
+    # the default ignores it
+    frontend = FakeFrontend()
+    assert not _new_error_recorder(frontend).structured_progress
+    _new_error_recorder(frontend).progress(event)
+
+    frontend = ProgressFrontend()
+    recorder = _new_error_recorder(frontend)
+    assert recorder.structured_progress
+    recorder.progress(event)
+    assert [event] == frontend.events
@@ -303,10 +303,10 @@ def test_project_dir_not_readable(monkeypatch):
         project_dir = os.path.join(dirname, 'foo')
         os.makedirs(project_dir)
 
-        def mock_os_walk(dirname):
+        def mock_scandir(dirname):
             raise OSError("NOPE")
 
-        monkeypatch.setattr('os.walk', mock_os_walk)
+        monkeypatch.setattr('anaconda_project.archiver._scandir', mock_scandir)
 
         project = Project(project_dir)
 
@@ -3200,6 +3200,69 @@ env_specs:
 """}, check)
 
 
+def test_lock_file_with_package_table():
+    def check(dirname):
+        project = project_no_dedicated_env(dirname)
+
+        assert [] == project.problems
+        assert ('a=1.0=1', 'b=2.0=0') == project.env_specs['default'].lock_set.package_specs_for_platform('linux-64')
+        assert ('a=1.0=1', 'c=3.0=0') == project.env_specs['default'].lock_set.package_specs_for_platform('win-64')
+
+    with_directory_contents_completing_project_file(
+        {DEFAULT_PROJECT_LOCK_FILENAME: """
+package_table:
+  - a=1.0=1
+  - b=2.0=0
+  - c=3.0=0
+env_specs:
+  default:
+    platforms: [linux-64,osx-64,win-64]
+    packages:
+      all: [0]
+      unix: [1]
+      win: [c=3.0=0]
+"""}, check)
+
+
+def test_lock_file_has_invalid_package_table():
+    def check(dirname):
+        project = project_no_dedicated_env(dirname)
+
+        filename = project.lock_file.basename
+        assert [
+            "%s: 'package_table:' section in lock file should be a list of package specs, found [1]" % filename,
+            "%s: Package 0 for all in env spec 'default' in lock file isn't in 'package_table:'" % filename
+        ] == project.problems
+
+    with_directory_contents_completing_project_file(
+        {DEFAULT_PROJECT_LOCK_FILENAME: """
+package_table: [1]
+env_specs:
+  default:
+    packages:
+      all: [0]
+"""}, check)
+
+
+def test_lock_file_has_package_index_out_of_range():
+    def check(dirname):
+        project = project_no_dedicated_env(dirname)
+
+        filename = project.lock_file.basename
+        assert ["%s: Package 1 for all in env spec 'default' in lock file isn't in 'package_table:'" % filename,
+                "%s: Package -1 for all in env spec 'default' in lock file isn't in 'package_table:'" % filename
+                ] == project.problems
+
+    with_directory_contents_completing_project_file(
+        {DEFAULT_PROJECT_LOCK_FILENAME: """
+package_table: [a=1.0=1]
+env_specs:
+  default:
+    packages:
+      all: [0, 1, -1]
+"""}, check)
+
+
 def test_lock_file_has_wrong_platforms():
     def check(dirname):
         project = project_no_dedicated_env(dirname)
@@ -3396,3 +3459,121 @@ env_specs:
 locking_enabled: true
 """
         }, check)
+
+
+def test_only_changed_sections_recomputed():
+    def check(dirname):
+        project = project_no_dedicated_env(dirname)
+
+        def variables():
+            reqs = project.find_requirements('default', klass=EnvVarRequirement)
+            return sorted([req.env_var for req in reqs if not isinstance(req, CondaEnvRequirement)])
+
+        assert [] == project.problems
+        env_specs = project.env_specs
+        commands = project.commands
+        assert ['FOO'] == variables()
+
+        # a new variable doesn't make new env specs or commands
+        project.project_file.set_value(['variables', 'BAR'], None)
+        project.project_file.use_changes_without_saving()
+        assert ['BAR', 'FOO'] == variables()
+        assert env_specs is project.env_specs
+        assert commands is project.commands
+        assert env_specs['default'] is project.env_specs['default']
+
+        # nor does a variable in an env spec
+        project.project_file.set_value(['env_specs', 'default', 'variables'], ['BAZ'])
+        project.project_file.use_changes_without_saving()
+        assert ['BAR', 'BAZ', 'FOO'] == variables()
+        assert env_specs is project.env_specs
+
+        # a new package does
+        project.project_file.set_value(['env_specs', 'default', 'packages'], ['python', 'numpy'])
+        project.project_file.use_changes_without_saving()
+        assert env_specs is not project.env_specs
+        assert ('python', 'numpy') == project.env_specs['default'].conda_packages
+        assert commands is not project.commands
+        assert ['BAR', 'BAZ', 'FOO'] == variables()
+
+        # so does any change to the lock file
+        env_specs = project.env_specs
+        project.lock_file.set_value(['locking_enabled'], False)
+        project.lock_file.use_changes_without_saving()
+        assert env_specs is not project.env_specs
+        env_specs = project.env_specs
+        project.project_file.set_value(['variables', 'BAR'], 'bar')
+        project.project_file.use_changes_without_saving()
+        assert env_specs is project.env_specs
+
+        # a new notebook shows up even if only the variables changed
+        with open(os.path.join(dirname, "new.ipynb"), 'w') as f:
+            f.write("{}")
+        project.project_file.set_value(['variables', 'QUX'], None)
+        project.project_file.use_changes_without_saving()
+        assert ["anaconda-project.yml: No command runs notebook new.ipynb"] == project.suggestions
+
+        # problems from a section we didn't recompute are still there
+        project.project_file.set_value(['downloads'], 42)
+        project.project_file.use_changes_without_saving()
+        assert ["anaconda-project.yml: 'downloads:' section should be a dictionary, found 42"] == project.problems
+        project.project_file.set_value(['commands', 'default', 'description'], "hi")
+        project.project_file.use_changes_without_saving()
+        assert ["anaconda-project.yml: 'downloads:' section should be a dictionary, found 42"] == project.problems
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: """
+name: foo
+variables:
+  FOO: null
+commands:
+  default:
+    unix: echo hello
+    windows: echo hello
+env_specs:
+  default:
+    packages: [python]
+"""
+        }, check)
+
+
+def test_read_only_project_parses_lazily():
+    def check(dirname):
+        project = Project(dirname, read_only=True)
+        assert project.project_file._unparsed_contents is not None
+        assert project.lock_file._unparsed_contents is not None
+        assert [] == project.problems
+        assert ['first', 'second'] == list(project.env_specs.keys())
+        assert 'first' == project.default_env_spec_name
+        assert ('python', ) == project.env_specs['second'].conda_packages
+        assert project.env_specs['first'].lock_set.enabled
+
+        # the real file is parsed when something is set, so comments survive
+        project.project_file.set_value('description', "hi")
+        project.project_file.save()
+        with open(os.path.join(dirname, DEFAULT_PROJECT_FILENAME)) as f:
+            assert "# the first one" in f.read()
+        assert "hi" == Project(dirname, read_only=True).description
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: """
+name: foo
+env_specs:
+  # the first one
+  first:
+    packages: [python]
+  second:
+    packages: [python]
+""",
+            DEFAULT_PROJECT_LOCK_FILENAME: """
+locking_enabled: true
+env_specs:
+  first:
+    locked: true
+    platforms: [linux-64, osx-64, win-64]
+    packages:
+      all: [python=3.6.0=0]
+"""
+        }, check)
@@ -298,3 +298,55 @@ def test_set_lock_set_has_to_create_env_specs_to_disable():
     with_directory_contents({DEFAULT_PROJECT_LOCK_FILENAME: """
 locking_enabled: false
 """}, check_file)
+
+
+def test_package_table():
+    def check_file(dirname):
+        lock_file = ProjectLockFile.load_for_directory(dirname)
+        assert not lock_file._uses_package_table()
+
+        lock_file._use_package_table(True)
+        assert lock_file._uses_package_table()
+        assert ['bar=2.0=2', 'foo=1.0=1', 'shared=1.0=0'] == lock_file.get_value(['package_table'])
+        assert [1, 2] == lock_file.get_value(['env_specs', 'foo', 'packages', 'all'])
+        assert [0, 2] == lock_file.get_value(['env_specs', 'bar', 'packages', 'all'])
+        assert [{'pip': ['baz']}] == lock_file.get_value(['env_specs', 'bar', 'packages', 'win'])
+
+        # setting a lock set keeps the indexes of packages still in use,
+        # drops the ones nobody uses, and appends new ones
+        lock_set = CondaLockSet({'all': ['shared=1.0=0', 'something=3.0=0']}, platforms=['linux-64'])
+        lock_file._set_lock_set('foo', lock_set, all_names=['foo', 'bar'])
+        assert ['bar=2.0=2', 'shared=1.0=0', 'something=3.0=0'] == lock_file.get_value(['package_table'])
+        assert [1, 2] == lock_file.get_value(['env_specs', 'foo', 'packages', 'all'])
+        assert [0, 1] == lock_file.get_value(['env_specs', 'bar', 'packages', 'all'])
+
+        lock_file._disable_locking('bar')
+        assert ['shared=1.0=0', 'something=3.0=0'] == lock_file.get_value(['package_table'])
+        assert [0, 1] == lock_file.get_value(['env_specs', 'foo', 'packages', 'all'])
+
+        lock_file.save()
+        reloaded = ProjectLockFile.load_for_directory(dirname)
+        assert [0, 1] == reloaded.get_value(['env_specs', 'foo', 'packages', 'all'])
+
+        reloaded._use_package_table(False)
+        assert not reloaded._uses_package_table()
+        assert ['shared=1.0=0', 'something=3.0=0'] == reloaded.get_value(['env_specs', 'foo', 'packages', 'all'])
+
+    with_directory_contents(
+        {DEFAULT_PROJECT_LOCK_FILENAME: """
+env_specs:
+  foo:
+    platforms: [linux-64]
+    packages:
+      all:
+        - foo=1.0=1
+        - shared=1.0=0
+  bar:
+    platforms: [linux-64]
+    packages:
+      all:
+        - bar=2.0=2
+        - shared=1.0=0
+      win:
+        - pip: [baz]
+"""}, check_file)
@@ -8,14 +8,21 @@
 from __future__ import absolute_import, print_function
 
 import codecs
+import errno
+import hashlib
+import io
+import json
 import os
 from tornado import gen
 import platform
+import shutil
 import pytest
 import tarfile
 import zipfile
 
+from anaconda_project import archiver
 from anaconda_project import project_ops
+from anaconda_project.internal import parallel_compress
 from anaconda_project.conda_manager import (CondaManager, CondaEnvironmentDeviations, CondaLockSet, CondaManagerError,
                                             push_conda_manager_class, pop_conda_manager_class)
 from anaconda_project.project import Project
@@ -2578,6 +2585,53 @@ env_specs:
 """}, check)
 
 
+def test_lock_with_package_table():
+    def check(dirname):
+        def attempt():
+            project = Project(dirname, frontend=FakeFrontend())
+
+            status = project_ops.lock(project, env_spec_name=None, package_table=True)
+            assert [] == status.errors
+            assert status
+            assert 'Moved locked packages into a shared package table in anaconda-project-lock.yml.' \
+                in project.frontend.logs
+
+            reloaded = Project(dirname)
+            assert ['a=1.0=1'] == reloaded.lock_file.get_value(['package_table'])
+            assert [0] == reloaded.lock_file.get_value(['env_specs', 'foo', 'packages', 'all'])
+            assert [0] == reloaded.lock_file.get_value(['env_specs', 'bar', 'packages', 'all'])
+            assert ('a=1.0=1', ) == reloaded.env_specs['foo'].lock_set.package_specs_for_current_platform
+            assert ('a=1.0=1', ) == reloaded.env_specs['bar'].lock_set.package_specs_for_current_platform
+
+            # switching back works even though everything is already locked
+            project.frontend.reset()
+            status = project_ops.lock(project, env_spec_name=None, package_table=False)
+            assert [] == status.errors
+            assert status
+            assert ['Listed locked packages separately for each env spec in anaconda-project-lock.yml.',
+                    'Env spec bar is already locked.', 'Env spec foo is already locked.'] == project.frontend.logs
+
+            reloaded = Project(dirname)
+            assert reloaded.lock_file.get_value(['package_table'], None) is None
+            assert ['a=1.0=1'] == reloaded.lock_file.get_value(['env_specs', 'foo', 'packages', 'all'])
+            assert ('a=1.0=1', ) == reloaded.env_specs['foo'].lock_set.package_specs_for_current_platform
+
+        _with_conda_test(attempt, resolve_dependencies={'all': ['a=1.0=1']})
+
+    with_directory_contents(
+        {DEFAULT_PROJECT_FILENAME: """
+name: locktest
+platforms: [linux-64,osx-64,win-64]
+env_specs:
+  foo:
+    packages:
+      - a
+  bar:
+    packages:
+      - a
+"""}, check)
+
+
 def test_lock_and_unlock_single_env():
     def check(dirname):
         def attempt():
@@ -3766,6 +3820,582 @@ services:
     with_directory_contents_completing_project_file(dict(), archivetest)
 
 
+def _test_archive_and_unarchive(archive_basename, compression_level=None):
+    def archivetest(archive_dest_dir):
+        archivefile = os.path.join(archive_dest_dir, archive_basename)
+
+        def check(dirname):
+            project = project_no_dedicated_env(dirname)
+            status = project_ops.archive(project, archivefile, compression_level=compression_level)
+
+            assert status
+            assert os.path.exists(archivefile)
+
+            unpacked = os.path.join(archive_dest_dir, "unpacked")
+            status = project_ops.unarchive(archivefile, unpacked)
+            assert status.errors == []
+            assert status
+            _assert_dir_contains(unpacked, ['a/b/c/d.py', 'a/b/c/e.py', 'emptydir', 'foo.py', 'big.txt',
+                                            'anaconda-project.yml', 'anaconda-project-local.yml'])
+            with codecs.open(os.path.join(unpacked, 'big.txt'), 'r', 'utf-8') as f:
+                assert ("lots of text\n" * 100000) == f.read()
+
+        with_directory_contents_completing_project_file(
+            {DEFAULT_PROJECT_FILENAME: """
+name: archivedproj
+    """,
+             "foo.py": "print('hello')\n",
+             "big.txt": "lots of text\n" * 100000,
+             "emptydir": None,
+             "a/b/c/d.py": "",
+             "a/b/c/e.py": ""}, check)
+
+    with_directory_contents_completing_project_file(dict(), archivetest)
+
+
+def test_archive_and_unarchive_zip_with_compression_level():
+    _test_archive_and_unarchive("foo.zip", compression_level=1)
+
+
+@pytest.mark.parametrize('archive_basename', ['foo.zip', 'foo.tar.gz', 'foo.tar.bz2', 'foo.tar.zst', 'foo.tar'])
+def test_archive_status_has_count_size_and_md5(archive_basename):
+    (suffix, compression) = archiver._archive_format(archive_basename)
+    if parallel_compress.unavailable_reason(compression) is not None:
+        pytest.skip(parallel_compress.unavailable_reason(compression))
+
+    def archivetest(archive_dest_dir):
+        archivefile = os.path.join(archive_dest_dir, archive_basename)
+
+        def check(dirname):
+            project = project_no_dedicated_env(dirname)
+            status = archiver._archive_project(project, archivefile, reproducible=True, compute_md5=True)
+            assert status
+
+            with open(archivefile, 'rb') as f:
+                content = f.read()
+            assert len(content) == status.size
+            if suffix == '.zip':
+                assert status.md5 is None
+                with zipfile.ZipFile(archivefile, mode='r') as zf:
+                    assert len(zf.namelist()) == status.file_count
+            else:
+                assert hashlib.md5(content).digest() == status.md5
+                with archiver._open_tar(archivefile) as tf:
+                    assert len([member for member in tf]) == status.file_count
+            # manifest, project file, local project file, foo.py, a/b.py, emptydir
+            assert 6 == status.file_count
+
+            # only computed when asked for
+            status = project_ops.archive(project, archivefile)
+            assert status.md5 is None
+
+        with_directory_contents_completing_project_file(
+            {DEFAULT_PROJECT_FILENAME: """
+name: archivedproj
+    """,
+             "foo.py": "print('hello')\n",
+             "a/b.py": "",
+             "emptydir": None}, check)
+
+    with_directory_contents_completing_project_file(dict(), archivetest)
+
+
+def test_archive_zip_stores_precompressed_files():
+    def archivetest(archive_dest_dir):
+        archivefile = os.path.join(archive_dest_dir, "foo.zip")
+
+        def check(dirname):
+            project = project_no_dedicated_env(dirname)
+            status = project_ops.archive(project, archivefile)
+            assert status
+
+            with zipfile.ZipFile(archivefile, mode='r') as zf:
+                compress_types = dict((os.path.basename(zinfo.filename), zinfo.compress_type)
+                                      for zinfo in zf.infolist())
+                assert zf.read("archivedproj/data.csv.gz") == ("a,b,c\n" * 10000).encode('utf-8')
+            assert zipfile.ZIP_DEFLATED == compress_types['foo.py']
+            assert zipfile.ZIP_DEFLATED == compress_types['data.csv']
+            assert zipfile.ZIP_STORED == compress_types['data.csv.gz']
+
+        with_directory_contents_completing_project_file(
+            {DEFAULT_PROJECT_FILENAME: """
+name: archivedproj
+    """,
+             "foo.py": "print('hello')\n",
+             "data.csv": "a,b,c\n" * 10000,
+             "data.csv.gz": "a,b,c\n" * 10000}, check)
+
+    with_directory_contents_completing_project_file(dict(), archivetest)
+
+
+def test_archive_and_unarchive_tar_gz_with_compression_level():
+    _test_archive_and_unarchive("foo.tar.gz", compression_level=1)
+
+
+def test_archive_and_unarchive_tar_bz2_with_compression_level():
+    _test_archive_and_unarchive("foo.tar.bz2", compression_level=1)
+
+
+def test_archive_and_unarchive_tar_xz():
+    _test_archive_and_unarchive("foo.tar.xz")
+
+
+def test_archive_and_unarchive_tar_zst():
+    pytest.importorskip('zstandard')
+    _test_archive_and_unarchive("foo.tar.zst", compression_level=19)
+
+
+def test_archive_with_bad_compression_level():
+    def archivetest(archive_dest_dir):
+        def check(dirname):
+            project = project_no_dedicated_env(dirname)
+            for (basename, message) in [("foo.zip", "Compression level for zip must be between 0 and 9, not 10."),
+                                        ("foo.tar.gz", "Compression level for gz must be between 0 and 9, not 10."),
+                                        ("foo.tar.bz2", "Compression level for bz2 must be between 1 and 9, not 10."),
+                                        ("foo.tar.xz", "Compression level for xz must be between 0 and 9, not 10.")]:
+                archivefile = os.path.join(archive_dest_dir, basename)
+                status = project_ops.archive(project, archivefile, compression_level=10)
+
+                assert not status
+                assert not os.path.exists(archivefile)
+                assert status.status_description == "Can't create an archive."
+                assert status.errors == [message]
+
+            # compression level is ignored for formats we don't compress
+            archivefile = os.path.join(archive_dest_dir, "foo.tar")
+            status = project_ops.archive(project, archivefile, compression_level=10)
+            assert status
+
+        with_directory_contents_completing_project_file(
+            {DEFAULT_PROJECT_FILENAME: """
+name: archivedproj
+    """,
+             "foo.py": "print('hello')\n"}, check)
+
+    with_directory_contents_completing_project_file(dict(), archivetest)
+
+
+def _make_reproducible_archive_twice(archive_basename):
+    def archivetest(archive_dest_dir):
+        archivefile = os.path.join(archive_dest_dir, archive_basename)
+
+        def check(dirname):
+            project = project_no_dedicated_env(dirname)
+            status = project_ops.archive(project, archivefile, reproducible=True)
+            assert status
+            assert not status.unchanged
+            with open(archivefile, 'rb') as f:
+                first = f.read()
+
+            # different timestamps and permissions that don't matter
+            for name in ('foo.py', 'a/b/c/d.py', DEFAULT_PROJECT_FILENAME):
+                os.utime(os.path.join(dirname, name), (1234567890, 1234567890))
+            os.chmod(os.path.join(dirname, 'foo.py'), 0o600)
+            os.remove(archivefile)
+
+            status = project_ops.archive(project, archivefile, reproducible=True)
+            assert status
+            with open(archivefile, 'rb') as f:
+                second = f.read()
+            assert first == second
+
+            unpacked = os.path.join(archive_dest_dir, "unpacked")
+            status = project_ops.unarchive(archivefile, unpacked)
+            assert status
+            # what we unpacked is remembered, for applying deltas
+            _assert_dir_contains(unpacked, ['a/b/c/d.py', 'emptydir', 'foo.py', 'anaconda-project.yml',
+                                            'anaconda-project-local.yml', 'anaconda-project-manifest.json'])
+            with codecs.open(os.path.join(unpacked, 'anaconda-project-manifest.json'), 'r', 'utf-8') as f:
+                unpacked_manifest = json.load(f)
+            assert archiver._manifest_digest(archiver._read_archive_manifest(archivefile)) == \
+                archiver._manifest_digest(unpacked_manifest)
+            assert sorted(['a/b/c/d.py', 'foo.py', 'anaconda-project.yml', 'anaconda-project-local.yml']) == sorted(
+                unpacked_manifest['unpacked'])
+
+        with_directory_contents_completing_project_file(
+            {DEFAULT_PROJECT_FILENAME: """
+name: archivedproj
+    """,
+             "foo.py": "print('hello')\n",
+             "emptydir": None,
+             "a/b/c/d.py": ""}, check)
+
+    with_directory_contents_completing_project_file(dict(), archivetest)
+
+
+@pytest.mark.parametrize('archive_basename', ['foo.zip', 'foo.tar.gz', 'foo.tar.bz2', 'foo.tar.xz', 'foo.tar.zst',
+                                              'foo.tar'])
+def test_archive_reproducible(archive_basename):
+    (suffix, compression) = archiver._archive_format(archive_basename)
+    if parallel_compress.unavailable_reason(compression) is not None:
+        pytest.skip(parallel_compress.unavailable_reason(compression))
+    _make_reproducible_archive_twice(archive_basename)
+
+
+def test_archive_reproducible_zip_without_zipfile_internals(monkeypatch):
+    monkeypatch.setattr('anaconda_project.archiver._zip_append_works', None)
+    assert archiver._zip_can_append_compressed() == archiver._zip_can_write_stream
+
+    # internals that are missing
+    monkeypatch.setattr('anaconda_project.archiver._zip_append_works', None)
+    monkeypatch.setattr('anaconda_project.archiver._ZIP_INTERNALS', archiver._ZIP_INTERNALS + ('_not_there', ))
+    assert not archiver._zip_can_append_compressed()
+    monkeypatch.setattr('anaconda_project.archiver._ZIP_INTERNALS', archiver._ZIP_INTERNALS[:-1])
+
+    # or that don't do what we expect
+    def broken_append(zf, zinfo, compressed):
+        zf.fp.write(b'nonsense')
+
+    monkeypatch.setattr('anaconda_project.archiver._zip_append_works', None)
+    monkeypatch.setattr('anaconda_project.archiver._append_compressed_zip_member', broken_append)
+    assert not archiver._zip_can_append_compressed()
+
+    _make_reproducible_archive_twice('foo.zip')
+
+
+def test_archive_reproducible_manifest():
+    def archivetest(archive_dest_dir):
+        archivefile = os.path.join(archive_dest_dir, "foo.tar.gz")
+
+        def check(dirname):
+            os.chmod(os.path.join(dirname, 'run.sh'), 0o755)
+            project = project_no_dedicated_env(dirname)
+            status = project_ops.archive(project, archivefile, reproducible=True)
+            assert status
+
+            with tarfile.open(archivefile, mode='r') as tf:
+                members = tf.getmembers()
+                assert "archivedproj/anaconda-project-manifest.json" == members[0].name
+                for member in members:
+                    assert 0 == member.uid
+                    assert 0 == member.gid
+                    assert '' == member.uname
+                    assert archiver._REPRODUCIBLE_MTIME == member.mtime
+                modes = dict((os.path.basename(member.name), member.mode) for member in members)
+                assert 0o644 == modes['foo.py']
+                assert 0o755 == modes['run.sh']
+
+            manifest = archiver._read_archive_manifest(archivefile)
+            assert 'archivedproj' == manifest['name']
+            assert ['emptydir'] == manifest['directories']
+            assert dict(sha256=hashlib.sha256(b"print('hello')\n").hexdigest(),
+                        size=len("print('hello')\n"),
+                        executable=False) == manifest['files']['foo.py']
+            assert manifest['files']['run.sh']['executable']
+
+        with_directory_contents_completing_project_file(
+            {DEFAULT_PROJECT_FILENAME: """
+name: archivedproj
+    """,
+             "foo.py": "print('hello')\n",
+             "run.sh": "#!/bin/sh\n",
+             "emptydir": None}, check)
+
+    with_directory_contents_completing_project_file(dict(), archivetest)
+
+
+@pytest.mark.parametrize('archive_basename', ['foo.zip', 'foo.tar.bz2'])
+def test_archive_check_unchanged(archive_basename):
+    def archivetest(archive_dest_dir):
+        archivefile = os.path.join(archive_dest_dir, archive_basename)
+
+        def check(dirname):
+            project = project_no_dedicated_env(dirname)
+            # an ordinary archive has no manifest, so it's always replaced
+            status = project_ops.archive(project, archivefile)
+            assert status
+            assert archiver._read_archive_manifest(archivefile) is None
+            status = project_ops.archive(project, archivefile, check_unchanged=True)
+            assert status
+            assert not status.unchanged
+            assert ("Created project archive %s" % archivefile) == status.status_description
+
+            os.utime(archivefile, (1234567890, 1234567890))
+            status = project_ops.archive(project, archivefile, check_unchanged=True)
+            assert status
+            assert status.unchanged
+            assert ("Project archive %s is unchanged." % archivefile) == status.status_description
+            assert 1234567890 == os.path.getmtime(archivefile)
+
+            with open(os.path.join(dirname, "foo.py"), 'w') as f:
+                f.write("print('goodbye')\n")
+            status = project_ops.archive(project, archivefile, check_unchanged=True)
+            assert status
+            assert not status.unchanged
+            assert 1234567890 != os.path.getmtime(archivefile)
+
+        with_directory_contents_completing_project_file(
+            {DEFAULT_PROJECT_FILENAME: """
+name: archivedproj
+    """,
+             "foo.py": "print('hello')\n"}, check)
+
+    with_directory_contents_completing_project_file(dict(), archivetest)
+
+
+def _test_delta_archive(archive_basename, base_is_manifest=False):
+    def archivetest(archive_dest_dir):
+        basefile = os.path.join(archive_dest_dir, "base" + archive_basename)
+        deltafile = os.path.join(archive_dest_dir, "delta" + archive_basename)
+        unpacked = os.path.join(archive_dest_dir, "unpacked")
+
+        def check(dirname):
+            project = project_no_dedicated_env(dirname)
+            status = project_ops.archive(project, basefile, reproducible=True)
+            assert status
+            status = project_ops.unarchive(basefile, unpacked)
+            assert status
+            # something in the unpacked project we don't know about
+            os.makedirs(os.path.join(unpacked, "a", "envs"))
+
+            base = basefile
+            if base_is_manifest:
+                base = os.path.join(archive_dest_dir, "base-manifest.json")
+                with codecs.open(base, 'w', 'utf-8') as f:
+                    json.dump(archiver._read_archive_manifest(basefile), f)
+
+            with open(os.path.join(dirname, "foo.py"), 'w') as f:
+                f.write("print('goodbye')\n")
+            shutil.rmtree(os.path.join(dirname, "a"))
+            os.rmdir(os.path.join(dirname, "emptydir"))
+            with open(os.path.join(dirname, "emptydir"), 'w') as f:
+                f.write("now a file\n")
+            os.makedirs(os.path.join(dirname, "new", "emptydir"))
+
+            status = project_ops.archive(project, deltafile, base=base)
+            assert status.errors == []
+            assert status
+
+            manifest = archiver._read_archive_manifest(deltafile)
+            assert ['a/b/c/d.py', 'a/b/c/e.py', 'emptydir'] == manifest['delta']['deleted']
+            # the manifest still describes the whole project
+            assert ['bar.py', 'emptydir', 'foo.py'
+                    ] == sorted([path for path in manifest['files'] if path.endswith('.py') or path == 'emptydir'])
+            assert ['new/emptydir'] == manifest['directories']
+
+            # a change the size check can't see, to a file the delta doesn't touch
+            with open(os.path.join(unpacked, "bar.py"), 'w') as f:
+                f.write("print('baz')\n")
+            status = project_ops.unarchive(deltafile, unpacked)
+            assert not status
+            assert [("Directory '%s' doesn't match the base of the delta archive: bar.py has changed." %
+                     os.path.realpath(unpacked))] == status.errors
+            with codecs.open(os.path.join(unpacked, 'foo.py'), 'r', 'utf-8') as f:
+                assert "print('hello')\n" == f.read()
+            with open(os.path.join(unpacked, "bar.py"), 'w') as f:
+                f.write("print('bar')\n")
+
+            status = project_ops.unarchive(deltafile, unpacked)
+            assert status.errors == []
+            assert status
+            assert ("Delta archive applied to %s." % os.path.realpath(unpacked)) == status.status_description
+            _assert_dir_contains(unpacked,
+                                 ['a/envs', 'bar.py', 'emptydir', 'foo.py', 'new/emptydir', 'anaconda-project.yml',
+                                  'anaconda-project-local.yml', 'anaconda-project-manifest.json'])
+            with codecs.open(os.path.join(unpacked, 'foo.py'), 'r', 'utf-8') as f:
+                assert "print('goodbye')\n" == f.read()
+
+            # now the delta is already applied, so the unpacked project doesn't match its base
+            status = project_ops.unarchive(deltafile, unpacked)
+            assert not status
+            assert [("Directory '%s' was unpacked from a different archive than the base of the delta archive." %
+                     os.path.realpath(unpacked))] == status.errors
+
+            # without the manifest we check every file
+            os.remove(os.path.join(unpacked, "anaconda-project-manifest.json"))
+            os.remove(os.path.join(unpacked, "bar.py"))
+            status = project_ops.unarchive(deltafile, unpacked)
+            assert not status
+            assert [("Directory '%s' doesn't match the base of the delta archive: bar.py is missing." %
+                     os.path.realpath(unpacked))] == status.errors
+
+        with_directory_contents_completing_project_file(
+            {DEFAULT_PROJECT_FILENAME: """
+name: archivedproj
+    """,
+             "foo.py": "print('hello')\n",
+             "bar.py": "print('bar')\n",
+             "emptydir": None,
+             "a/b/c/d.py": "",
+             "a/b/c/e.py": ""}, check)
+
+    with_directory_contents_completing_project_file(dict(), archivetest)
+
+
+def test_delta_archive_zip():
+    _test_delta_archive(".zip")
+
+
+def test_delta_archive_tar_gz():
+    _test_delta_archive(".tar.gz")
+
+
+def test_delta_archive_from_manifest():
+    _test_delta_archive(".tar.bz2", base_is_manifest=True)
+
+
+def test_delta_archive_failing_partway_leaves_directory_alone(monkeypatch):
+    def archivetest(archive_dest_dir):
+        basefile = os.path.join(archive_dest_dir, "base.zip")
+        deltafile = os.path.join(archive_dest_dir, "delta.zip")
+        unpacked = os.path.join(archive_dest_dir, "unpacked")
+
+        def check(dirname):
+            project = project_no_dedicated_env(dirname)
+            assert project_ops.archive(project, basefile, reproducible=True)
+            assert project_ops.unarchive(basefile, unpacked)
+
+            for name in ("foo.py", "bar.py"):
+                with open(os.path.join(dirname, name), 'w') as f:
+                    f.write("print('goodbye')\n")
+            os.remove(os.path.join(dirname, "baz.py"))
+            assert project_ops.archive(project, deltafile, base=basefile)
+
+            real_extract_zip_member = archiver._extract_zip_member
+
+            def mock_extract_zip_member(zf, zinfo, dest):
+                if zinfo.filename.endswith("foo.py"):
+                    raise IOError("disk full")
+                real_extract_zip_member(zf, zinfo, dest)
+
+            monkeypatch.setattr('anaconda_project.archiver._extract_zip_member', mock_extract_zip_member)
+
+            status = project_ops.unarchive(deltafile, unpacked)
+            assert not status
+            assert ["disk full"] == status.errors
+            _assert_dir_contains(unpacked, ['bar.py', 'baz.py', 'foo.py', 'anaconda-project.yml',
+                                            'anaconda-project-local.yml', 'anaconda-project-manifest.json'])
+            for name in ("foo.py", "bar.py"):
+                with codecs.open(os.path.join(unpacked, name), 'r', 'utf-8') as f:
+                    assert "print('hello')\n" == f.read()
+
+        with_directory_contents_completing_project_file(
+            {DEFAULT_PROJECT_FILENAME: """
+name: archivedproj
+    """,
+             "foo.py": "print('hello')\n",
+             "bar.py": "print('hello')\n",
+             "baz.py": "print('hello')\n"}, check)
+
+    with_directory_contents_completing_project_file(dict(), archivetest)
+
+
+def test_delta_archive_onto_wrong_base(monkeypatch):
+    def archivetest(archive_dest_dir):
+        oldfile = os.path.join(archive_dest_dir, "old.zip")
+        basefile = os.path.join(archive_dest_dir, "base.zip")
+        deltafile = os.path.join(archive_dest_dir, "delta.zip")
+        old_unpacked = os.path.join(archive_dest_dir, "old_unpacked")
+        unpacked = os.path.join(archive_dest_dir, "unpacked")
+
+        def check(dirname):
+            project = project_no_dedicated_env(dirname)
+            assert project_ops.archive(project, oldfile, reproducible=True)
+            assert project_ops.unarchive(oldfile, old_unpacked)
+            with open(os.path.join(dirname, "foo.py"), 'w') as f:
+                f.write("print('hi')\n")
+            assert project_ops.archive(project, basefile, reproducible=True)
+            assert project_ops.unarchive(basefile, unpacked)
+            with open(os.path.join(dirname, "foo.py"), 'w') as f:
+                f.write("print('goodbye')\n")
+            assert project_ops.archive(project, deltafile, base=basefile)
+
+            def mock_hash_file(full_path):
+                raise AssertionError("should not hash %s" % full_path)
+
+            monkeypatch.setattr('anaconda_project.archiver._hash_file', mock_hash_file)
+
+            # the delta only touches foo.py, which is all that differs
+            # between the two bases, so the files alone look fine
+            status = project_ops.unarchive(deltafile, old_unpacked)
+            assert not status
+            assert [("Directory '%s' was unpacked from a different archive than the base of the delta archive." %
+                     os.path.realpath(old_unpacked))] == status.errors
+            with codecs.open(os.path.join(old_unpacked, 'foo.py'), 'r', 'utf-8') as f:
+                assert "print('hello')\n" == f.read()
+
+            # untouched files from the right base aren't hashed
+            status = project_ops.unarchive(deltafile, unpacked)
+            assert status.errors == []
+            assert status
+            with codecs.open(os.path.join(unpacked, 'foo.py'), 'r', 'utf-8') as f:
+                assert "print('goodbye')\n" == f.read()
+
+        with_directory_contents_completing_project_file(
+            {DEFAULT_PROJECT_FILENAME: """
+name: archivedproj
+    """,
+             "foo.py": "print('hello')\n",
+             "bar.py": "print('bar')\n"}, check)
+
+    with_directory_contents_completing_project_file(dict(), archivetest)
+
+
+def test_delta_archive_with_bad_base():
+    def archivetest(archive_dest_dir):
+        archivefile = os.path.join(archive_dest_dir, "foo.zip")
+        basefile = os.path.join(archive_dest_dir, "base.zip")
+
+        def check(dirname):
+            project = project_no_dedicated_env(dirname)
+            status = project_ops.archive(project, basefile)
+            assert status
+
+            for base in (basefile, os.path.join(archive_dest_dir, "nope.json")):
+                status = project_ops.archive(project, archivefile, base=base)
+                assert not status
+                assert "Can't create an archive." == status.status_description
+                assert [("%s is not a reproducible project archive or a manifest." % base)] == status.errors
+                assert not os.path.exists(archivefile)
+
+        with_directory_contents_completing_project_file({"foo.py": "print('hello')\n"}, check)
+
+    with_directory_contents_completing_project_file(dict(), archivetest)
+
+
+def test_apply_delta_archive_to_missing_directory():
+    def archivetest(archive_dest_dir):
+        basefile = os.path.join(archive_dest_dir, "base.zip")
+        deltafile = os.path.join(archive_dest_dir, "delta.zip")
+
+        def check(dirname):
+            project = project_no_dedicated_env(dirname)
+            assert project_ops.archive(project, basefile, reproducible=True)
+            assert project_ops.archive(project, deltafile, base=basefile)
+
+            unpacked = os.path.join(archive_dest_dir, "unpacked")
+            status = project_ops.unarchive(deltafile, unpacked)
+            assert not status
+            assert ("Could not apply delta archive %s" % deltafile) == status.status_description
+            assert [("Directory '%s' does not exist, so there's nothing to apply a delta archive to." %
+                     os.path.realpath(unpacked))] == status.errors
+
+        with_directory_contents_completing_project_file({"foo.py": "print('hello')\n"}, check)
+
+    with_directory_contents_completing_project_file(dict(), archivetest)
+
+
+def test_archive_reproducible_cannot_read_file(monkeypatch):
+    def archivetest(archive_dest_dir):
+        archivefile = os.path.join(archive_dest_dir, "foo.zip")
+
+        def check(dirname):
+            def mock_hash_file(full_path):
+                raise IOError("NOPE")
+
+            monkeypatch.setattr('anaconda_project.archiver._hash_file', mock_hash_file)
+            project = project_no_dedicated_env(dirname)
+            status = project_ops.archive(project, archivefile, reproducible=True)
+            assert not status
+            assert "Failed to read files in the project." == status.status_description
+            assert ["NOPE"] == status.errors
+            assert not os.path.exists(archivefile)
+
+        with_directory_contents_completing_project_file({"foo.py": "print('hello')\n"}, check)
+
+    with_directory_contents_completing_project_file(dict(), archivetest)
+
+
 def test_archive_cannot_write_destination_path(monkeypatch):
     def archivetest(archive_dest_dir):
         archivefile = os.path.join(archive_dest_dir, "foo.zip")
@@ -3879,7 +4509,7 @@ def test_archive_zip_with_failing_git_command(monkeypatch):
             assert not status
             assert not os.path.exists(archivefile)
             # before the "." is the command output, but "false" has no output.
-            assert status.errors == ["'git ls-files' failed to list ignored files: ."]
+            assert status.errors == ["'git ls-files' failed to list project files: ."]
 
         with_directory_contents_completing_project_file(
             _add_empty_git({DEFAULT_PROJECT_FILENAME: """
@@ -3935,10 +4565,10 @@ def test_archive_zip_with_inability_to_walk_directory(monkeypatch):
             project = project_no_dedicated_env(dirname)
             assert project.problems == []
 
-            def mock_os_walk(dirname):
+            def mock_scandir(dirname):
                 raise OSError("NOPE")
 
-            monkeypatch.setattr('os.walk', mock_os_walk)
+            monkeypatch.setattr('anaconda_project.archiver._scandir', mock_scandir)
 
             status = project_ops.archive(project, archivefile)
 
@@ -3948,6 +4578,40 @@ def test_archive_zip_with_inability_to_walk_directory(monkeypatch):
             assert len(status.errors) > 0
             assert status.errors[0].startswith("Could not list files in")
 
+        with_directory_contents_completing_project_file(
+            {DEFAULT_PROJECT_FILENAME: """
+name: archivedproj
+        """,
+             "foo.py": "print('hello')\n"}, check)
+
+    with_directory_contents_completing_project_file(dict(), archivetest)
+
+
+def test_archive_zip_with_inability_to_stat_git_file(monkeypatch):
+    def archivetest(archive_dest_dir):
+        archivefile = os.path.join(archive_dest_dir, "foo.zip")
+
+        def check(dirname):
+            project = project_no_dedicated_env(dirname)
+            assert project.problems == []
+
+            real_lstat = os.lstat
+
+            # shutil.rmtree() uses lstat too, with dir_fd on newer Pythons
+            def mock_lstat(path, *args, **kwargs):
+                if path.endswith("foo.py"):
+                    raise OSError(errno.EACCES, "NOPE")
+                return real_lstat(path, *args, **kwargs)
+
+            monkeypatch.setattr('os.lstat', mock_lstat)
+
+            status = project_ops.archive(project, archivefile)
+
+            assert not status
+            assert not os.path.exists(archivefile)
+            assert status.status_description == "Failed to list files in the project."
+            assert status.errors[0].startswith("Could not list files in")
+
         with_directory_contents_completing_project_file(
             _add_empty_git({DEFAULT_PROJECT_FILENAME: """
 name: archivedproj
@@ -4008,7 +4672,8 @@ def test_archive_with_bogus_filename(monkeypatch):
 
             assert not status
             assert not os.path.exists(archivefile)
-            assert status.status_description == "Project archive filename must be a .zip, .tar.gz, or .tar.bz2."
+            assert status.status_description == ("Project archive filename must be a .zip, .tar.gz, .tar.bz2, .tar.xz, "
+                                                 "or .tar.zst.")
             assert status.errors == ["Unsupported archive filename %s." % archivefile]
 
         with_directory_contents_completing_project_file(
@@ -4179,6 +4844,11 @@ def _make_tar(archive_dest_dir, contents, compression=None):
     elif compression == 'bz2':
         mode = mode + ':bz2'
         extension = extension + '.bz2'
+    elif compression == 'xz':
+        mode = mode + ':xz'
+        extension = extension + '.xz'
+    elif compression == 'zst':
+        extension = extension + '.zst'
 
     # the tarfile API only lets us put in files, so we need
     # files to put in
@@ -4192,7 +4862,8 @@ def _make_tar(archive_dest_dir, contents, compression=None):
         os.symlink("/somewhere", a_symlink)
 
     archivefile = os.path.join(archive_dest_dir, "foo" + extension)
-    with tarfile.open(archivefile, mode) as tf:
+
+    def add_contents(tf):
         for (key, what) in contents.items():
             t = tarfile.TarInfo(key)
             if what is _CONTENTS_DIR:
@@ -4203,6 +4874,15 @@ def _make_tar(archive_dest_dir, contents, compression=None):
                 t.type = tarfile.SYMTYPE
             tf.addfile(t)
 
+    if compression == 'zst':
+        with open(archivefile, 'wb') as raw:
+            with parallel_compress.ParallelCompressedFile(raw, 'zst') as compressed:
+                with tarfile.open(fileobj=compressed, mode='w|') as tf:
+                    add_contents(tf)
+    else:
+        with tarfile.open(archivefile, mode) as tf:
+            add_contents(tf)
+
     os.remove(a_file)
     os.rmdir(a_directory)
     if os.path.exists(a_symlink):
@@ -4250,6 +4930,15 @@ def test_unarchive_tar_bz2():
     _test_unarchive_tar(compression='bz2')
 
 
+def test_unarchive_tar_xz():
+    _test_unarchive_tar(compression='xz')
+
+
+def test_unarchive_tar_zst():
+    pytest.importorskip('zstandard')
+    _test_unarchive_tar(compression='zst')
+
+
 def test_unarchive_zip():
     def archivetest(archive_dest_dir):
         archivefile = _make_zip(archive_dest_dir, {'a/a.txt': _CONTENTS_FILE,
@@ -4403,7 +5092,8 @@ def test_unarchive_error_on_bad_extension():
             unpacked = os.path.join(dirname, "foo")
             status = project_ops.unarchive(archivefile, unpacked)
 
-            message = "Unsupported archive filename %s, must be a .zip, .tar.gz, or .tar.bz2" % archivefile
+            message = ("Unsupported archive filename %s, must be a .zip, .tar.gz, .tar.bz2, .tar.xz, or .tar.zst" %
+                       archivefile)
             assert status.errors == [message]
             assert not status
             assert not os.path.isdir(unpacked)
@@ -4453,6 +5143,64 @@ def test_unarchive_error_on_corrupt_tar():
     with_directory_contents(dict(), archivetest)
 
 
+def test_unarchive_error_on_corrupt_tar_zst():
+    pytest.importorskip('zstandard')
+    import zstandard
+
+    def archivetest(archive_dest_dir):
+        archivefile = os.path.join(archive_dest_dir, "foo.tar.zst")
+        # a good frame header followed by garbage
+        data = zstandard.ZstdCompressor().compress(b"x" * 100000)
+        with open(archivefile, 'wb') as f:
+            f.write(data[:20] + (b"\0" * 50) + data[70:])
+
+        def check(dirname):
+            unpacked = os.path.join(dirname, "foo")
+            status = project_ops.unarchive(archivefile, unpacked)
+
+            assert status.errors == ["file could not be opened successfully"]
+            assert not status
+            assert not os.path.isdir(unpacked)
+
+        with_directory_contents(dict(), check)
+
+    with_directory_contents(dict(), archivetest)
+
+
+def test_unarchive_error_on_corrupt_tar_zst_member():
+    pytest.importorskip('zstandard')
+    import zstandard
+
+    def archivetest(archive_dest_dir):
+        archivefile = os.path.join(archive_dest_dir, "foo.tar.zst")
+        tar_bytes = io.BytesIO()
+        with tarfile.open(fileobj=tar_bytes, mode='w') as tf:
+            for name in ("foo/anaconda-project.yml", "foo/big.txt"):
+                content = b"name: foo\n" if name.endswith(".yml") else (b"hello" * 200000)
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                tf.addfile(info, io.BytesIO(content))
+        # two frames; the second one, holding most of big.txt, is corrupt
+        tar_data = tar_bytes.getvalue()
+        first = zstandard.ZstdCompressor().compress(tar_data[:256 * 1024])
+        second = zstandard.ZstdCompressor().compress(tar_data[256 * 1024:])
+        with open(archivefile, 'wb') as f:
+            f.write(first + second[:20] + (b"\0" * 50) + second[70:])
+
+        def check(dirname):
+            unpacked = os.path.join(dirname, "foo")
+            status = project_ops.unarchive(archivefile, unpacked)
+
+            assert not status
+            assert 1 == len(status.errors)
+            assert status.errors[0].startswith("zstd: ")
+            assert not os.path.isdir(unpacked)
+
+        with_directory_contents(dict(), check)
+
+    with_directory_contents(dict(), archivetest)
+
+
 def test_unarchive_error_on_nonexistent_tar():
     def archivetest(archive_dest_dir):
         archivefile = os.path.join(archive_dest_dir, "foo.tar")
@@ -4796,6 +5544,61 @@ def test_upload(monkeypatch):
          "foo.py": "print('hello')\n"}, check)
 
 
+def test_upload_unchanged_project_reuses_archive(monkeypatch):
+    def check(dirname):
+        with fake_server(monkeypatch, expected_basename='foo.tar.bz2'):
+            project = project_no_dedicated_env(dirname)
+            assert [] == project.problems
+
+            written = []
+            real_write_tar = archiver._write_tar
+
+            def counting_write_tar(*args, **kwargs):
+                written.append(args[2])
+                return real_write_tar(*args, **kwargs)
+
+            monkeypatch.setattr('anaconda_project.archiver._write_tar', counting_write_tar)
+
+            status = project_ops.upload(project, site='unit_test')
+            assert status
+            assert len(written) == 1
+
+            status = project_ops.upload(project, site='unit_test')
+            assert status
+            assert status.url == 'http://example.com/whatevs'
+            assert len(written) == 1
+
+            with codecs.open(os.path.join(dirname, "foo.py"), 'w', 'utf-8') as f:
+                f.write("print('changed')\n")
+
+            status = project_ops.upload(project, site='unit_test')
+            assert status
+            assert len(written) == 2
+
+    with_directory_contents_completing_project_file(
+        {DEFAULT_PROJECT_FILENAME: "name: foo\n",
+         "foo.py": "print('hello')\n"}, check)
+
+
+def test_upload_cannot_create_archive_directory(monkeypatch):
+    def check(dirname):
+        project = project_no_dedicated_env(dirname)
+        assert [] == project.problems
+
+        def mock_makedirs(path):
+            raise OSError("NOPE")
+
+        monkeypatch.setattr('anaconda_project.project_ops.makedirs_ok_if_exists', mock_makedirs)
+
+        status = project_ops.upload(project, site='unit_test')
+        assert not status
+        assert status.errors == ["NOPE"]
+
+    with_directory_contents_completing_project_file(
+        {DEFAULT_PROJECT_FILENAME: "name: foo\n",
+         "foo.py": "print('hello')\n"}, check)
+
+
 def test_upload_with_project_file_problems():
     def check(dirname):
         project = Project(dirname, frontend=FakeFrontend())
@@ -4812,10 +5615,10 @@ def test_upload_cannot_walk_directory(monkeypatch):
         project = project_no_dedicated_env(dirname)
         assert [] == project.problems
 
-        def mock_os_walk(dirname):
+        def mock_scandir(dirname):
             raise OSError("NOPE")
 
-        monkeypatch.setattr('os.walk', mock_os_walk)
+        monkeypatch.setattr('anaconda_project.archiver._scandir', mock_scandir)
 
         status = project_ops.upload(project, site='unit_test')
         assert not status
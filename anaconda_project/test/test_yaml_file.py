@@ -5,7 +5,7 @@
 # Licensed under the terms of the BSD 3-Clause License.
 # The full license is in the file LICENSE.txt, distributed with this software.
 # -----------------------------------------------------------------------------
-from anaconda_project.yaml_file import YamlFile
+from anaconda_project.yaml_file import YamlFile, _load_string
 from anaconda_project.internal.test.tmpfile_utils import with_file_contents, with_directory_contents
 
 import errno
@@ -400,7 +400,7 @@ e:
 
     def check_roundtrip(filename):
         yaml = YamlFile(filename)
-        yaml._previous_content = "not the actual previous content"
+        yaml._previous_hash = "not the actual previous hash"
         yaml.save()
         new_content = open(filename, 'r').read()
         print("the re-saved version of the file was:")
@@ -499,3 +499,96 @@ def test_read_yaml_file_and_set_get_empty_string():
         assert value == ' '
 
     with_file_contents("", check)
+
+
+def test_read_only_yaml_file_parses_lazily(monkeypatch):
+    original_content = """
+# comment in front of a
+a:
+  b: c
+list: [1, 2]
+"""
+
+    def check_lazy(dirname):
+        filename = os.path.join(dirname, "foo.yaml")
+        loads = []
+
+        def mock_load_string(contents):
+            loads.append(contents)
+            return _load_string(contents)
+
+        monkeypatch.setattr('anaconda_project.yaml_file._load_string', mock_load_string)
+
+        yaml = YamlFile(filename, read_only=True)
+        assert [] == loads
+        assert yaml._unparsed_contents is not None
+        assert not yaml.corrupted
+        assert "c" == yaml.get_value(["a", "b"])
+        assert [1, 2] == yaml.get_value("list")
+        assert ['a', 'list'] == list(yaml.root.keys())
+        assert not yaml.has_unsaved_changes
+        yaml.save()
+        assert [] == loads
+
+        # a file that isn't read-only is parsed right away
+        assert YamlFile(filename)._unparsed_contents is None
+        assert 1 == len(loads)
+
+        # setting a value parses the file for real, keeping the comments
+        yaml.set_value(["a", "d"], "e")
+        assert yaml._unparsed_contents is None
+        assert yaml.has_unsaved_changes
+        yaml.save()
+        assert not yaml.has_unsaved_changes
+        assert "# comment in front of a" in open(filename, 'r').read()
+
+        yaml = YamlFile(filename, read_only=True)
+        assert "e" == yaml.get_value(["a", "d"])
+        yaml.unset_value(["a", "d"])
+        assert yaml._unparsed_contents is None
+        assert dict(b='c') == yaml.get_value("a")
+
+    with_directory_contents({"foo.yaml": original_content}, check_lazy)
+
+
+def test_read_only_yaml_file_plain_values():
+    def check_plain(dirname):
+        filename = os.path.join(dirname, "foo.yaml")
+        yaml = YamlFile(filename, read_only=True)
+        assert yaml._unparsed_contents is not None
+        assert not yaml.corrupted
+        assert "x" == yaml.get_value([1])
+        assert ['a', 1, 'b'] == list(yaml.root.keys())
+
+    with_directory_contents({"foo.yaml": "a: 2017-01-01\n1: x\nb: 1e3\n"}, check_plain)
+
+
+def test_read_only_yaml_file_falls_back_to_round_trip():
+    def check_fallback(dirname):
+        # the safe loader won't do duplicate keys but the round-trip loader keeps the first
+        yaml = YamlFile(os.path.join(dirname, "dup.yaml"), read_only=True)
+        assert yaml._unparsed_contents is None
+        assert not yaml.corrupted
+        assert 1 == yaml.get_value("a")
+
+        yaml = YamlFile(os.path.join(dirname, "broken.yaml"), read_only=True)
+        assert yaml.corrupted
+        assert yaml.corrupted_maybe_line is not None
+
+    with_directory_contents({"dup.yaml": "a: 1\na: 2\n", "broken.yaml": "a: [\n"}, check_fallback)
+
+
+def test_save_hand_edited_file_only_if_changed():
+    def check(filename):
+        yaml = YamlFile(filename)
+        # our round-tripping isn't perfect, but that isn't a change
+        assert not yaml.has_unsaved_changes
+        yaml.set_value("a", 1)
+        assert not yaml.has_unsaved_changes
+        yaml.set_value("a", 2)
+        assert yaml.has_unsaved_changes
+        yaml.save()
+        assert 2 == yaml.change_count
+        assert not yaml.has_unsaved_changes
+
+    with_file_contents("\n\na:    1\n\n\n", check)
@@ -27,10 +27,13 @@ except ImportError:  # pragma: no cover
     from ruamel.yaml.comments import CommentedSeq  # pragma: no cover
 
 import codecs
+import collections
 import errno
+import hashlib
 import os
 import sys
 import uuid
+import warnings
 
 from anaconda_project.internal.makedirs import makedirs_ok_if_exists
 from anaconda_project.internal.rename import rename_over_existing
@@ -41,6 +44,33 @@ _YAMLError = YAMLError
 _CommentedMap = CommentedMap
 _CommentedSeq = CommentedSeq
 
+# libyaml's parser is much faster than the pure-Python one, if we have it
+_SafeLoaderBase = getattr(ryaml, 'CSafeLoader', ryaml.SafeLoader)
+
+
+class _OrderedSafeLoader(_SafeLoaderBase):
+    """Safe loader for plain values, keeping the order of mappings."""
+
+
+def _construct_ordered_mapping(loader, node):
+    data = collections.OrderedDict()
+    yield data
+    loader.flatten_mapping(node)
+    for (key_node, value_node) in node.value:
+        key = loader.construct_object(key_node, deep=True)
+        try:
+            duplicate = key in data
+        except TypeError:
+            duplicate = True
+        if duplicate:
+            # the round-trip loader has its own ideas about these
+            raise ryaml.constructor.ConstructorError("while constructing a mapping", node.start_mark,
+                                                     "found a duplicate or unhashable key", key_node.start_mark)
+        data[key] = loader.construct_object(value_node, deep=True)
+
+
+_OrderedSafeLoader.add_constructor('tag:yaml.org,2002:map', _construct_ordered_mapping)
+
 
 def _atomic_replace(path, contents, encoding='utf-8'):
     tmp = path + ".tmp-" + str(uuid.uuid4())
@@ -69,6 +99,21 @@ def _load_string(contents):
         return ryaml.load(contents, Loader=ryaml.RoundTripLoader)
 
 
+def _load_plain_string(contents):
+    """Load plain dicts and lists, without the comments and formatting _load_string() keeps."""
+    if contents.strip() == '':
+        return {}
+    else:
+        with warnings.catch_warnings():
+            # the safe loader warns about some things the round-trip one doesn't
+            warnings.simplefilter('ignore')
+            return ryaml.load(contents, Loader=_OrderedSafeLoader)
+
+
+def _content_hash(contents):
+    return hashlib.sha256(contents.encode('utf-8')).hexdigest()
+
+
 def _dump_string(yaml):
     return ryaml.dump(yaml, Dumper=ryaml.RoundTripDumper)
 
@@ -115,7 +160,7 @@ class YamlFile(object):
 
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, read_only=False):
         """Load a YamlFile with the given filename.
 
         Raises an exception on an IOError, but if the file is
@@ -127,9 +172,16 @@ class YamlFile(object):
         and attempts to modify the file will raise an
         exception.
 
+        If ``read_only`` is True, the file is loaded as plain dicts
+        and lists without the comments and formatting, using a fast
+        safe loader. The file is only parsed for real on the
+        first ``set_value()`` or ``unset_value()``, so changes made
+        to the values from ``get_value()`` or ``root`` in place
+        are lost; only use ``read_only`` if you won't make any.
+
         """
         self.filename = filename
-        self._previous_content = ""
+        self._read_only = read_only
         self._change_count = 0
         self.load()
 
@@ -150,17 +202,19 @@ class YamlFile(object):
         self._corrupted_maybe_column = None
         self._change_count = self._change_count + 1
 
+        # contents we've only loaded as plain values, if any
+        self._unparsed_contents = None
+        # a missing file is saved even if we don't change it
+        self._previous_hash = _content_hash("")
+        self._loaded_contents = None
+
         try:
             with codecs.open(self.filename, 'r', 'utf-8') as file:
                 contents = file.read()
-            self._yaml = _load_string(contents)
-
-            # we re-dump instead of using "contents" because
-            # when loading a hand-edited file, we may reformat
-            # in trivial ways because our round-tripping isn't perfect,
-            # and we don't want to count those trivial reformats as
-            # a reason to save.
-            self._previous_content = _dump_string(self._yaml)
+            if self._read_only:
+                self._load_plain(contents)
+            else:
+                self._parse(contents)
         except IOError as e:
             if e.errno == errno.ENOENT:
                 self._yaml = None
@@ -191,7 +245,48 @@ class YamlFile(object):
                 _block_style_all_nodes(self._yaml)
                 if not self._save_default_content():
                     # pretend we already saved
-                    self._previous_content = _dump_string(self._yaml)
+                    self._previous_hash = _content_hash(_dump_string(self._yaml))
+
+    def _load_plain(self, contents):
+        try:
+            plain = _load_plain_string(contents)
+        except YAMLError:
+            # let the round-trip loader decide whether it's
+            # corrupted, and say how
+            self._parse(contents)
+            return
+        self._yaml = plain
+        self._unparsed_contents = contents
+
+    def _parse(self, contents):
+        self._yaml = _load_string(contents)
+        # we don't know what we'd save if nothing changed until
+        # we need to (see _same_as_saved())
+        self._previous_hash = None
+        self._loaded_contents = contents
+
+    def _same_as_saved(self, contents):
+        new_hash = _content_hash(contents)
+        if self._previous_hash is None:
+            if contents == self._loaded_contents:
+                # the file is already what we'd save
+                self._previous_hash = new_hash
+            else:
+                # we re-dump instead of using the loaded contents because
+                # when loading a hand-edited file, we may reformat
+                # in trivial ways because our round-tripping isn't perfect,
+                # and we don't want to count those trivial reformats as
+                # a reason to save.
+                self._previous_hash = _content_hash(_dump_string(_load_string(self._loaded_contents)))
+            self._loaded_contents = None
+        return new_hash == self._previous_hash
+
+    def _parse_if_unparsed(self):
+        # before we modify plain values, swap in the real thing,
+        # comments and all
+        if self._unparsed_contents is not None:
+            self._parse(self._unparsed_contents)
+            self._unparsed_contents = None
 
     def _default_comment(self):
         return "yaml file"
@@ -271,8 +366,11 @@ class YamlFile(object):
     @property
     def has_unsaved_changes(self):
         """Get whether changes are all saved."""
+        if self._unparsed_contents is not None:
+            # nothing has been set since we loaded
+            return False
         # this is a fairly expensive check
-        return self._previous_content != _dump_string(self._yaml)
+        return not self._same_as_saved(_dump_string(self._yaml))
 
     def use_changes_without_saving(self):
         """Apply any in-memory changes as if we'd saved, but don't actually save.
@@ -292,11 +390,15 @@ class YamlFile(object):
         """
         self._throw_if_corrupted()
 
+        if self._unparsed_contents is not None:
+            # nothing has been set since we loaded
+            return
+
         contents = _dump_string(self._yaml)
-        if contents != self._previous_content:
+        if not self._same_as_saved(contents):
             _save_file(self._yaml, self.filename, contents)
             self._change_count = self._change_count + 1
-            self._previous_content = contents
+            self._previous_hash = _content_hash(contents)
 
     @classmethod
     def _path(cls, path):
@@ -343,6 +445,7 @@ class YamlFile(object):
             value: any YAML-compatible value type
         """
         self._throw_if_corrupted()
+        self._parse_if_unparsed()
 
         path = self._path(path)
         existing = self._ensure_dicts_at_path(path[:-1])
@@ -357,6 +460,7 @@ class YamlFile(object):
             path (str or list of str): single key, or list of nested keys
         """
         self._throw_if_corrupted()
+        self._parse_if_unparsed()
 
         path = self._path(path)
 
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Time importing the anaconda-project command line tool, and fail if it got slower.
+
+Run from the top of the source tree:
+
+    python benchmarks/cli_startup.py --max-ms 200
+
+Each run imports the CLI in a fresh interpreter with ``-X importtime``
+(Python 3.7 and later; older Pythons time the import themselves) and
+reports the modules that took longest. It exits with status 1 if the
+fastest run took more than ``--max-ms``, or if the import pulled in
+a library that only some subcommands need.
+"""
+from __future__ import absolute_import, print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CLI_MODULE = 'anaconda_project.internal.cli.main'
+
+# subcommands that need these import them when they run
+_DEFERRED_LIBRARIES = ('binstar_client', 'keyring', 'requests', 'ruamel_yaml', 'ruamel.yaml', 'tornado')
+
+_CHILD_SCRIPT = """
+import json, sys, time
+start = time.time()
+import %s
+elapsed = time.time() - start
+print(json.dumps(dict(elapsed=elapsed, modules=sorted(sys.modules.keys()))))
+""" % _CLI_MODULE
+
+
+def _supports_importtime():
+    return sys.version_info >= (3, 7)
+
+
+def _parse_importtime(stderr):
+    """Get a list of (self_us, cumulative_us, module) from -X importtime output."""
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        try:
+            timings.append((int(fields[0]), int(fields[1]), fields[2].strip()))
+        except ValueError:
+            # the header line
+            continue
+    return timings
+
+
+def _run_once():
+    command = [sys.executable]
+    if _supports_importtime():
+        command.extend(['-X', 'importtime'])
+    command.extend(['-c', _CHILD_SCRIPT])
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join([_ROOT] + [p for p in [env.get('PYTHONPATH')] if p])
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, cwd=_ROOT)
+    (out, err) = process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError("Importing %s failed:\n%s" % (_CLI_MODULE, err.decode('utf-8', 'replace')))
+    result = json.loads(out.decode('utf-8').strip().splitlines()[-1])
+    timings = _parse_importtime(err.decode('utf-8', 'replace'))
+    for (self_us, cumulative_us, module) in timings:
+        if module == _CLI_MODULE:
+            # more precise, and doesn't count the timer itself
+            result['elapsed'] = cumulative_us / 1000000.0
+    result['timings'] = timings
+    return result
+
+
+def _deferred_libraries_imported(modules):
+    return sorted(set([library
+                       for library in _DEFERRED_LIBRARIES for module in modules
+                       if module == library or module.startswith(library + ".")]))
+
+
+def main(argv):
+    """Run the benchmark, returning an exit code."""
+    parser = argparse.ArgumentParser(description="Benchmark and check the import time of the command line tool.")
+    parser.add_argument('--runs', type=int, default=5, help="number of fresh interpreters to time")
+    parser.add_argument('--max-ms', type=float, default=None, help="fail if the fastest import takes longer")
+    parser.add_argument('--top', type=int, default=10, help="number of slowest modules to show")
+    args = parser.parse_args(argv)
+
+    results = [_run_once() for _ in range(args.runs)]
+    fastest = min(results, key=lambda result: result['elapsed'])
+
+    if fastest['timings']:
+        print("slowest modules (self time):")
+        for (self_us, cumulative_us, module) in sorted(fastest['timings'], reverse=True)[:args.top]:
+            print("  %-60s %8.1fms" % (module, self_us / 1000.0))
+    else:
+        print("(-X importtime needs Python 3.7 or later, so only the total is shown)")
+    print("%-62s %8.1fms  (fastest of %d)" % ("import " + _CLI_MODULE, fastest['elapsed'] * 1000, args.runs))
+
+    failed = False
+    imported = _deferred_libraries_imported(fastest['modules'])
+    if imported:
+        print("FAILED: importing the CLI imported %s" % ", ".join(imported))
+        failed = True
+    if args.max_ms is not None and fastest['elapsed'] * 1000 > args.max_ms:
+        print("FAILED: import took longer than %.1fms" % args.max_ms)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
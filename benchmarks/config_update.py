@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Time re-validating a project after editing one variable.
+
+Run from the top of the source tree:
+
+    python benchmarks/config_update.py --env-specs 50 --commands 200
+
+This edits one variable at a time, as project_ops.add_variables()
+does, and re-validates the project, both with the sections that
+didn't change reused and with everything recomputed.
+"""
+from __future__ import absolute_import, print_function
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anaconda_project import project_ops  # noqa: E402
+from anaconda_project.project import Project  # noqa: E402
+
+
+def _make_project_file(env_spec_count, command_count):
+    lines = ["name: bench", "platforms: [linux-64, osx-64, win-64]", "variables:", "  FOO: null", "env_specs:"]
+    for i in range(env_spec_count):
+        lines.append("  env%d:" % i)
+        lines.append("    packages: [python=3.6, numpy>=1.%d, pandas, 'requests <3', bokeh]" % i)
+        lines.append("    channels: [conda-forge]")
+        if i > 0:
+            lines.append("    inherit_from: env%d" % (i - 1))
+    lines.append("commands:")
+    for i in range(command_count):
+        lines.append("  command%d:" % i)
+        lines.append("    unix: echo %d" % i)
+        lines.append("    windows: echo %d" % i)
+        lines.append("    env_spec: env%d" % (i % env_spec_count))
+    return "\n".join(lines) + "\n"
+
+
+def _time_edits(project, count, recompute_everything):
+    start = time.time()
+    for i in range(count):
+        if recompute_everything:
+            # what update() did before it tracked sections
+            project._config_cache._sections.clear()
+        project.project_file.set_value(['variables', 'VAR%d' % i], None)
+        project.project_file.use_changes_without_saving()
+        assert [] == project.problems
+    return (time.time() - start) / count
+
+
+def main(argv):
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark re-validating a project after an edit.")
+    parser.add_argument('--env-specs', type=int, default=50, help="number of env specs")
+    parser.add_argument('--commands', type=int, default=200, help="number of commands")
+    parser.add_argument('--edits', type=int, default=20, help="number of edits to average over")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="config_update_")
+    try:
+        with open(os.path.join(directory, "anaconda-project.yml"), 'w') as f:
+            f.write(_make_project_file(args.env_specs, args.commands))
+
+        project = Project(directory)
+        assert [] == project.problems
+        print("%d env specs, %d commands" % (args.env_specs, args.commands))
+
+        everything = _time_edits(project, args.edits, recompute_everything=True)
+        print("%-32s %8.1fms" % ("edit, recompute everything", everything * 1000))
+        changed = _time_edits(project, args.edits, recompute_everything=False)
+        print("%-32s %8.1fms  (%.1fx)" % ("edit, recompute what changed", changed * 1000, everything / changed))
+
+        start = time.time()
+        status = project_ops.add_variables(project, None, ['BAR'])
+        assert status
+        print("%-32s %8.1fms" % ("project_ops.add_variables", (time.time() - start) * 1000))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Time loading a project with a big lock file.
+
+Run from the top of the source tree:
+
+    python benchmarks/lock_set_load.py --env-specs 10 --packages 400
+
+The lock file has locked packages for six platforms in each env
+spec. This loads the project, then times looking up the locked
+packages for every env spec and platform, both starting from fresh
+lock sets and from lock sets that have already merged their lists.
+"""
+from __future__ import absolute_import, print_function
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anaconda_project.project import Project  # noqa: E402
+
+_PLATFORMS = ('linux-32', 'linux-64', 'linux-ppc64le', 'osx-64', 'win-32', 'win-64')
+
+
+def _make_project_file(env_spec_count):
+    lines = ["name: bench", "platforms: [%s]" % ", ".join(_PLATFORMS), "env_specs:"]
+    for i in range(env_spec_count):
+        lines.append("  env%d:" % i)
+        lines.append("    packages: [pkg0, pkg1, pkg2]")
+    return "\n".join(lines) + "\n"
+
+
+def _make_lock_file(env_spec_count, package_count):
+    lines = ["locking_enabled: true", "env_specs:"]
+    for i in range(env_spec_count):
+        lines.append("  env%d:" % i)
+        lines.append("    locked: true")
+        lines.append("    platforms: [%s]" % ", ".join(_PLATFORMS))
+        lines.append("    packages:")
+        # most packages are in "all", some are per-OS or per-platform
+        buckets = ('all', 'all', 'all', 'all', 'all', 'unix', 'win') + _PLATFORMS
+        for bucket in ('all', 'unix', 'win') + _PLATFORMS:
+            lines.append("      %s:" % bucket)
+            for p in range(package_count):
+                if buckets[p % len(buckets)] == bucket:
+                    lines.append("      - pkg%d=1.%d=py36_%d" % (p, i, p))
+    return "\n".join(lines) + "\n"
+
+
+def _time_lookups(project, rounds, recompute):
+    lock_sets = [env_spec.lock_set for env_spec in project.env_specs.values()]
+    start = time.time()
+    for _ in range(rounds):
+        for lock_set in lock_sets:
+            if recompute:
+                # as if the lock set were brand new
+                lock_set._parsed_specs_by_key.clear()
+                lock_set._merged_by_platform.clear()
+            for platform in lock_set.platforms:
+                lock_set.package_specs_by_name_for_platform(platform)
+    return (time.time() - start) / rounds
+
+
+def main(argv):
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark loading a project with a big lock file.")
+    parser.add_argument('--env-specs', type=int, default=10, help="number of env specs")
+    parser.add_argument('--packages', type=int, default=400, help="number of packages per platform")
+    parser.add_argument('--rounds', type=int, default=10, help="number of lookup rounds to average over")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="lock_set_load_")
+    try:
+        with open(os.path.join(directory, "anaconda-project.yml"), 'w') as f:
+            f.write(_make_project_file(args.env_specs))
+        with open(os.path.join(directory, "anaconda-project-lock.yml"), 'w') as f:
+            f.write(_make_lock_file(args.env_specs, args.packages))
+        print("%d env specs, %d platforms, %d packages" % (args.env_specs, len(_PLATFORMS), args.packages))
+
+        start = time.time()
+        project = Project(directory)
+        assert [] == project.problems
+        print("%-32s %8.1fms" % ("load project", (time.time() - start) * 1000))
+
+        start = time.time()
+        # recompute from the already-parsed files
+        project._config_cache._sections.clear()
+        project.use_changes_without_saving()
+        assert [] == project.problems
+        print("%-32s %8.1fms" % ("load lock sets and env specs", (time.time() - start) * 1000))
+
+        recompute = _time_lookups(project, args.rounds, recompute=True)
+        print("%-32s %8.1fms" % ("look up packages, recompute", recompute * 1000))
+        cached = _time_lookups(project, args.rounds, recompute=False)
+        print("%-32s %8.3fms" % ("look up packages, cached", cached * 1000))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
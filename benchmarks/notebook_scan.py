@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Time analyzing the notebooks in a synthetic project with lots of them.
+
+Run from the top of the source tree:
+
+    python benchmarks/notebook_scan.py --notebooks 1000
+
+This compares analyzing the notebooks with nothing cached against
+analyzing them again with the results already cached.
+"""
+from __future__ import absolute_import, print_function
+
+import argparse
+import base64
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anaconda_project.internal import notebook_analyzer  # noqa: E402
+
+
+def _make_notebook(i, output_size):
+    rng = random.Random(i)
+    cells = []
+    for j in range(10):
+        source = ["# cell %d\n" % j, "x = %d\n" % rng.randint(0, 1000)]
+        if i % 7 == 0 and j == 9:
+            source = ["@fusion.register\n", "def f():\n", "    pass\n"]
+        output = base64.b64encode(bytes(bytearray(rng.getrandbits(8) for _ in range(output_size)))).decode('ascii')
+        cells.append({"cell_type": "code",
+                      "execution_count": j,
+                      "metadata": {},
+                      "outputs": [{"output_type": "display_data",
+                                   "data": {"image/png": output}}],
+                      "source": source})
+    return {"cells": cells, "metadata": {}, "nbformat": 4, "nbformat_minor": 2}
+
+
+def _make_project(directory, count, output_size):
+    filenames = []
+    for i in range(count):
+        subdir = os.path.join(directory, "notebooks%02d" % (i % 20))
+        if not os.path.isdir(subdir):
+            os.makedirs(subdir)
+        filename = os.path.join(subdir, "nb%04d.ipynb" % i)
+        with open(filename, 'w') as f:
+            json.dump(_make_notebook(i, output_size), f)
+        # old enough that extras() will cache what it finds
+        when = time.time() - 100
+        os.utime(filename, (when, when))
+        filenames.append(filename)
+    return filenames
+
+
+def _time(label, func, baseline=None):
+    start = time.time()
+    result = func()
+    elapsed = time.time() - start
+    if baseline is None:
+        print("%-28s %8.3fs" % (label, elapsed))
+    else:
+        print("%-28s %8.3fs  (%.1fx)" % (label, elapsed, baseline / elapsed))
+    return (elapsed, result)
+
+
+def main(argv):
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark notebook analysis.")
+    parser.add_argument('--notebooks', type=int, default=1000, help="number of notebooks")
+    parser.add_argument('--output-size', type=int, default=20000, help="bytes of output in each cell")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="notebook_scan_")
+    try:
+        filenames = _make_project(os.path.join(directory, "project"), args.notebooks, args.output_size)
+        print("%d notebooks, %.1f MB" % (len(filenames), sum(os.path.getsize(f) for f in filenames) / 1e6))
+
+        os.environ['ANACONDA_PROJECT_CACHE_PATH'] = os.path.join(directory, "cache")
+
+        project_directory = os.path.join(directory, "project")
+
+        def uncached():
+            shutil.rmtree(os.path.join(directory, "cache"), ignore_errors=True)
+            errors = []
+            result = notebook_analyzer.extras_for_notebooks(filenames, errors, project_directory=project_directory)
+            assert [] == errors
+            return result
+
+        def cached():
+            errors = []
+            return notebook_analyzer.extras_for_notebooks(filenames, errors, project_directory=project_directory)
+
+        (baseline, from_scan) = _time("uncached", uncached)
+        (_, from_cache) = _time("cached", cached, baseline)
+        assert from_scan == from_cache
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
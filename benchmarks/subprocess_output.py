@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Time streaming a chatty subprocess's output, and measure the memory it takes.
+
+Run from the top of the source tree:
+
+    python benchmarks/subprocess_output.py --megabytes 5 --memory
+
+The subprocess writes conda-style NUL-terminated progress records
+followed by a JSON document, and a line of stderr for every record.
+``--memory`` measures peak memory, which needs Python 3 (for
+``tracemalloc``) and makes everything a lot slower.
+"""
+from __future__ import absolute_import, print_function
+
+import argparse
+import os
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover (py2 only)
+    tracemalloc = None  # pragma: no cover (py2 only)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anaconda_project.internal import streaming_popen  # noqa: E402
+
+_CHILD_SCRIPT = """
+import sys
+record = '{"fetch": "%s", "finished": false, "maxval": 1, "progress": 0.5}\\n\\0' % ("x" * 400)
+for i in range(int(sys.argv[1])):
+    sys.stdout.write(record)
+    sys.stderr.write("progress %d\\n" % i)
+sys.stdout.write('{"success": true}\\n')
+"""
+
+
+def _run(record_count, use_threads, stdout_retain, stderr_retain, memory):
+    real_pipes_are_selectable = streaming_popen._pipes_are_selectable
+    if use_threads:
+        streaming_popen._pipes_are_selectable = lambda: False
+    if memory:
+        tracemalloc.start()
+    try:
+        start = time.time()
+        (p, out_lines, err_lines) = streaming_popen.popen(
+            [sys.executable, '-c', _CHILD_SCRIPT, str(record_count)],
+            None,
+            None,
+            stdout_retain=stdout_retain,
+            stderr_retain=stderr_retain)
+        elapsed = time.time() - start
+        assert p.returncode == 0
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+    finally:
+        if memory:
+            tracemalloc.stop()
+        streaming_popen._pipes_are_selectable = real_pipes_are_selectable
+    return (elapsed, peak)
+
+
+def main(argv):
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark streaming subprocess output.")
+    parser.add_argument('--megabytes', type=float, default=5, help="approximate size of the stdout")
+    parser.add_argument('--memory', action='store_true', help="measure peak memory")
+    args = parser.parse_args(argv)
+    if args.memory and tracemalloc is None:
+        parser.error("--memory needs Python 3")
+
+    record_count = int(args.megabytes * 1024 * 1024 / 500)
+    print("%d progress records" % record_count)
+
+    all_output = (streaming_popen.RETAIN_ALL, streaming_popen.RETAIN_ALL)
+    cases = [("threads, keep everything", True, all_output)]
+    if streaming_popen._pipes_are_selectable():
+        cases.append(("selector, keep everything", False, all_output))
+        cases.append(("selector, keep JSON and tail", False, (streaming_popen.RETAIN_JSON_DOCUMENT, 64 * 1024)))
+    for (name, use_threads, (stdout_retain, stderr_retain)) in cases:
+        (elapsed, peak) = _run(record_count, use_threads, stdout_retain, stderr_retain, args.memory)
+        if peak is None:
+            print("%-32s %8.1fms" % (name, elapsed * 1000))
+        else:
+            print("%-32s %8.1fms %8.1fMB peak" % (name, elapsed * 1000, peak / (1024.0 * 1024.0)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])